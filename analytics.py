@@ -0,0 +1,686 @@
+import argparse
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from dotenv import load_dotenv
+from database import HealthcareDatabase, db
+import slots  # Registers the listener that frees the slots of cancelled appointments
+
+# Load environment variables
+load_dotenv()
+
+# Where dashboard data comes from: 'sqlite' (the tables the app writes) or
+# 'sheets' (the local mirror of the Google Sheets, kept current by SheetsMirror)
+ANALYTICS_BACKEND = os.getenv('ANALYTICS_BACKEND', 'sqlite')
+ANALYTICS_CACHE_SECONDS = float(os.getenv('ANALYTICS_CACHE_SECONDS', '30'))
+SHEETS_SYNC_SECONDS = float(os.getenv('SHEETS_SYNC_SECONDS', '300'))
+SHEETS_FULL_SYNC_SECONDS = float(os.getenv('SHEETS_FULL_SYNC_SECONDS', '3600'))
+
+# Tables read by each backend; the mirror tables use the same column names
+BACKEND_TABLES = {
+    'sqlite': {'appointments': 'appointments', 'payments': 'payments'},
+    'sheets': {'appointments': 'sheet_appointments', 'payments': 'sheet_payments'},
+}
+
+SHEET_TITLES = {
+    'appointments': 'Healthcare Appointments',
+    'payments': 'Payment Logs',
+}
+
+# Sheet header (lowercase, letters and digits only) -> mirror column
+SHEET_COLUMNS = {
+    'appointments': {
+        'id': 'id', 'appointmentid': 'id', 'phone': 'phone_number', 'phonenumber': 'phone_number',
+        'service': 'service', 'package': 'service', 'date': 'date', 'time': 'time', 'status': 'status',
+        'timestamp': 'created_at', 'createdat': 'created_at', 'bookingtime': 'created_at',
+    },
+    'payments': {
+        'id': 'id', 'paymentid': 'id', 'phone': 'phone_number', 'phonenumber': 'phone_number',
+        'service': 'service', 'amount': 'amount', 'status': 'status', 'sessionid': 'session_id',
+        'timestamp': 'created_at', 'createdat': 'created_at',
+    },
+}
+
+# Field that identifies a record when its status is changed
+STATUS_KEYS = {
+    'appointments': 'id',
+    'payments': 'session_id',
+}
+
+MIRROR_FIELDS = {
+    'appointments': ('id', 'phone_number', 'service', 'date', 'time', 'status', 'created_at'),
+    'payments': ('id', 'phone_number', 'service', 'amount', 'status', 'session_id', 'created_at'),
+}
+
+def _column_letter(number: int) -> str:
+    letters = ''
+    while number:
+        number, remainder = divmod(number - 1, 26)
+        letters = chr(65 + remainder) + letters
+    return letters
+
+def _to_number(value) -> Optional[float]:
+    try:
+        return float(str(value).replace(',', '').strip())
+    except ValueError:
+        return None
+
+class SheetsMirror:
+    """
+    Keeps a local SQLite copy of the Google Sheets the dashboards used to read.
+
+    A sync first compares the spreadsheet's last update time (Drive
+    metadata) with the one recorded by the previous sync and stops there
+    if nothing changed. Otherwise it reads only the status column, updates
+    rows whose status changed and fetches the rows appended since the last
+    sync. Edits to other columns are picked up by a full sync (every
+    ``full_sync_interval`` seconds, or when rows were deleted).
+    """
+
+    def __init__(self, db_path: str = None, client_factory: Callable[[], Any] = None,
+                 interval: float = None, full_sync_interval: float = None):
+        """
+        Initialize the mirror
+
+        :param db_path: SQLite database file (defaults to the healthcare database)
+        :param client_factory: Returns an authorized gspread client (default: service account
+                               from GOOGLE_SHEETS_CREDENTIALS)
+        :param interval: Seconds between background syncs (env SHEETS_SYNC_SECONDS, default 300)
+        :param full_sync_interval: Seconds between full syncs (env SHEETS_FULL_SYNC_SECONDS, default 3600)
+        """
+        self.db_path = db_path or db.db_path
+        self.client_factory = client_factory or self._service_account_client
+        self.interval = interval or SHEETS_SYNC_SECONDS
+        self.full_sync_interval = full_sync_interval or SHEETS_FULL_SYNC_SECONDS
+        self._client = None
+        self._spreadsheets = {}
+        self._local = threading.local()
+        self._sync_lock = threading.RLock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._last_full_sync = {}
+        self._create_tables()
+
+    @staticmethod
+    def _service_account_client():
+        import gspread
+        from google.oauth2.service_account import Credentials
+
+        credentials = Credentials.from_service_account_file(
+            os.getenv('GOOGLE_SHEETS_CREDENTIALS'),
+            scopes=[
+                'https://www.googleapis.com/auth/spreadsheets',
+                'https://www.googleapis.com/auth/drive'
+            ]
+        )
+        return gspread.authorize(credentials)
+
+    def _connection(self):
+        """
+        Autocommit connection for the current thread
+        """
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            self._local.conn = conn
+        return conn
+
+    def _create_tables(self):
+        conn = self._connection()
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS sheet_appointments (
+                row_number INTEGER PRIMARY KEY,
+                id INTEGER,
+                phone_number TEXT,
+                service TEXT,
+                date TEXT,
+                time TEXT,
+                status TEXT,
+                created_at TEXT
+            )
+        ''')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS sheet_payments (
+                row_number INTEGER PRIMARY KEY,
+                id INTEGER,
+                phone_number TEXT,
+                service TEXT,
+                amount REAL,
+                status TEXT,
+                session_id TEXT,
+                created_at TEXT
+            )
+        ''')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS sheet_sync_state (
+                sheet TEXT PRIMARY KEY,
+                rows INTEGER,
+                header TEXT,
+                last_update TEXT,
+                synced_at REAL
+            )
+        ''')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_sheet_appointments_id ON sheet_appointments(id)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_sheet_appointments_date ON sheet_appointments(date, time)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_sheet_payments_session ON sheet_payments(session_id)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_sheet_payments_created ON sheet_payments(created_at)')
+
+    def _get_client(self):
+        if self._client is None:
+            self._client = self.client_factory()
+        return self._client
+
+    def _spreadsheet(self, kind: str):
+        # Opening fetches the spreadsheet metadata; lastUpdateTime is read live from Drive
+        if kind not in self._spreadsheets:
+            self._spreadsheets[kind] = self._get_client().open(SHEET_TITLES[kind])
+        return self._spreadsheets[kind]
+
+    @staticmethod
+    def _columns(kind: str, header: List[str]) -> List[Optional[str]]:
+        return [SHEET_COLUMNS[kind].get(re.sub(r'[^a-z0-9]', '', name.lower())) for name in header]
+
+    def _row_values(self, kind: str, columns: List[Optional[str]], row_number: int, values: List[str]) -> tuple:
+        record = {column: value for column, value in zip(columns, values) if column}
+        if 'amount' in record:
+            record['amount'] = _to_number(record['amount'])
+        record_id = _to_number(record.get('id', ''))
+        record['id'] = int(record_id) if record_id is not None else row_number
+        return (row_number,) + tuple(record.get(field) for field in MIRROR_FIELDS[kind])
+
+    def sync(self, kind: str, full: bool = False) -> Dict[str, int]:
+        """
+        Bring the mirror of one sheet up to date
+
+        :param kind: 'appointments' or 'payments'
+        :param full: Reload every row instead of only new rows and status changes
+        :return: Counts of 'added' and 'updated' rows ('skipped' is 1 if the sheet had not changed)
+        """
+        table = BACKEND_TABLES['sheets'][kind]
+
+        with self._sync_lock:
+            conn = self._connection()
+            state = conn.execute(
+                'SELECT rows, header, last_update FROM sheet_sync_state WHERE sheet = ?', (kind,)
+            ).fetchone()
+
+            spreadsheet = self._spreadsheet(kind)
+            # One Drive metadata request; unchanged sheets are not read at all
+            last_update = getattr(spreadsheet, 'lastUpdateTime', None)
+            if not full and state and last_update and last_update == state[2]:
+                return {'added': 0, 'updated': 0, 'skipped': 1}
+
+            worksheet = spreadsheet.sheet1
+            header = worksheet.row_values(1)
+            columns = self._columns(kind, header)
+            if 'status' not in columns:
+                raise ValueError(f"Sheet '{SHEET_TITLES[kind]}' has no Status column")
+            status_column = columns.index('status') + 1
+
+            # Data rows are counted by the status column (row 1 is the header)
+            statuses = worksheet.col_values(status_column)[1:]
+            total = len(statuses)
+            known = state[0] if state else 0
+            if full or not state or state[1] != '\t'.join(header) or total < known:
+                known = 0
+
+            updated = []
+            if known:
+                stored = dict(conn.execute(
+                    f'SELECT row_number, status FROM {table} WHERE row_number <= ?', (known + 1,)
+                ))
+                updated = [
+                    (status, row_number)
+                    for row_number, status in enumerate(statuses[:known], start=2)
+                    if stored.get(row_number) != status
+                ]
+
+            added = []
+            if total > known:
+                values = worksheet.get(
+                    f"A{known + 2}:{_column_letter(len(header))}{total + 1}"
+                )
+                added = [
+                    self._row_values(kind, columns, row_number, row)
+                    for row_number, row in enumerate(values, start=known + 2)
+                ]
+
+            fields = ('row_number',) + MIRROR_FIELDS[kind]
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                if not known:
+                    conn.execute(f'DELETE FROM {table}')
+                conn.executemany(f'UPDATE {table} SET status = ? WHERE row_number = ?', updated)
+                conn.executemany(
+                    f"INSERT OR REPLACE INTO {table} ({', '.join(fields)}) VALUES ({', '.join('?' * len(fields))})",
+                    added
+                )
+                conn.execute(
+                    'INSERT OR REPLACE INTO sheet_sync_state (sheet, rows, header, last_update, synced_at) '
+                    'VALUES (?, ?, ?, ?, ?)',
+                    (kind, total, '\t'.join(header), last_update, time.time())
+                )
+                conn.execute('COMMIT')
+            except sqlite3.Error:
+                conn.execute('ROLLBACK')
+                raise
+
+            if not known:
+                self._last_full_sync[kind] = time.time()
+            return {'added': len(added), 'updated': len(updated), 'skipped': 0}
+
+    def row_index(self, kind: str, keys: List[Any]) -> Dict[Any, Tuple[int, Optional[str]]]:
+        """
+        Sheet rows of records, from the local mirror
+
+        :param kind: 'appointments' (keyed by id) or 'payments' (keyed by session_id)
+        :param keys: Record keys
+        :return: Key -> (row number, mirrored status) for the keys found
+        """
+        table = BACKEND_TABLES['sheets'][kind]
+        key_field = STATUS_KEYS[kind]
+        conn = self._connection()
+        index = {}
+        keys = list(keys)
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            for key, row_number, status in conn.execute(
+                f"SELECT {key_field}, row_number, status FROM {table} "
+                f"WHERE {key_field} IN ({','.join('?' * len(chunk))})",
+                chunk
+            ):
+                index[key] = (row_number, status)
+        return index
+
+    def update_statuses(self, kind: str, updates: List[Tuple[Any, str]]) -> Dict[Any, str]:
+        """
+        Write many status changes to a sheet in one request
+
+        Rows are located through the mirror, which is synced first (usually
+        a single metadata request). When the sheet has a key column, the
+        key cells of the target rows are read back in one batch request
+        before writing, so rows moved by sorting or deletion are caught and
+        the index is rebuilt instead of overwriting the wrong row.
+
+        :param kind: 'appointments' (keyed by id) or 'payments' (keyed by session_id)
+        :param updates: List of (key, status) pairs; a later pair for the same key wins
+        :return: Per key 'updated', 'unchanged' or 'not_found'
+        """
+        table = BACKEND_TABLES['sheets'][kind]
+        wanted = dict(updates)
+
+        with self._sync_lock:
+            self.sync(kind)
+            conn = self._connection()
+            columns = self._columns(kind, conn.execute(
+                'SELECT header FROM sheet_sync_state WHERE sheet = ?', (kind,)
+            ).fetchone()[0].split('\t'))
+            status_letter = _column_letter(columns.index('status') + 1)
+            key_field = STATUS_KEYS[kind]
+            key_letter = _column_letter(columns.index(key_field) + 1) if key_field in columns else None
+            worksheet = self._spreadsheet(kind).sheet1
+
+            for attempt in range(2):
+                index = self.row_index(kind, wanted)
+                if not key_letter or not index:
+                    break
+                cells = worksheet.batch_get([f"{key_letter}{row_number}" for row_number, _ in index.values()])
+                found = [cell[0][0] if cell and cell[0] else '' for cell in cells]
+                if found == [str(key) for key in index]:
+                    break
+                # Rows moved since the last sync; rebuild the index from scratch
+                self.sync(kind, full=True)
+            else:
+                raise RuntimeError(f"Rows in sheet '{SHEET_TITLES[kind]}' keep moving; try again")
+
+            results = {key: 'not_found' for key in wanted}
+            changes = []
+            for key, (row_number, current) in index.items():
+                if current == wanted[key]:
+                    results[key] = 'unchanged'
+                else:
+                    results[key] = 'updated'
+                    changes.append((wanted[key], row_number))
+
+            if changes:
+                worksheet.batch_update([
+                    {'range': f"{status_letter}{row_number}", 'values': [[status]]}
+                    for status, row_number in changes
+                ])
+                conn.executemany(f'UPDATE {table} SET status = ? WHERE row_number = ?', changes)
+
+        return results
+
+    def sync_all(self, full: bool = False) -> Dict[str, Dict[str, int]]:
+        """
+        Sync every mirrored sheet, fully if requested or if the last full sync is too old
+
+        :param full: Force a full sync
+        :return: Result of sync() per sheet
+        """
+        results = {}
+        for kind in SHEET_TITLES:
+            due = time.time() - self._last_full_sync.get(kind, 0) >= self.full_sync_interval
+            try:
+                results[kind] = self.sync(kind, full=full or due)
+            except Exception as e:
+                print(f"Error syncing {kind} sheet: {e}")
+        if results:
+            analytics.invalidate()
+        return results
+
+    def start(self):
+        """
+        Sync in a background thread every ``interval`` seconds
+        """
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='sheets-mirror', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.sync_all()
+            self._stop.wait(self.interval)
+
+class AnalyticsStore:
+    """
+    Cached aggregate and list queries for the dashboards.
+
+    Reads the SQLite tables the application writes (or the Google Sheets
+    mirror with backend 'sheets') over a per-thread read connection, so a
+    dashboard render costs a few indexed queries and works offline.
+    Results are cached for ``cache_ttl`` seconds and dropped as soon as the
+    database reports a change.
+    """
+
+    def __init__(self, database: HealthcareDatabase = None, backend: str = None, cache_ttl: float = None,
+                 mirror: SheetsMirror = None):
+        """
+        Initialize the analytics store
+
+        :param database: Database read from and written to (default: the global healthcare database)
+        :param backend: 'sqlite' or 'sheets' (env ANALYTICS_BACKEND, default 'sqlite')
+        :param cache_ttl: Seconds query results are reused (env ANALYTICS_CACHE_SECONDS, default 30)
+        :param mirror: Sheets mirror used for status updates with the sheets backend (default: the global one)
+        """
+        self.database = database or db
+        self.db_path = self.database.db_path
+        self.mirror = mirror
+        self.backend = backend or ANALYTICS_BACKEND
+        if self.backend not in BACKEND_TABLES:
+            raise ValueError(f"Unknown analytics backend: {self.backend}")
+        self.tables = BACKEND_TABLES[self.backend]
+        self.cache_ttl = ANALYTICS_CACHE_SECONDS if cache_ttl is None else cache_ttl
+        self._local = threading.local()
+        self._cache: Dict[Tuple, Tuple[float, Any]] = {}
+        self._lock = threading.Lock()
+
+    def _connection(self):
+        """
+        Read connection for the current thread
+        """
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            self._local.conn = conn
+        return conn
+
+    def _rows(self, sql: str, params=()) -> List[Dict[str, Any]]:
+        cursor = self._connection().execute(sql, params)
+        columns = [column[0] for column in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    def _cached(self, key: Tuple, compute: Callable[[], Any]) -> Any:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry and entry[0] > now:
+                return entry[1]
+
+        try:
+            value = compute()
+        except sqlite3.Error as e:
+            print(f"Analytics query error: {e}")
+            return None
+
+        with self._lock:
+            self._cache[key] = (now + self.cache_ttl, value)
+        return value
+
+    def invalidate(self, *args):
+        """
+        Drop cached results (also registered as a database change listener)
+        """
+        with self._lock:
+            self._cache.clear()
+
+    def update_statuses(self, kind: str, updates: List[Tuple[Any, str]]) -> Dict[Any, str]:
+        """
+        Change many statuses at once in the backend the dashboards read from
+
+        With the SQLite backend this is one transaction through
+        HealthcareDatabase; with the sheets backend one batch request to the
+        Google Sheet (see SheetsMirror.update_statuses).
+
+        :param kind: 'appointments' (keyed by id) or 'payments' (keyed by Stripe session_id)
+        :param updates: List of (key, status) pairs
+        :return: Per key 'updated', 'unchanged' or 'not_found'
+        """
+        if kind not in STATUS_KEYS:
+            raise ValueError(f"Unknown record kind: {kind}")
+
+        if self.backend == 'sheets':
+            results = (self.mirror or sheets_mirror).update_statuses(kind, updates)
+        elif kind == 'appointments':
+            results = self.database.update_appointment_statuses(updates)
+            if results is None:
+                raise RuntimeError("Appointment status update was rolled back")
+        else:
+            before = self.database.get_payment_statuses([session_id for session_id, _ in updates])
+            if self.database.update_payment_statuses(updates) is None:
+                raise RuntimeError("Payment status update was rolled back")
+            after = self.database.get_payment_statuses(list(before))
+            results = {
+                session_id: 'not_found' if session_id not in before
+                else 'unchanged' if before[session_id] == after.get(session_id) else 'updated'
+                for session_id, _ in updates
+            }
+
+        self.invalidate()
+        return results
+
+    @staticmethod
+    def _filters(date_column: str, statuses: List[str] = None, date_from: str = None,
+                 date_to: str = None) -> Tuple[str, list]:
+        clauses = []
+        params = []
+        if statuses is not None:
+            clauses.append(f"status IN ({','.join('?' * len(statuses))})" if statuses else "0")
+            params.extend(statuses)
+        if date_from:
+            clauses.append(f"{date_column} >= ?")
+            params.append(date_from)
+        if date_to:
+            # Also covers timestamps on the last day
+            clauses.append(f"{date_column} < date(?, '+1 day')")
+            params.append(date_to)
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        Headline numbers for the Home dashboard
+
+        With the SQLite backend these come from the daily rollup tables
+        (one row per day, service and status) instead of the source tables.
+
+        :return: Dict with 'appointments', 'revenue' and 'pending_payments'
+        """
+        if self.backend == 'sqlite':
+            appointments_sql = "SELECT COALESCE(SUM(appointments), 0) FROM appointment_daily_rollup"
+            payments_sql = (
+                "SELECT COALESCE(SUM(amount), 0), COALESCE(SUM(CASE WHEN status = 'Pending' THEN payments END), 0) "
+                "FROM payment_daily_rollup"
+            )
+        else:
+            appointments_sql = f"SELECT COUNT(*) FROM {self.tables['appointments']}"
+            payments_sql = (
+                f"SELECT COALESCE(SUM(amount), 0), COUNT(CASE WHEN status = 'Pending' THEN 1 END) "
+                f"FROM {self.tables['payments']}"
+            )
+
+        def compute():
+            conn = self._connection()
+            appointments = conn.execute(appointments_sql).fetchone()[0]
+            revenue, pending = conn.execute(payments_sql).fetchone()
+            return {'appointments': appointments, 'revenue': revenue, 'pending_payments': pending}
+
+        return self._cached(('summary',), compute) or {'appointments': 0, 'revenue': 0, 'pending_payments': 0}
+
+    def daily_totals(self, days: int = 30) -> List[Dict[str, Any]]:
+        """
+        Appointments booked and payments taken per day
+
+        :param days: Number of days back from today
+        :return: List of dicts with 'day', 'appointments', 'payments' and 'revenue', oldest first
+        """
+        if self.backend == 'sqlite':
+            appointments_sql = (
+                "SELECT day, SUM(appointments) FROM appointment_daily_rollup WHERE day >= ? GROUP BY day"
+            )
+            payments_sql = "SELECT day, SUM(payments), SUM(amount) FROM payment_daily_rollup WHERE day >= ? GROUP BY day"
+        else:
+            appointments_sql = (
+                f"SELECT date(created_at) AS day, COUNT(*) FROM {self.tables['appointments']} "
+                f"WHERE created_at >= ? GROUP BY day"
+            )
+            payments_sql = (
+                f"SELECT date(created_at) AS day, COUNT(*), COALESCE(SUM(amount), 0) FROM {self.tables['payments']} "
+                f"WHERE created_at >= ? GROUP BY day"
+            )
+
+        def compute():
+            conn = self._connection()
+            since = conn.execute("SELECT date('now', ?)", (f'-{days - 1} days',)).fetchone()[0]
+            totals = {}
+            for day, appointments in conn.execute(appointments_sql, (since,)):
+                totals.setdefault(day, {'day': day, 'appointments': 0, 'payments': 0, 'revenue': 0})
+                totals[day]['appointments'] = appointments
+            for day, payments, revenue in conn.execute(payments_sql, (since,)):
+                totals.setdefault(day, {'day': day, 'appointments': 0, 'payments': 0, 'revenue': 0})
+                totals[day].update(payments=payments, revenue=revenue)
+            return [totals[day] for day in sorted(totals)]
+
+        return self._cached(('daily_totals', days), compute) or []
+
+    def appointment_statuses(self) -> List[str]:
+        """
+        Distinct appointment statuses
+        """
+        return self._cached(('appointment_statuses',), lambda: [
+            row['status'] for row in self._rows(
+                f"SELECT DISTINCT status FROM {self.tables['appointments']} WHERE status IS NOT NULL ORDER BY status"
+            )
+        ]) or []
+
+    def payment_statuses(self) -> List[str]:
+        """
+        Distinct payment statuses
+        """
+        return self._cached(('payment_statuses',), lambda: [
+            row['status'] for row in self._rows(
+                f"SELECT DISTINCT status FROM {self.tables['payments']} WHERE status IS NOT NULL ORDER BY status"
+            )
+        ]) or []
+
+    def appointments(self, statuses: List[str] = None, date_from: str = None, date_to: str = None,
+                     limit: int = 1000) -> List[Dict[str, Any]]:
+        """
+        Appointments ordered by date and time
+
+        :param statuses: Statuses to include (None for all)
+        :param date_from: Optional first appointment date (YYYY-MM-DD, inclusive)
+        :param date_to: Optional last appointment date (YYYY-MM-DD, inclusive)
+        :param limit: Maximum rows returned
+        :return: List of appointment dicts
+        """
+        statuses = list(statuses) if statuses is not None else None
+        where, params = self._filters('date', statuses, date_from, date_to)
+        return self._cached(
+            ('appointments', tuple(statuses or ()), statuses is None, date_from, date_to, limit),
+            lambda: self._rows(
+                f"SELECT * FROM {self.tables['appointments']}{where} ORDER BY date, time, id LIMIT ?",
+                params + [limit]
+            )
+        ) or []
+
+    def payments(self, statuses: List[str] = None, date_from: str = None, date_to: str = None,
+                 limit: int = 1000) -> List[Dict[str, Any]]:
+        """
+        Payments, newest first
+
+        :param statuses: Statuses to include (None for all)
+        :param date_from: Optional first day (YYYY-MM-DD, inclusive)
+        :param date_to: Optional last day (YYYY-MM-DD, inclusive)
+        :param limit: Maximum rows returned
+        :return: List of payment dicts
+        """
+        statuses = list(statuses) if statuses is not None else None
+        where, params = self._filters('created_at', statuses, date_from, date_to)
+        return self._cached(
+            ('payments', tuple(statuses or ()), statuses is None, date_from, date_to, limit),
+            lambda: self._rows(
+                f"SELECT * FROM {self.tables['payments']}{where} ORDER BY created_at DESC, id DESC LIMIT ?",
+                params + [limit]
+            )
+        ) or []
+
+    def payment_summary(self, statuses: List[str] = None, date_from: str = None,
+                        date_to: str = None) -> Dict[str, Any]:
+        """
+        Totals over the payments matching the filters
+
+        :return: Dict with 'payments', 'revenue' and 'pending'
+        """
+        statuses = list(statuses) if statuses is not None else None
+        where, params = self._filters('created_at', statuses, date_from, date_to)
+
+        def compute():
+            count, revenue, pending = self._connection().execute(
+                f"SELECT COUNT(*), COALESCE(SUM(amount), 0), COUNT(CASE WHEN status = 'Pending' THEN 1 END) "
+                f"FROM {self.tables['payments']}{where}",
+                params
+            ).fetchone()
+            return {'payments': count, 'revenue': revenue, 'pending': pending}
+
+        return self._cached(
+            ('payment_summary', tuple(statuses or ()), statuses is None, date_from, date_to), compute
+        ) or {'payments': 0, 'revenue': 0, 'pending': 0}
+
+# Create global analytics instances
+analytics = AnalyticsStore()
+sheets_mirror = SheetsMirror()
+db.add_change_listener(analytics.invalidate)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sync the local mirror of the Google Sheets")
+    parser.add_argument('--full', action='store_true', help="reload every row")
+    parser.add_argument('--loop', action='store_true', help="keep syncing every SHEETS_SYNC_SECONDS")
+    args = parser.parse_args()
+
+    while True:
+        start = time.perf_counter()
+        print(f"{sheets_mirror.sync_all(full=args.full)} in {time.perf_counter() - start:.2f}s")
+        if not args.loop:
+            break
+        args.full = False
+        time.sleep(sheets_mirror.interval)
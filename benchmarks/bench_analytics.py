@@ -0,0 +1,142 @@
+"""
+Dashboard data: Google Sheets reads versus the local analytics store.
+
+Builds appointments and payments in SQLite and the same rows in fake
+Google Sheets (benchmarks/fake_sheets.py, with a per-request latency),
+then compares:
+
+- a Home dashboard render with get_all_records() on both sheets
+- the sheets mirror: first sync, a sync with no changes, and a sync after
+  status edits and appended rows (requests and cells transferred)
+- AnalyticsStore queries on the SQLite tables and on the mirror, cold and cached
+
+Usage: python benchmarks/bench_analytics.py [rows] [latency_seconds]
+"""
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+# Add the parent directory to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analytics import AnalyticsStore, SheetsMirror
+from database import HealthcareDatabase
+from fake_sheets import FakeSheetsClient
+
+SERVICES = [('Basic Health Check Up', 350.0), ('Vitamin D', 150.0), ('NAD 250mg', 1200.0), ('Immune Boost', 600.0)]
+APPOINTMENT_STATUSES = ['Pending'] * 2 + ['Confirmed'] * 6 + ['Cancelled']
+PAYMENT_STATUSES = ['Pending'] * 2 + ['Paid'] * 7 + ['Expired']
+
+def populate(db_path, rows):
+    random.seed(7)
+    start = datetime(2024, 1, 1)
+    appointments = []
+    payments = []
+    for i in range(1, rows + 1):
+        service, amount = random.choice(SERVICES)
+        phone_number = f"+9715{random.randrange(50000):08d}"
+        created_at = (start + timedelta(minutes=i * 5)).strftime('%Y-%m-%d %H:%M:%S')
+        appointments.append((i, phone_number, service, (date(2024, 1, 1) + timedelta(days=i % 700)).isoformat(),
+                             random.choice(['09:00', '11:00', '14:00', '16:00']), random.choice(APPOINTMENT_STATUSES),
+                             created_at))
+        payments.append((i, phone_number, service, amount, random.choice(PAYMENT_STATUSES), f"cs_test_{i:08d}",
+                         created_at))
+
+    conn = sqlite3.connect(db_path)
+    conn.executemany('INSERT INTO appointments (id, phone_number, service, date, time, status, created_at) '
+                     'VALUES (?, ?, ?, ?, ?, ?, ?)', appointments)
+    conn.executemany('INSERT INTO payments (id, phone_number, service, amount, status, session_id, created_at) '
+                     'VALUES (?, ?, ?, ?, ?, ?, ?)', payments)
+    conn.commit()
+    conn.close()
+
+    # The sheets' column order: status is column 5 (appointments) and 6 (payments)
+    return {
+        'Healthcare Appointments': [['ID', 'Phone Number', 'Service', 'Date', 'Status', 'Time']] + [
+            [a[0], a[1], a[2], a[3], a[5], a[4]] for a in appointments
+        ],
+        'Payment Logs': [['Timestamp', 'Phone Number', 'Service', 'Amount', 'SessionID', 'Status']] + [
+            [p[6], p[1], p[2], p[3], p[5], p[4]] for p in payments
+        ],
+    }
+
+def timed(label, func, repeats=1):
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    print(f"  {label:<52} {best * 1e3:10.2f} ms")
+    return result
+
+def sheets_home(client):
+    # What dashboard/Home.py used to do on every render
+    appointments_data = client.open('Healthcare Appointments').sheet1.get_all_records()
+    payments_data = client.open('Payment Logs').sheet1.get_all_records()
+    return {
+        'appointments': len(appointments_data),
+        'revenue': sum(float(payment['Amount']) for payment in payments_data),
+        'pending_payments': len([p for p in payments_data if p['Status'] == 'Pending']),
+    }
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    latency = float(sys.argv[2]) if len(sys.argv) > 2 else 0.2
+    db = HealthcareDatabase(os.path.join(tempfile.mkdtemp(), 'bench.db'))
+    client = FakeSheetsClient(populate(db.db_path, rows), latency=latency)
+    print(f"{rows} appointments and {rows} payments, {latency * 1e3:.0f} ms per Sheets request")
+
+    print("before (Google Sheets on every render):")
+    client.reset_counters()
+    expected = timed("Home render: get_all_records() x2", lambda: sheets_home(client))
+    print(f"    {client.requests} requests, {client.cells:,} cells")
+
+    print("sheets mirror sync:")
+    mirror = SheetsMirror(db.db_path, client_factory=lambda: client)
+    for label, prepare in [
+        ("first sync (full)", None),
+        ("no changes", None),
+        ("100 status edits + 500 appended rows", 'edit'),
+    ]:
+        if prepare:
+            worksheet = client.spreadsheets['Payment Logs'].sheet1
+            for row_number in random.sample(range(2, rows + 2), 100):
+                worksheet.rows[row_number - 1][5] = 'Refunded'
+            worksheet.append_rows([
+                [datetime(2030, 1, 1).strftime('%Y-%m-%d %H:%M:%S'), '+971500000000', 'Vitamin D', 150.0,
+                 f"cs_new_{i}", 'Pending'] for i in range(500)
+            ])
+        client.reset_counters()
+        result = timed(label, lambda: {kind: mirror.sync(kind) for kind in ('appointments', 'payments')})
+        print(f"    {client.requests} requests, {client.cells:,} cells, {result}")
+
+    worksheet = client.spreadsheets['Payment Logs'].sheet1
+    mirrored = sqlite3.connect(db.db_path).execute(
+        'SELECT COUNT(*), SUM(status = ?) FROM sheet_payments', ('Refunded',)
+    ).fetchone()
+    assert mirrored == (len(worksheet.rows) - 1, sum(row[5] == 'Refunded' for row in worksheet.rows)), mirrored
+    print(f"    mirror matches the sheet ({mirrored[0]} payments, {mirrored[1]} refunded)")
+
+    for backend in ('sqlite', 'sheets'):
+        print(f"after (AnalyticsStore, backend '{backend}'):")
+        store = AnalyticsStore(db, backend=backend)
+        summary = timed("summary, cold", store.summary)
+        timed("summary, cached", store.summary, repeats=100)
+        store.invalidate()
+        timed("appointments: Confirmed, one month", lambda: store.appointments(
+            statuses=['Confirmed'], date_from='2024-06-01', date_to='2024-06-30'))
+        timed("payments + totals: Pending, one month", lambda: (
+            store.payments(statuses=['Pending'], date_from='2024-03-01', date_to='2024-03-31'),
+            store.payment_summary(statuses=['Pending'], date_from='2024-03-01', date_to='2024-03-31')))
+        if backend == 'sqlite':
+            assert summary['appointments'] == expected['appointments']
+            assert abs(summary['revenue'] - expected['revenue']) < 0.01
+            assert summary['pending_payments'] == expected['pending_payments']
+            print("    summary matches the sheets")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Appointment queries on a synthetic 1M-row appointments table.
+
+Times the typical dashboard/API queries without indexes, then with the
+covering indexes from migration 1 (migrations.py), and compares
+deep OFFSET pagination with keyset (cursor) pagination.
+
+Usage: python benchmarks/bench_appointment_queries.py [rows]
+"""
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+# Add the parent directory to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import HealthcareDatabase
+
+SERVICES = ['Basic Health Check Up', 'Cancer Profile Female', 'Vitamin D', 'NAD 250mg', 'Immune Boost']
+STATUSES = ['Pending'] * 2 + ['Confirmed'] * 6 + ['Cancelled']
+TIMES = ['09:00', '11:00', '14:00', '16:00']
+
+def populate(db, rows):
+    random.seed(42)
+    start = date(2024, 1, 1)
+    conn = sqlite3.connect(db.db_path)
+    batch = []
+    for _ in range(rows):
+        batch.append((
+            f"+9715{random.randrange(200000):08d}",
+            random.choice(SERVICES),
+            (start + timedelta(days=random.randrange(730))).isoformat(),
+            random.choice(TIMES),
+            random.choice(STATUSES)
+        ))
+        if len(batch) == 50000:
+            conn.executemany('INSERT INTO appointments (phone_number, service, date, time, status) VALUES (?, ?, ?, ?, ?)', batch)
+            batch = []
+    if batch:
+        conn.executemany('INSERT INTO appointments (phone_number, service, date, time, status) VALUES (?, ?, ?, ?, ?)', batch)
+    conn.commit()
+    conn.close()
+
+def timed(label, func, runs=20):
+    func()
+    start = time.perf_counter()
+    for _ in range(runs):
+        func()
+    print(f"  {label:<48} {(time.perf_counter() - start) / runs * 1e3:9.2f} ms")
+
+def run_queries(db):
+    phone = "+971500001234"
+    timed("phone number lookup (all rows)", lambda: db.get_appointments(phone_number=phone))
+    timed("pending, one week, first page", lambda: db.get_appointments_page(
+        status='Pending', date_from='2025-03-01', date_to='2025-03-07', limit=50))
+    timed("one day, first page", lambda: db.get_appointments_page(
+        date_from='2025-06-15', date_to='2025-06-15', limit=50))
+    timed("page 2000 via OFFSET", lambda: db.get_appointments(limit=50, offset=100000), runs=5)
+
+    cursor = None
+    for _ in range(2000):
+        cursor = db.get_appointments_page(cursor=cursor, limit=50)['next_cursor']
+    timed("page 2000 via keyset cursor", lambda: db.get_appointments_page(cursor=cursor, limit=50))
+
+    start = time.perf_counter()
+    count = sum(1 for _ in db.iter_appointments(status='Confirmed', date_from='2025-01-01'))
+    print(f"  {'stream confirmed 2025+ rows (' + str(count) + ')':<48} {(time.perf_counter() - start) * 1e3:9.2f} ms")
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    db = HealthcareDatabase(os.path.join(tempfile.mkdtemp(), 'bench.db'))
+
+    conn = sqlite3.connect(db.db_path)
+    for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index' AND name LIKE 'idx_appointments_%'").fetchall():
+        conn.execute(f"DROP INDEX {name}")
+    conn.execute('DELETE FROM schema_migrations WHERE version = 1')
+    conn.commit()
+    conn.close()
+
+    start = time.perf_counter()
+    populate(db, rows)
+    print(f"inserted {rows} appointments in {time.perf_counter() - start:.1f}s")
+
+    print("without indexes:")
+    run_queries(db)
+
+    start = time.perf_counter()
+    db._migrate()
+    print(f"created indexes in {time.perf_counter() - start:.1f}s")
+
+    print("with covering indexes:")
+    run_queries(db)
+
+if __name__ == "__main__":
+    main()
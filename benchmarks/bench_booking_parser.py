@@ -0,0 +1,68 @@
+"""
+Booking parser accuracy and throughput.
+
+Checks every message in benchmarks/booking_messages.jsonl (real-world
+phrasings in English and Arabic with the expected date, time and service,
+relative to the "today" stored with each message), then times parsing the
+corpus and a 500-character message (the sanitize_message limit).
+
+Usage: python benchmarks/bench_booking_parser.py [repeats]
+"""
+import json
+import os
+import sys
+import time
+from datetime import date
+
+# Add the parent directory to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from booking_parser import BookingParser, booking_parser
+
+CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'booking_messages.jsonl')
+
+def check_corpus(corpus):
+    failures = 0
+    for case in corpus:
+        parsed = booking_parser.parse(case['message'], date.fromisoformat(case['today']))
+        got = (parsed['date'], parsed['time'], parsed['service'])
+        expected = (case['date'], case['time'], case['service'])
+        if got != expected:
+            failures += 1
+            print(f"  MISMATCH {case['message']!r}: got {got}, expected {expected}")
+    print(f"corpus: {len(corpus) - failures}/{len(corpus)} messages parsed as expected")
+    return failures
+
+def main():
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    with open(CORPUS, encoding='utf-8') as f:
+        corpus = [json.loads(line) for line in f if line.strip()]
+
+    failures = check_corpus(corpus)
+
+    start = time.perf_counter()
+    BookingParser()
+    print(f"parser build (catalog aliases + regex compile): {(time.perf_counter() - start) * 1e3:.2f} ms")
+
+    messages = [case['message'] for case in corpus]
+    today = date(2025, 10, 13)
+    start = time.perf_counter()
+    for _ in range(repeats):
+        for message in messages:
+            booking_parser.parse(message, today)
+    elapsed = time.perf_counter() - start
+    total = repeats * len(messages)
+    print(f"corpus messages: {elapsed / total * 1e6:.1f} us/message, {total / elapsed:,.0f} messages/s")
+
+    long_message = ("Hello, I was wondering whether it would be possible to arrange a visit because my doctor "
+                    "suggested some blood work and I have been feeling tired lately. ") * 3
+    long_message = (long_message + "Vitamin D IV next Thursday at 4:30 pm please")[-500:]
+    start = time.perf_counter()
+    for _ in range(repeats):
+        booking_parser.parse(long_message, today)
+    print(f"500-character message: {(time.perf_counter() - start) / repeats * 1e6:.1f} us/message")
+
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,310 @@
+"""
+Catalog search: the three search engines on the same synthetic catalogs.
+
+- ServiceManager.search_services: substring match on name and description
+- ExcelBasedChatbot.search_services: fuzz.partial_ratio on every row
+- HealthPackageChatbot.search_health_items: process.extract, then a
+  DataFrame mask per match to fetch the row
+
+Catalogs of tests, packages and IV therapies (100 to 100k items by
+default) are generated from ~40 concepts ("Vitamin D", "Thyroid",
+"NAD" ...); every item belongs to one concept. HealthPackageChatbot only
+has tests and packages, so IV therapies go into its tests frame.
+
+Queries name a concept as a customer would type it:
+- exact: "vitamin d", "vitamin d test price"
+- typo: one or two random edits
+- translit: Arabic script ("فيتامين د") or Latin transliteration ("fitamin d")
+
+An item is relevant when it belongs to the query's concept. recall@k is
+|relevant in the top k| / min(k, relevant items), averaged per query kind.
+
+Per engine and catalog size, the report gives:
+- p50/p95 latency over the query corpus (stopping after --budget seconds,
+  but not before --min-queries, so recall has a usable sample)
+- peak traced allocation per query (tracemalloc, a few queries)
+- recall@k for each query kind
+
+Usage: python benchmarks/bench_catalog_search.py [--sizes 100,1000,10000,100000] [--queries 300] [--budget 5]
+                                                 [--output report.json]
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+# Add the parent directory to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# health_package_chatbot opens the global database on import; keep it out of the project
+os.environ.setdefault('HEALTHCARE_DB_PATH', os.path.join(tempfile.mkdtemp(), 'healthcare.db'))
+
+import pandas as pd
+from excel_chatbot import ExcelBasedChatbot
+from health_package_chatbot import HealthPackageChatbot
+from services import ServiceManager
+
+# Concept -> (kinds it appears as, Arabic script, Latin transliterations)
+CONCEPTS = {
+    'Vitamin D': ('test package iv', 'فيتامين د', ['fitamin d', 'vitameen d']),
+    'Vitamin B12': ('test iv', 'فيتامين ب12', ['fitamin b12', 'vitameen b12']),
+    'Vitamin C': ('test iv', 'فيتامين سي', ['fitamin c', 'vitameen si']),
+    'Ferritin': ('test', 'فيريتين', ['feritin', 'ferriteen']),
+    'Iron': ('test package', 'الحديد', ['hadeed', 'el hadid']),
+    'HbA1c': ('test', 'السكر التراكمي', ['sukkar tarakumi', 'hba1c']),
+    'Glucose': ('test', 'الجلوكوز', ['glukoz', 'jlucose']),
+    'Cholesterol': ('test package', 'الكوليسترول', ['kolestrol', 'kolesterol']),
+    'Lipid Profile': ('test package', 'الدهون', ['lipid brofile', 'dohoon']),
+    'Thyroid': ('test package', 'الغدة الدرقية', ['thairoid', 'ghodda darakiya']),
+    'TSH': ('test', 'هرمون الغدة', ['tsh hormone', 't s h']),
+    'Liver Function': ('test package', 'وظائف الكبد', ['wazaif kabid', 'liver fanction']),
+    'Kidney Function': ('test package', 'وظائف الكلى', ['wazaif kila', 'kidny function']),
+    'Testosterone': ('test package', 'التستوستيرون', ['testostiron', 'testosteroon']),
+    'Estradiol': ('test', 'الاستراديول', ['estradyol', 'istradiol']),
+    'Cortisol': ('test', 'الكورتيزول', ['kortizol', 'cortizol']),
+    'CRP': ('test', 'بروتين سي التفاعلي', ['c reactive protein', 'crp protein']),
+    'Magnesium': ('test iv', 'المغنيسيوم', ['maghnesium', 'magnizium']),
+    'Zinc': ('test iv', 'الزنك', ['zink', 'el zink']),
+    'Calcium': ('test', 'الكالسيوم', ['kalsium', 'calcyum']),
+    'PSA': ('test package', 'البروستاتا', ['prostata', 'p s a']),
+    'Complete Blood Count': ('test package', 'صورة الدم الكاملة', ['cbc', 'sorat dam']),
+    'STD': ('test package', 'الأمراض المنقولة جنسيا', ['std test', 'amrad jinsiya']),
+    'HIV': ('test', 'نقص المناعة', ['hiv test', 'eidz']),
+    'Hepatitis B': ('test', 'التهاب الكبد ب', ['hepatitis b', 'iltihab kabid']),
+    'Allergy': ('test package', 'الحساسية', ['hasasiya', 'alergy']),
+    'Food Intolerance': ('test package', 'حساسية الطعام', ['hasasiyat taam', 'food intollerance']),
+    'Hormone': ('test package', 'الهرمونات', ['hormonat', 'hormoon']),
+    'Fertility': ('test package', 'الخصوبة', ['khosoba', 'fertilty']),
+    'Pregnancy': ('test', 'الحمل', ['haml', 'pregnency']),
+    'Cancer Marker': ('test package', 'دلالات الأورام', ['dalalat awram', 'cancer markr']),
+    'Heart': ('test package', 'القلب', ['qalb', 'hart']),
+    'Diabetes': ('test package', 'السكري', ['sukkari', 'diabites']),
+    'NAD': ('iv', 'ان ايه دي', ['n a d', 'nad plus']),
+    'Glutathione': ('iv', 'الجلوتاثيون', ['glutathion', 'gluta']),
+    'Hydration': ('iv', 'الترطيب', ['tarteeb', 'hydrashun']),
+    'Immune Boost': ('iv package', 'تقوية المناعة', ['taqwiyat manaa', 'imune boost']),
+    'Energy': ('iv', 'الطاقة', ['taqa', 'enrgy']),
+    'Hangover': ('iv', 'آثار السهر', ['hang over', 'hangovr']),
+    'Women Wellness': ('package', 'صحة المرأة', ['sehat mara', 'womens wellness']),
+    'Men Wellness': ('package', 'صحة الرجل', ['sehat rajul', 'mens wellness']),
+}
+TEST_SUFFIXES = ['', ' Test', ' Level', ' (Serum)', ' Total', ' Panel', ' Screening', ' Advanced']
+PACKAGE_PREFIXES = ['Essential', 'Advanced', 'Complete', 'Executive', 'Basic', 'Premium', 'Family']
+IV_SUFFIXES = [' IV Therapy', ' IV Drip', ' Booster Shot', ' Infusion']
+QUERY_TEMPLATES = ['{q}', '{q}', '{q} test', '{q} price', 'how much is {q}']
+KEYBOARD_NEIGHBOURS = dict(zip('abcdefghijklmnopqrstuvwxyz', [
+    'qs', 'vn', 'xv', 'sf', 'wr', 'dg', 'fh', 'gj', 'uo', 'hk', 'jl', 'k', 'n', 'bm', 'ip', 'o', 'w', 'et', 'ad',
+    'ry', 'yi', 'cb', 'qe', 'zc', 'tu', 'x'
+]))
+
+def generate_catalog(size, rng):
+    """
+    Synthetic catalog: ~60% tests, ~25% packages, ~15% IV therapies
+
+    :return: List of items {'name', 'concept', 'kind', 'price'}, names unique
+    """
+    by_kind = {kind: [concept for concept, (kinds, _, _) in CONCEPTS.items() if kind in kinds.split()]
+               for kind in ('test', 'package', 'iv')}
+    items = []
+    seen = set()
+    while len(items) < size:
+        kind = rng.choices(['test', 'package', 'iv'], weights=[60, 25, 15])[0]
+        concept = rng.choice(by_kind[kind])
+        if kind == 'test':
+            name = concept + rng.choice(TEST_SUFFIXES)
+        elif kind == 'package':
+            name = f"{rng.choice(PACKAGE_PREFIXES)} {concept} Package"
+        else:
+            name = concept + rng.choice(IV_SUFFIXES)
+        # Large catalogs repeat base names per lab, panel or dose; tell them apart with a code
+        if name in seen:
+            name = f"{name} [{kind.upper()}-{len(items):06d}]"
+        seen.add(name)
+        items.append({'name': name, 'concept': concept, 'kind': kind, 'price': rng.randrange(80, 3000, 10)})
+    return items
+
+def make_typo(text, rng, edits):
+    chars = list(text)
+    for _ in range(edits):
+        positions = [i for i, char in enumerate(chars) if char.isalpha()]
+        if not positions:
+            break
+        i = rng.choice(positions)
+        operation = rng.choice(['swap', 'drop', 'double', 'neighbour'])
+        if operation == 'swap' and i + 1 < len(chars):
+            chars[i], chars[i + 1] = chars[i + 1], chars[i]
+        elif operation == 'drop' and len(positions) > 3:
+            del chars[i]
+        elif operation == 'double':
+            chars.insert(i, chars[i])
+        else:
+            chars[i] = rng.choice(KEYBOARD_NEIGHBOURS.get(chars[i].lower(), chars[i]))
+    return ''.join(chars)
+
+def generate_queries(count, rng):
+    """
+    Labeled query corpus, a third each exact, typo and transliterated
+
+    :return: List of {'query', 'concept', 'kind'}
+    """
+    concepts = list(CONCEPTS)
+    queries = []
+    for i in range(count):
+        concept = rng.choice(concepts)
+        kind = ('exact', 'typo', 'translit')[i % 3]
+        if kind == 'exact':
+            text = concept.lower()
+        elif kind == 'typo':
+            text = make_typo(concept.lower(), rng, rng.choice([1, 1, 2]))
+        else:
+            _, arabic, latin = CONCEPTS[concept]
+            text = arabic if rng.random() < 0.5 else rng.choice(latin)
+        template = rng.choice(QUERY_TEMPLATES) if kind != 'translit' or text.isascii() else '{q}'
+        queries.append({'query': template.format(q=text), 'concept': concept, 'kind': kind})
+    return queries
+
+def build_engines(items, workdir):
+    """
+    Load the catalog into each engine through its own data structures
+
+    :return: Dict engine name -> search function returning ranked item names
+    """
+    groups = {'test': [], 'package': [], 'iv': []}
+    for item in items:
+        groups[item['kind']].append(item)
+
+    # ServiceManager reads config/services.json-shaped JSON
+    config_path = os.path.join(workdir, f"services_{len(items)}.json")
+    with open(config_path, 'w') as config_file:
+        json.dump({
+            'categories': list(CONCEPTS),
+            'wellness_packages': [{'id': f"pkg_{i}", 'name': item['name'], 'price': item['price'],
+                                   'category': 'Wellness Packages', 'description': f"{item['concept']} package"}
+                                  for i, item in enumerate(groups['package'])],
+            'individual_tests': [{'id': f"test_{i}", 'name': item['name'], 'price': item['price'],
+                                  'category': 'Blood Tests', 'description': f"{item['concept']} blood test"}
+                                 for i, item in enumerate(groups['test'])],
+            'iv_therapies': [{'id': f"iv_{i}", 'name': item['name'], 'price': item['price'],
+                              'category': 'IV Therapy', 'description': f"{item['concept']} intravenous therapy"}
+                             for i, item in enumerate(groups['iv'])],
+        }, config_file)
+    service_manager = ServiceManager(config_path)
+
+    # ExcelBasedChatbot keeps the spreadsheet rows as dicts
+    with contextlib.redirect_stdout(io.StringIO()):
+        excel_chatbot = ExcelBasedChatbot(workdir)
+    excel_chatbot.services_data = {
+        'tests': [{'TEST NAME': item['name'], 'Price in AED': item['price']} for item in groups['test']],
+        'packages': [{'Package name': item['name'], 'Price (AED)': item['price'], 'TAT': '24 HOURS'}
+                     for item in groups['package']],
+        'iv_therapy': [{'IV Therapy': item['name'], 'Selling Price (AED)': item['price']} for item in groups['iv']],
+    }
+
+    # HealthPackageChatbot keeps DataFrames and has no IV therapy sheet
+    health_chatbot = HealthPackageChatbot.__new__(HealthPackageChatbot)
+    health_chatbot.packages_data = {
+        'tests': pd.DataFrame({'Test Name': [item['name'] for item in groups['test'] + groups['iv']],
+                               'Selling Price': [item['price'] for item in groups['test'] + groups['iv']]}),
+        'packages': pd.DataFrame({'Package Name': [item['name'] for item in groups['package']],
+                                  'Selling Price': [item['price'] for item in groups['package']],
+                                  'Turn Around Time': '24 HOURS'}),
+    }
+
+    def ranked(results, categories):
+        matches = [match for category in categories for match in results[category]]
+        return [match['name'] for match in sorted(matches, key=lambda match: match['score'], reverse=True)]
+
+    return {
+        'ServiceManager.search_services':
+            lambda query: [service['name'] for service in service_manager.search_services(query)],
+        'ExcelBasedChatbot.search_services':
+            lambda query: ranked(excel_chatbot.search_services(query), ('tests', 'packages', 'iv_therapy')),
+        'HealthPackageChatbot.search_health_items':
+            lambda query: ranked(health_chatbot.search_health_items(query), ('tests', 'packages')),
+    }
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+def run_engine(search, queries, concept_of, relevant_counts, k, budget, min_queries, alloc_queries):
+    latencies = []
+    recall = {'exact': [], 'typo': [], 'translit': []}
+    deadline = time.perf_counter() + budget
+    for query in queries:
+        start = time.perf_counter()
+        names = search(query['query'])
+        latencies.append(time.perf_counter() - start)
+        hits = sum(1 for name in names[:k] if concept_of[name] == query['concept'])
+        recall[query['kind']].append(hits / min(k, relevant_counts[query['concept']]))
+        if time.perf_counter() > deadline and len(latencies) >= min_queries:
+            break
+
+    # Allocation pass, separate because tracemalloc slows everything down
+    peaks = []
+    tracemalloc.start()
+    for query in queries[:alloc_queries]:
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        search(query['query'])
+        peaks.append(tracemalloc.get_traced_memory()[1] - before)
+    tracemalloc.stop()
+
+    latencies.sort()
+    return {
+        'queries': len(latencies),
+        'p50_ms': round(percentile(latencies, 0.50) * 1e3, 3),
+        'p95_ms': round(percentile(latencies, 0.95) * 1e3, 3),
+        'peak_alloc_kb': round(max(peaks) / 1024, 1) if peaks else 0.0,
+        'recall': {kind: round(sum(values) / len(values), 3) if values else None for kind, values in recall.items()},
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare catalog search engines on synthetic catalogs")
+    parser.add_argument('--sizes', default='100,1000,10000,100000', help="Comma-separated catalog sizes")
+    parser.add_argument('--queries', type=int, default=300, help="Labeled queries in the corpus")
+    parser.add_argument('--k', type=int, default=5, help="Cut-off for recall@k")
+    parser.add_argument('--budget', type=float, default=5.0, help="Seconds of queries per engine and size")
+    parser.add_argument('--min-queries', type=int, default=30, help="Queries run even past the budget (recall sample)")
+    parser.add_argument('--alloc-queries', type=int, default=3, help="Queries traced for allocations")
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--output', help="Save the report as JSON")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    queries = generate_queries(args.queries, rng)
+    workdir = tempfile.mkdtemp()
+    report = []
+
+    print(f"{args.queries} queries (exact / typo / translit), recall@{args.k}, {args.budget:.0f}s budget per engine")
+    print(f"{'items':>7}  {'engine':<41} {'queries':>7} {'p50 ms':>9} {'p95 ms':>9} {'alloc KB':>9} "
+          f"{'exact':>6} {'typo':>6} {'translit':>8}")
+    for size in (int(size) for size in args.sizes.split(',')):
+        items = generate_catalog(size, random.Random(args.seed + size))
+        concept_of = {item['name']: item['concept'] for item in items}
+        relevant_counts = {concept: 0 for concept in CONCEPTS}
+        for item in items:
+            relevant_counts[item['concept']] += 1
+        # Concepts missing from a small catalog have nothing to find
+        corpus = [query for query in queries if relevant_counts[query['concept']]]
+
+        for engine, search in build_engines(items, workdir).items():
+            result = run_engine(search, corpus, concept_of, relevant_counts, args.k, args.budget,
+                                args.min_queries, args.alloc_queries)
+            recall = result['recall']
+            print(f"{size:>7}  {engine:<41} {result['queries']:>7} {result['p50_ms']:>9.3f} {result['p95_ms']:>9.3f} "
+                  f"{result['peak_alloc_kb']:>9.1f} {recall['exact']:>6.2f} {recall['typo']:>6.2f} "
+                  f"{recall['translit']:>8.2f}")
+            report.append({'items': size, 'engine': engine, **result})
+
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            json.dump({'config': vars(args), 'results': report}, output_file, indent=2, ensure_ascii=False)
+
+if __name__ == "__main__":
+    main()
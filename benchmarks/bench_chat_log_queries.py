@@ -0,0 +1,113 @@
+"""
+Chat log dashboard queries on a synthetic chat_logs table.
+
+Compares what the Chat Logs page used to do (load every row, then filter
+in pandas) with the server-side queries it uses now: a filtered first
+page, a deep page reached through the cursor, a phone number prefix
+search and the direction list.
+
+Usage: python benchmarks/bench_chat_log_queries.py [rows]
+"""
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+# Add the parent directory to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import HealthcareDatabase
+
+DIRECTIONS = ['incoming'] * 4 + ['outgoing'] * 4 + ['website_chat', 'reminder']
+
+def populate(db, rows):
+    random.seed(42)
+    start = datetime(2024, 1, 1)
+    conn = sqlite3.connect(db.db_path)
+    batch = []
+    for i in range(rows):
+        batch.append((
+            f"+9715{random.randrange(50000):08d}",
+            f"message {i} " + 'x' * random.randrange(20, 200),
+            f"response {i} " + 'y' * random.randrange(20, 400),
+            random.choice(DIRECTIONS),
+            (start + timedelta(seconds=i * 30)).strftime('%Y-%m-%d %H:%M:%S')
+        ))
+        if len(batch) == 50000:
+            conn.executemany(
+                "INSERT INTO chat_logs (phone_number, message, response, direction, created_at) VALUES (?, ?, ?, ?, ?)",
+                batch
+            )
+            batch = []
+    if batch:
+        conn.executemany(
+            "INSERT INTO chat_logs (phone_number, message, response, direction, created_at) VALUES (?, ?, ?, ?, ?)",
+            batch
+        )
+    conn.commit()
+    conn.close()
+
+def timed(label, func, repeats=5):
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    print(f"  {label:<48} {best * 1e3:9.2f} ms")
+    return result
+
+def load_everything(db, phone_number):
+    # The previous page: SELECT * then filter with pandas
+    conn = sqlite3.connect(db.db_path)
+    cursor = conn.execute("SELECT * FROM chat_logs ORDER BY created_at DESC")
+    columns = [column[0] for column in cursor.description]
+    df = pd.DataFrame([dict(zip(columns, row)) for row in cursor.fetchall()])
+    conn.close()
+    return df[(df['phone_number'] == phone_number) & (df['direction'].isin(['incoming', 'outgoing']))]
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    db = HealthcareDatabase(os.path.join(tempfile.mkdtemp(), 'bench.db'))
+    start = time.perf_counter()
+    populate(db, rows)
+    print(f"{rows} chat logs inserted in {time.perf_counter() - start:.1f}s")
+
+    phone_number = '+971500001234'
+
+    print("before (full load + pandas filter):")
+    old = timed("load all rows, filter phone + direction", lambda: load_everything(db, phone_number), repeats=1)
+
+    print("after (filtered keyset pages in SQLite):")
+    page = timed("first page, no filters", lambda: db.get_chat_logs_page(limit=100))
+    timed("first page, phone + direction", lambda: db.get_chat_logs_page(
+        phone_number=phone_number, directions=['incoming', 'outgoing'], limit=100))
+    timed("first page, one direction + date range", lambda: db.get_chat_logs_page(
+        directions=['reminder'], date_from='2024-03-01', date_to='2024-03-31', limit=100))
+
+    cursor = page['next_cursor']
+    for _ in range(99):
+        cursor = db.get_chat_logs_page(cursor=cursor, limit=100)['next_cursor']
+    timed("page 101 through the cursor", lambda: db.get_chat_logs_page(cursor=cursor, limit=100))
+    timed("phone number prefix search", lambda: db.get_chat_phone_numbers('+97150000'))
+    timed("direction list", db.get_chat_directions)
+
+    # The paged queries must return the same logs the old page showed
+    paged = []
+    cursor = None
+    while True:
+        page = db.get_chat_logs_page(phone_number=phone_number, directions=['incoming', 'outgoing'],
+                                     cursor=cursor, limit=3)
+        paged.extend(log['id'] for log in page['chat_logs'])
+        cursor = page['next_cursor']
+        if cursor is None:
+            break
+    assert paged == list(old['id']), "paged results differ from the full load"
+    print(f"paged results match the full load ({len(paged)} logs for {phone_number})")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Interaction logging throughput: the old per-call append versus the queued JSONL log.
+
+The old utils.log_interaction imported json/datetime, called
+os.makedirs and opened, wrote and closed logs/whatsapp_log.json on every
+call. This times that against InteractionLog.log() from 1 and 8
+threads (time spent by the caller, and until everything is on disk),
+then checks rotation with compression, that every record was written
+exactly once, and that tail() follows the file incrementally.
+
+Usage: python benchmarks/bench_interaction_log.py [records]
+"""
+import glob
+import gzip
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+# Add the parent directory to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from interaction_log import InteractionLog, rotated_files
+
+MESSAGES = [
+    "Hi, I'd like to book a Vitamin D IV for tomorrow at 4pm",
+    "كم سعر فحص فيتامين د؟",
+    "Thanks! See you then.",
+    "What packages do you have for women over 40?",
+]
+
+def old_log_interaction(directory, phone_number, message_type, content):
+    # The previous utils.log_interaction, writing under `directory`
+    try:
+        import json
+        from datetime import datetime
+
+        log_entry = {
+            'timestamp': datetime.now().isoformat(),
+            'phone_number': phone_number,
+            'type': message_type,
+            'content': content
+        }
+
+        os.makedirs(directory, exist_ok=True)
+
+        with open(os.path.join(directory, 'whatsapp_log.json'), 'a') as log_file:
+            json.dump(log_entry, log_file)
+            log_file.write('\n')
+
+    except Exception as e:
+        print(f"Interaction Logging Error: {e}")
+
+def run(threads, records, log):
+    per_thread = records // threads
+
+    def worker(number):
+        for i in range(per_thread):
+            log(f"+9715{number:02d}{i:06d}", 'incoming', MESSAGES[i % len(MESSAGES)])
+
+    workers = [threading.Thread(target=worker, args=(number,)) for number in range(threads)]
+    start = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return time.perf_counter() - start
+
+def count_lines(paths):
+    total = 0
+    for path in paths:
+        opener = gzip.open if path.endswith('.gz') else open
+        with opener(path, 'rb') as log_file:
+            total += sum(1 for _ in log_file)
+    return total
+
+def main():
+    records = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+
+    for threads in (1, 8):
+        directory = tempfile.mkdtemp()
+        elapsed = run(threads, records, lambda *args: old_log_interaction(directory, *args))
+        print(f"old log_interaction, {threads} thread(s): {elapsed / records * 1e6:6.1f} us/record, "
+              f"{records / elapsed:9,.0f} records/s")
+
+        log = InteractionLog(directory=tempfile.mkdtemp(), queue_size=records, rotate_seconds=0)
+        elapsed = run(threads, records, log.log)
+        start = time.perf_counter()
+        log.stop()
+        drained = time.perf_counter() - start
+        print(f"InteractionLog,      {threads} thread(s): {elapsed / records * 1e6:6.1f} us/record for the caller, "
+              f"{records / elapsed:9,.0f} records/s, queue drained {drained:.2f}s later")
+
+    # Throughput to disk, rotation and compression with a small size limit
+    directory = tempfile.mkdtemp()
+    log = InteractionLog(directory=directory, max_bytes=4 << 20, rotate_seconds=0, backup_count=100,
+                         queue_size=records)
+    start = time.perf_counter()
+    run(1, records, log.log)
+    log.stop()
+    elapsed = time.perf_counter() - start
+    rotated = rotated_files(log.path)
+    written = count_lines(rotated + [log.path])
+    raw = sum(os.path.getsize(path) for path in glob.glob(os.path.join(directory, '*')))
+    print(f"written to disk with 4 MB rotation: {records / elapsed:,.0f} records/s end to end, "
+          f"{len(rotated)} rotated files (gzip), {raw / 1e6:.1f} MB on disk")
+    assert written == records, f"{written} records on disk, expected {records}"
+    print(f"  all {records} records written exactly once")
+
+    # Dashboards follow the active file with tail()
+    log = InteractionLog(directory=tempfile.mkdtemp(), flush_interval=0.05)
+    offset = 0
+    seen = 0
+    for batch in range(5):
+        for i in range(1000):
+            log.log('+971500000000', 'outgoing', f"reply {batch}-{i}", channel='whatsapp')
+        time.sleep(0.2)
+        start = time.perf_counter()
+        new, offset = log.tail(offset, limit=10000)
+        seen += len(new)
+    print(f"tail(): {seen} records seen over 5 polls, last poll {(time.perf_counter() - start) * 1e3:.2f} ms")
+    assert seen == 5000
+    recent, _ = log.recent(10)
+    assert [record['content'] for record in recent] == [f"reply 4-{i}" for i in range(990, 1000)]
+    log.stop()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Check that concurrent WhatsApp webhooks fill the GPT-4 concurrency cap
+and that the rest are shed to the structured chatbot.
+
+Posts --webhooks concurrent "hello" messages from distinct numbers to
+POST /webhook/whatsapp (main.app, in process over ASGI, signature
+validation off). GPT-4 is replaced by a blocking call that sleeps and
+counts how many calls overlap; chat logging goes to a temporary database.
+With the handler's blocking work offloaded, the number of overlapping
+GPT-4 calls should reach LLM_MAX_CONCURRENCY, every other webhook should
+be answered from the chatbot and counted in llm_requests_shed_total, and
+the run should take about one GPT-4 call rather than one per webhook.
+
+Usage: python benchmarks/bench_llm_shedding.py [--webhooks 24] [--limit 4] [--gpt-seconds 0.5]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import threading
+import time
+
+# Add the parent directory to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--webhooks', type=int, default=24)
+    parser.add_argument('--limit', type=int, default=4, help='LLM_MAX_CONCURRENCY')
+    parser.add_argument('--gpt-seconds', type=float, default=0.5, help='latency of the fake GPT-4 call')
+    return parser.parse_args()
+
+args = parse_args()
+os.environ['LLM_MAX_CONCURRENCY'] = str(args.limit)
+os.environ['TWILIO_VALIDATE_SIGNATURE'] = 'false'
+os.environ.setdefault('IO_POOL_WORKERS', '64')
+os.environ.setdefault('REMINDERS_ENABLED', 'false')
+os.environ.setdefault('HEALTHCARE_DB_PATH', os.path.join(tempfile.mkdtemp(), 'bench.db'))
+
+import httpx
+import main
+from rate_limit import llm_requests_shed_total
+
+class FakeGPT:
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.calls = 0
+        self.in_flight = 0
+        self.peak = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, message, context=None, language=None):
+        with self.lock:
+            self.calls += 1
+            self.in_flight += 1
+            self.peak = max(self.peak, self.in_flight)
+        time.sleep(self.seconds)
+        with self.lock:
+            self.in_flight -= 1
+        return f"AI answer to {message}"
+
+async def run(webhooks):
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url='http://bench') as client:
+        async def post(number):
+            response = await client.post('/webhook/whatsapp', data={
+                'From': f'whatsapp:+97150{number:07d}',
+                'Body': 'hello',
+                'MessageSid': f'SMshed{number:08d}',
+            })
+            response.raise_for_status()
+            return response.text
+
+        start = time.perf_counter()
+        replies = await asyncio.gather(*[post(number) for number in range(webhooks)])
+        return replies, time.perf_counter() - start
+
+def main_bench():
+    fake_gpt = FakeGPT(args.gpt_seconds)
+    main.generate_gpt4_response = fake_gpt
+    shed_before = llm_requests_shed_total.value(channel='whatsapp')
+
+    replies, elapsed = asyncio.run(run(args.webhooks))
+    shed = llm_requests_shed_total.value(channel='whatsapp') - shed_before
+    from_gpt = sum('AI answer to' in reply for reply in replies)
+    from_chatbot = sum('Welcome' in reply and 'AI answer to' not in reply for reply in replies)
+
+    print(f"{args.webhooks} concurrent webhooks, LLM_MAX_CONCURRENCY={args.limit}, GPT-4 {args.gpt_seconds * 1e3:.0f} ms")
+    print(f"  peak concurrent GPT-4 calls: {fake_gpt.peak}")
+    print(f"  answered by GPT-4: {from_gpt}; shed to the chatbot: {from_chatbot} "
+          f"(llm_requests_shed_total +{shed:.0f})")
+    print(f"  wall time: {elapsed:.2f}s (one GPT-4 call per webhook in turn would be "
+          f"{args.webhooks * args.gpt_seconds:.1f}s)")
+    main.executor.shutdown()
+
+    assert fake_gpt.peak == args.limit, f"GPT-4 calls peaked at {fake_gpt.peak}, cap is {args.limit}"
+    assert shed > 0 and shed == args.webhooks - fake_gpt.calls, "extra webhooks were not shed"
+    assert from_gpt == fake_gpt.calls and from_chatbot == shed, "replies do not match the GPT-4/shed split"
+    print("\nconcurrent webhooks reach the cap and the rest are shed")
+
+if __name__ == "__main__":
+    main_bench()
@@ -0,0 +1,107 @@
+"""
+Chat log and payment query timings before and after migration 2.
+
+Builds a database with a large chat_logs and payments table at schema
+version 1, times the queries used by dashboard/ChatLogs.py and Stripe
+session lookups, applies the pending migrations while a reader thread keeps
+querying (to show reads are not blocked), and times the queries again.
+
+Usage: python benchmarks/bench_migrations.py [chat_rows] [payment_rows]
+"""
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+# Add the parent directory to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import HealthcareDatabase
+from migrations import apply_migrations, get_schema_version
+
+def populate(db_path, chat_rows, payment_rows):
+    random.seed(7)
+    conn = sqlite3.connect(db_path)
+    conn.executemany(
+        "INSERT INTO chat_logs (phone_number, message, response, direction, created_at) "
+        "VALUES (?, ?, ?, ?, datetime('2024-01-01', '+' || ? || ' seconds'))",
+        (
+            (f"+9715{random.randrange(50000):08d}", 'Do you have a vitamin D test?', 'Yes, AED 150.',
+             random.choice(['incoming', 'outgoing', 'website_chat']), i * 30)
+            for i in range(chat_rows)
+        )
+    )
+    conn.executemany(
+        "INSERT INTO payments (phone_number, service, amount, status, session_id) VALUES (?, ?, ?, ?, ?)",
+        (
+            (f"+9715{random.randrange(50000):08d}", 'Basic Health Check Up', 1399,
+             random.choice(['Pending', 'Paid']), f"cs_test_{i:024d}")
+            for i in range(payment_rows)
+        )
+    )
+    conn.commit()
+    conn.close()
+
+def run_queries(db_path, payment_rows):
+    conn = sqlite3.connect(db_path)
+    queries = [
+        ("latest 100 chat logs", "SELECT * FROM chat_logs ORDER BY created_at DESC LIMIT 100", ()),
+        ("one phone's chat history", "SELECT * FROM chat_logs WHERE phone_number = ? ORDER BY created_at DESC LIMIT 100",
+         ("+971500001234",)),
+        ("payment by Stripe session id", "SELECT * FROM payments WHERE session_id = ?",
+         (f"cs_test_{payment_rows // 2:024d}",)),
+    ]
+    for label, sql, params in queries:
+        conn.execute(sql, params).fetchall()
+        runs = 10
+        start = time.perf_counter()
+        for _ in range(runs):
+            conn.execute(sql, params).fetchall()
+        print(f"  {label:<32} {(time.perf_counter() - start) / runs * 1e3:9.2f} ms")
+    conn.close()
+
+def main():
+    chat_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    payment_rows = int(sys.argv[2]) if len(sys.argv) > 2 else 200000
+
+    db = HealthcareDatabase(os.path.join(tempfile.mkdtemp(), 'bench.db'))
+    conn = sqlite3.connect(db.db_path)
+    for name in ('idx_chat_logs_created', 'idx_chat_logs_phone_created', 'idx_payments_session'):
+        conn.execute(f"DROP INDEX {name}")
+    conn.execute('DELETE FROM schema_migrations WHERE version >= 2')
+    conn.commit()
+    conn.close()
+
+    populate(db.db_path, chat_rows, payment_rows)
+    print(f"schema version {get_schema_version(db.db_path)}, {chat_rows} chat logs, {payment_rows} payments")
+    run_queries(db.db_path, payment_rows)
+
+    # Keep reading while the migration builds indexes
+    stop = threading.Event()
+    read_latencies = []
+
+    def reader():
+        reader_conn = sqlite3.connect(db.db_path, timeout=60)
+        while not stop.is_set():
+            start = time.perf_counter()
+            reader_conn.execute('SELECT COUNT(*) FROM payments WHERE status = ?', ('Pending',)).fetchone()
+            read_latencies.append(time.perf_counter() - start)
+        reader_conn.close()
+
+    thread = threading.Thread(target=reader)
+    thread.start()
+    start = time.perf_counter()
+    apply_migrations(db.db_path, verbose=True)
+    elapsed = time.perf_counter() - start
+    stop.set()
+    thread.join()
+
+    print(f"migrated to version {get_schema_version(db.db_path)} in {elapsed:.1f}s; "
+          f"{len(read_latencies)} concurrent reads, max read latency {max(read_latencies) * 1e3:.1f} ms")
+    run_queries(db.db_path, payment_rows)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Payment link latency against a local Stripe stub.
+
+Simulates users typing "pay" (several times each, as happens when a link
+is not opened straight away) and compares the old path - a new Checkout
+Session with inline price data on every request - against the session
+cache and pre-created catalog Prices, both called with run_io from many
+concurrent coroutines, as async handlers must.
+
+Usage: python benchmarks/bench_payment_links.py [users] [requests_per_user] [latency_ms]
+"""
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+# Add the parent directory to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+os.environ['STRIPE_SECRET_KEY'] = 'sk_test_benchmark'
+
+import stripe
+import payments
+from executor import run_io
+from database import HealthcareDatabase
+from fake_stripe import FakeStripe
+from services import service_manager
+
+async def run(users, per_user):
+    services = [service['name'] for service in service_manager.get_all_services()]
+    latencies = []
+
+    async def one(phone, service):
+        start = time.perf_counter()
+        url = await run_io(payments.create_payment_link, phone, service)
+        latencies.append(time.perf_counter() - start)
+        assert url.startswith('https://'), url
+
+    start = time.perf_counter()
+    for _ in range(per_user):
+        await asyncio.gather(*[
+            one(f"+9715{user:08d}", services[user % len(services)]) for user in range(users)
+        ])
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return elapsed, statistics.median(latencies), latencies[int(len(latencies) * 0.95)]
+
+def report(label, fake, elapsed, p50, p95):
+    print(f"  {label:<28} {elapsed:6.2f}s  p50 {p50 * 1e3:7.1f} ms  p95 {p95 * 1e3:7.1f} ms  "
+          f"{fake.requests:5d} Stripe calls  {fake.created_sessions:5d} sessions created")
+
+def main():
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    per_user = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    latency = (float(sys.argv[3]) if len(sys.argv) > 3 else 150) / 1000
+
+    fake = FakeStripe([], latency=latency).start()
+    stripe.api_base = fake.url
+    payments.db = HealthcareDatabase(os.path.join(tempfile.mkdtemp(), 'bench.db'))
+    print(f"{users} users x {per_user} pay requests, {latency * 1000:.0f} ms simulated Stripe latency")
+
+    # Old behaviour: no cache, inline price data
+    payments.checkout_sessions.ttl_seconds = 1800
+    payments.checkout_sessions.max_entries = 0
+    report("new session every time", fake, *asyncio.run(run(users, per_user)))
+
+    fake.requests = fake.created_sessions = 0
+    start = time.perf_counter()
+    loaded = payments.price_catalog.load()
+    print(f"  loaded {loaded} catalog Prices in {time.perf_counter() - start:.2f}s ({fake.requests} Stripe calls)")
+
+    fake.requests = fake.created_sessions = 0
+    payments.checkout_sessions.max_entries = 10000
+    payments.checkout_sessions.hits = payments.checkout_sessions.misses = 0
+    report("session cache + Prices", fake, *asyncio.run(run(users, per_user)))
+    cache = payments.checkout_sessions
+    print(f"  cache hits {cache.hits}, misses {cache.misses}")
+    fake.stop()
+
+if __name__ == "__main__":
+    main()
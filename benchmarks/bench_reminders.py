@@ -0,0 +1,138 @@
+"""
+Reminder scheduler simulation with 100k scheduled reminders.
+
+Books appointments spread over the next week into a fresh database and
+drives ReminderScheduler.run_due() with a simulated clock that jumps
+straight to each requested wake-up time. Halfway through, the scheduler
+is killed in the middle of a batch (the sender raises an exception the
+scheduler does not catch after 20 more deliveries) and a new one is
+created on the same database (a restart); a few appointments are cancelled and sends fail at random to exercise the
+retry path. Checks that every reminder is sent exactly once and reports
+wake-ups (versus polling once per second), send lateness and real time.
+
+Usage: python benchmarks/bench_reminders.py [appointments] [send_rate]
+"""
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+# Add the parent directory to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import HealthcareDatabase
+from reminders import ReminderScheduler
+
+SLOT_TIMES = ['09:00', '11:00', '14:00', '16:00']
+
+class ProcessKilled(BaseException):
+    pass
+
+class SimulatedWhatsApp:
+    def __init__(self, failure_rate):
+        self.failure_rate = failure_rate
+        self.deliveries = Counter()
+        self.sent_at = {}
+        self.now = 0.0
+        self.crash_after = None
+
+    def send(self, phone_number, message):
+        if self.crash_after is not None:
+            if self.crash_after == 0:
+                self.crash_after = None
+                raise ProcessKilled()
+            self.crash_after -= 1
+        if random.random() < self.failure_rate:
+            return None
+        self.deliveries[(phone_number, message)] += 1
+        self.sent_at.setdefault((phone_number, message), self.now)
+        return f"SM{len(self.sent_at):032d}"
+
+def book(db_path, count, start):
+    random.seed(3)
+    conn = sqlite3.connect(db_path)
+    conn.executemany(
+        "INSERT INTO appointments (phone_number, service, date, time, status) VALUES (?, ?, ?, ?, 'Confirmed')",
+        [
+            (f"+9715{i:08d}", 'Basic Health Check Up',
+             (start + timedelta(days=2 + random.randrange(7))).date().isoformat(), random.choice(SLOT_TIMES))
+            for i in range(count)
+        ]
+    )
+    # A few cancellations that must not get a reminder
+    conn.execute("UPDATE appointments SET status = 'Cancelled' WHERE id % 1000 = 0")
+    conn.commit()
+    conn.close()
+
+def make_scheduler(db_path, whatsapp, send_rate, start):
+    return ReminderScheduler(db_path=db_path, lead_minutes=[1440], send_rate=send_rate, batch_size=50,
+                             sync_interval=60, full_sync_interval=3600, sender=whatsapp.send,
+                             clock=lambda: start.timestamp())
+
+def simulate(scheduler, whatsapp, now, until):
+    wakeups = 0
+    while now < until:
+        whatsapp.now = now
+        next_at = scheduler.run_due(now)
+        wakeups += 1
+        now = max(next_at, now + 1e-3)
+    return now, wakeups
+
+def main():
+    appointments = int(sys.argv[1]) if len(sys.argv) > 1 else 101000
+    send_rate = float(sys.argv[2]) if len(sys.argv) > 2 else 10
+
+    db = HealthcareDatabase(os.path.join(tempfile.mkdtemp(), 'bench.db'))
+    start = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    book(db.db_path, appointments, start)
+    whatsapp = SimulatedWhatsApp(failure_rate=0.01)
+    t0 = start.timestamp()
+    end = (start + timedelta(days=10)).timestamp()
+
+    wall = time.perf_counter()
+    scheduler = make_scheduler(db.db_path, whatsapp, send_rate, start)
+    scheduler.sync(t0, full=True)
+    scheduled = scheduler.stats().get('pending', 0)
+    print(f"{appointments} appointments booked, {scheduled} reminders scheduled, send rate {send_rate:.0f}/s")
+
+    now, wakeups_before = simulate(scheduler, whatsapp, t0, t0 + 5 * 86400)
+    whatsapp.crash_after = 20
+    try:
+        simulate(scheduler, whatsapp, now, end)
+    except ProcessKilled:
+        now = whatsapp.now
+    conn = sqlite3.connect(db.db_path)
+    (sending,) = conn.execute("SELECT COUNT(*) FROM appointment_reminders WHERE status = 'sending'").fetchone()
+    conn.close()
+    print(f"  killed mid-batch after day 5: {sum(whatsapp.deliveries.values())} sent so far, "
+          f"{sending} claimed but not sent")
+    assert sending > 0, "the kill did not land inside a batch"
+    scheduler = make_scheduler(db.db_path, whatsapp, send_rate, start)
+    now, wakeups_after = simulate(scheduler, whatsapp, now, end)
+    wall = time.perf_counter() - wall
+
+    conn = sqlite3.connect(db.db_path)
+    rows = conn.execute('SELECT phone_number, message, send_at, status FROM appointment_reminders').fetchall()
+    conn.close()
+    stats = Counter(status for _, _, _, status in rows)
+    duplicates = sum(1 for n in whatsapp.deliveries.values() if n > 1)
+    lateness = sorted(whatsapp.sent_at[(phone, message)] - send_at
+                      for phone, message, send_at, status in rows if status == 'sent')
+
+    wakeups = wakeups_before + wakeups_after
+    print(f"  statuses: {dict(stats)}")
+    print(f"  wake-ups: {wakeups} (polling every second for 10 days: {10 * 86400})")
+    print(f"  lateness: p50 {lateness[len(lateness) // 2]:.1f}s  p99 {lateness[int(len(lateness) * 0.99)]:.1f}s  "
+          f"max {lateness[-1]:.1f}s (bursts of reminders share a send time)")
+    print(f"  duplicates: {duplicates}, real time: {wall:.1f}s")
+    assert duplicates == 0
+    assert stats['sent'] + stats['failed'] == scheduled
+    assert not any(status == 'sent' for phone, message, _, status in rows
+                   if int(phone[-8:]) % 1000 == 999)  # appointment ids divisible by 1000 were cancelled
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Home dashboard KPIs: scanning the source tables versus the daily rollups.
+
+Inserts appointments and payments through HealthcareDatabase (so the
+rollup triggers from migration 5 run), applies status changes and
+deletes, checks the rollups with rollups.verify_rollups(), and times the
+Home summary both ways. Also measures what the triggers add to inserts
+and shows the checker catching and repairing a corrupted rollup.
+
+Usage: python benchmarks/bench_rollups.py [rows]
+"""
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+# Add the parent directory to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analytics import AnalyticsStore
+from database import HealthcareDatabase
+from rollups import verify_rollups
+
+SERVICES = [('Basic Health Check Up', 350.0), ('Vitamin D', 150.0), ('NAD 250mg', 1200.0), ('Immune Boost', 600.0)]
+
+def appointment_rows(rows):
+    random.seed(3)
+    start = datetime(2023, 1, 1)
+    return [{
+        'phone_number': f"+9715{random.randrange(50000):08d}",
+        'service': random.choice(SERVICES)[0],
+        'date': '2030-01-01',
+        'time': '09:00',
+        'status': random.choice(['Pending', 'Confirmed']),
+        'created_at': (start + timedelta(minutes=i)).strftime('%Y-%m-%d %H:%M:%S'),
+    } for i in range(rows)]
+
+def insert_payments(db, rows):
+    random.seed(4)
+    start = datetime(2023, 1, 1)
+    conn = sqlite3.connect(db.db_path)
+    conn.executemany(
+        'INSERT INTO payments (phone_number, service, amount, status, session_id, created_at) VALUES (?, ?, ?, ?, ?, ?)',
+        [(f"+9715{i:08d}", *random.choice(SERVICES), 'Pending', f"cs_{i}",
+          (start + timedelta(minutes=i)).strftime('%Y-%m-%d %H:%M:%S')) for i in range(rows)]
+    )
+    conn.commit()
+    conn.close()
+
+def scan_summary(db_path):
+    # What the Home page computed: every row, every render
+    conn = sqlite3.connect(db_path)
+    appointments = conn.execute('SELECT COUNT(*) FROM appointments').fetchone()[0]
+    revenue, pending = conn.execute(
+        "SELECT COALESCE(SUM(amount), 0), COUNT(CASE WHEN status = 'Pending' THEN 1 END) FROM payments"
+    ).fetchone()
+    conn.close()
+    return {'appointments': appointments, 'revenue': revenue, 'pending_payments': pending}
+
+def timed(label, func, repeats=5):
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    print(f"  {label:<44} {best * 1e3:9.2f} ms")
+    return result
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    db = HealthcareDatabase(os.path.join(tempfile.mkdtemp(), 'bench.db'))
+    plain = HealthcareDatabase(os.path.join(tempfile.mkdtemp(), 'plain.db'))
+    with sqlite3.connect(plain.db_path) as conn:
+        for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'").fetchall():
+            conn.execute(f'DROP TRIGGER {name}')
+
+    sample = appointment_rows(100000)
+    for label, target in [("without triggers", plain), ("with rollup triggers", db)]:
+        start = time.perf_counter()
+        target.save_appointments_bulk(sample)
+        print(f"100000 appointments inserted {label}: {time.perf_counter() - start:.2f}s")
+
+    db.save_appointments_bulk(appointment_rows(rows - len(sample)))
+    insert_payments(db, rows)
+    print(f"{rows} appointments and {rows} payments")
+
+    # Status changes and deletes through the normal code paths
+    ids = random.sample(range(1, rows + 1), 20000)
+    db.update_appointment_statuses([(appointment_id, 'Cancelled') for appointment_id in ids[:10000]])
+    db.update_payment_statuses([(f"cs_{i}", 'Paid') for i in ids[10000:]])
+    with sqlite3.connect(db.db_path) as conn:
+        conn.execute('DELETE FROM appointments WHERE id IN (SELECT id FROM appointments ORDER BY id DESC LIMIT 500)')
+        conn.execute("UPDATE payments SET amount = amount * 0.9 WHERE id % 1000 = 0")
+
+    start = time.perf_counter()
+    differences = verify_rollups(db.db_path)
+    print(f"consistency check: {sum(map(len, differences.values()))} differences "
+          f"({time.perf_counter() - start:.2f}s)")
+    assert not any(differences.values()), differences
+
+    print("Home summary:")
+    expected = timed("scan source tables", lambda: scan_summary(db.db_path))
+    store = AnalyticsStore(db, backend='sqlite', cache_ttl=0)
+    summary = timed("daily rollups (AnalyticsStore)", store.summary)
+    timed("30-day chart from rollups", lambda: store.daily_totals(days=30))
+    assert summary['appointments'] == expected['appointments']
+    assert summary['pending_payments'] == expected['pending_payments']
+    assert abs(summary['revenue'] - expected['revenue']) < 0.01
+    with sqlite3.connect(db.db_path) as conn:
+        groups = conn.execute('SELECT COUNT(*) FROM payment_daily_rollup').fetchone()[0]
+    print(f"  rollup rows read: {groups} (source rows: {rows})")
+
+    with sqlite3.connect(db.db_path) as conn:
+        conn.execute("UPDATE appointment_daily_rollup SET appointments = appointments + 1 "
+                     "WHERE day = (SELECT MIN(day) FROM appointment_daily_rollup)")
+    found = verify_rollups(db.db_path, repair=True)
+    print(f"corrupted rollup: {len(found['appointment_daily_rollup'])} groups flagged and rebuilt")
+    assert found['appointment_daily_rollup'] and not any(verify_rollups(db.db_path).values())
+
+if __name__ == "__main__":
+    main()
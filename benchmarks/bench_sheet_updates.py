@@ -0,0 +1,92 @@
+"""
+Dashboard status actions: find() + update_cell() versus batch updates.
+
+Against fake Google Sheets (benchmarks/fake_sheets.py) with a per-request
+latency, changes the status of 25 appointments the way the dashboard used
+to (a remote find() scan and an update_cell() per appointment) and then
+with AnalyticsStore.update_statuses() (the mirror's id -> row index and
+one batch_update). Then deletes a row in the sheet so every later row
+moves up, and checks that the next batch still writes the right rows.
+Finally runs the same API against the SQLite backend.
+
+Usage: python benchmarks/bench_sheet_updates.py [rows] [latency_seconds]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+# Add the parent directory to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analytics import AnalyticsStore, SheetsMirror
+from database import HealthcareDatabase
+from fake_sheets import FakeSheetsClient
+
+HEADER = ['ID', 'Phone Number', 'Service', 'Date', 'Status', 'Time']
+
+def sheet_rows(rows):
+    random.seed(11)
+    return [HEADER] + [
+        [i, f"+9715{random.randrange(50000):08d}", 'Vitamin D', '2030-01-01', 'Pending', '09:00']
+        for i in range(1, rows + 1)
+    ]
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    latency = float(sys.argv[2]) if len(sys.argv) > 2 else 0.2
+    db = HealthcareDatabase(os.path.join(tempfile.mkdtemp(), 'bench.db'))
+    client = FakeSheetsClient({'Healthcare Appointments': sheet_rows(rows)}, latency=latency)
+    worksheet = client.spreadsheets['Healthcare Appointments'].sheet1
+    print(f"{rows} appointments in the sheet, {latency * 1e3:.0f} ms per Sheets request")
+
+    targets = random.sample(range(1, rows + 1), 25)
+
+    client.reset_counters()
+    start = time.perf_counter()
+    for appointment_id in targets:
+        cell = worksheet.find(str(appointment_id))
+        worksheet.update_cell(cell.row, 5, 'Confirmed')
+    print(f"  find() + update_cell() x25:       {time.perf_counter() - start:6.2f}s  "
+          f"{client.requests} requests, {client.cells:,} cells")
+
+    mirror = SheetsMirror(db.db_path, client_factory=lambda: client)
+    store = AnalyticsStore(db, backend='sheets', mirror=mirror)
+    client.reset_counters()
+    start = time.perf_counter()
+    mirror.sync('appointments', full=True)
+    print(f"  mirror first sync (once):          {time.perf_counter() - start:6.2f}s  "
+          f"{client.requests} requests, {client.cells:,} cells")
+
+    def batch(label, targets):
+        client.reset_counters()
+        start = time.perf_counter()
+        results = store.update_statuses('appointments', [(appointment_id, 'Cancelled') for appointment_id in targets])
+        print(f"  {label:<35}{time.perf_counter() - start:6.2f}s  "
+              f"{client.requests} requests, {client.cells:,} cells")
+        assert list(results.values()).count('updated') == len(targets), results
+
+    batch("batch update x25:", random.sample(range(1, rows + 1), 25))
+
+    # Every row below row 10 moves up one; the index must notice before writing
+    worksheet.delete_rows(10)
+    targets = random.sample(range(20, rows + 1), 25)
+    before = {row[0]: row[4] for row in worksheet.rows[1:]}
+    batch("batch update x25 after a row delete:", targets)
+    changed = [row[0] for row in worksheet.rows[1:] if before[row[0]] != row[4]]
+    assert sorted(changed, key=int) == sorted(map(str, targets), key=int), "wrong rows were written"
+    print("    only the requested appointments changed")
+
+    results = store.update_statuses('appointments', [(targets[0], 'Cancelled'), (rows + 5, 'Cancelled')])
+    assert results == {targets[0]: 'unchanged', rows + 5: 'not_found'}, results
+
+    # The same API against SQLite
+    sqlite_store = AnalyticsStore(db, backend='sqlite')
+    appointment_id = db.save_appointment('+971500000001', 'Vitamin D', '2030-01-01', '09:00')
+    db.save_payment('+971500000001', 'Vitamin D', 150.0, 'cs_bench_1')
+    print(f"  sqlite appointments: {sqlite_store.update_statuses('appointments', [(appointment_id, 'Confirmed'), (999999, 'Confirmed')])}")
+    print(f"  sqlite payments:     {sqlite_store.update_statuses('payments', [('cs_bench_1', 'Paid'), ('cs_missing', 'Paid')])}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+"""
+Many simultaneous bookers competing for the same few slots.
+
+Spawns worker processes (like multiple uvicorn workers), each with several
+threads, all trying to reserve the next available slot at once. Verifies
+that no slot ends up over capacity and that every successful reservation
+is accounted for, then reports throughput, CAS retries and
+next-available query latency. Also checks that cancelling appointments
+through update_appointment_statuses gives their places back, and that
+reinstating one takes its place again, and that free-text bookings
+(booking.save_appointment) only book slot times, through the inventory.
+
+Usage: python benchmarks/bench_slot_contention.py [processes] [threads] [attempts_per_thread]
+"""
+import multiprocessing
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+
+# Add the parent directory to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import booking
+import slots
+from database import HealthcareDatabase, db
+from slots import SlotInventory
+
+START = date(2030, 1, 1)
+DAYS = 5
+CAPACITY = 3
+
+def booker(db_path, thread_count, attempts, results):
+    inventory = SlotInventory(db_path=db_path, capacity=CAPACITY, horizon_days=DAYS)
+    successes = []
+
+    def run():
+        won = 0
+        for _ in range(attempts):
+            available = inventory.next_available(1, start=START)
+            if not available:
+                break
+            slot_date, slot_time, _ = available[0]
+            if inventory.reserve(slot_date, slot_time):
+                won += 1
+        successes.append(won)
+
+    threads = [threading.Thread(target=run) for _ in range(thread_count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    results.put((sum(successes), inventory.cas_retries))
+
+def cancellation_check():
+    database = HealthcareDatabase(os.path.join(tempfile.mkdtemp(), 'cancel.db'))
+    inventory = SlotInventory(db_path=database.db_path, capacity=CAPACITY, horizon_days=DAYS)
+    inventory.ensure_days(START, DAYS)
+    # The global listener follows the global db; wire this inventory to this database the same way
+    assert slots._on_appointments_changed in db._change_listeners
+    database.add_change_listener(inventory.on_appointments_changed)
+
+    slot_date, slot_time = START.isoformat(), inventory.slot_times[0]
+    ids = []
+    for number in range(CAPACITY):
+        assert inventory.reserve(slot_date, slot_time)
+        ids.append(database.save_appointment(f"+9715{number:08d}", 'Basic Health Check Up',
+                                             slot_date, slot_time, status='Confirmed'))
+    assert inventory.remaining(slot_date, slot_time) == 0
+
+    database.update_appointment_statuses([(ids[0], 'Cancelled'), (ids[1], 'Cancelled'), (ids[2], 'Completed')])
+    after_cancel = inventory.remaining(slot_date, slot_time)
+    database.update_appointment_statuses([(ids[1], 'Confirmed')])
+    after_reinstate = inventory.remaining(slot_date, slot_time)
+    # Cancelling again a cancelled appointment changes nothing and frees nothing
+    database.update_appointment_statuses([(ids[0], 'Cancelled')])
+
+    print(f"cancellations: 2 of {CAPACITY} cancelled -> {after_cancel} places free, "
+          f"1 reinstated -> {after_reinstate} free")
+    assert after_cancel == 2 and after_reinstate == 1
+    assert inventory.remaining(slot_date, slot_time) == 1
+
+def booking_check():
+    database = HealthcareDatabase(os.path.join(tempfile.mkdtemp(), 'booking.db'))
+    inventory = SlotInventory(db_path=database.db_path, capacity=1, horizon_days=DAYS)
+    booking.db, booking.slot_inventory = database, inventory
+    tomorrow = (date.today() + timedelta(days=1)).isoformat()
+
+    def appointments():
+        return sqlite3.connect(database.db_path).execute('SELECT COUNT(*) FROM appointments').fetchone()[0]
+
+    off_grid = booking.save_appointment('+971500000001', 'Basic Health Check Up tomorrow at 12:30am')
+    assert 'start at' in off_grid and appointments() == 0, off_grid
+
+    booked = booking.save_appointment('+971500000001', 'Basic Health Check Up tomorrow at 9am')
+    full = booking.save_appointment('+971500000002', 'Basic Health Check Up tomorrow at 9am')
+    assert booked.startswith('Appointment booked') and 'fully booked' in full, (booked, full)
+    assert inventory.remaining(tomorrow, '09:00') == 0 and appointments() == 1
+
+    # A place held in the booking conversation is not free for a free-text booking
+    holds = inventory.offer_slots('+971500000003', count=1)
+    held = booking.save_appointment('+971500000004', f"Basic Health Check Up {holds[0]['date']} "
+                                                     f"at {holds[0]['slot_time']}")
+    assert 'fully booked' in held, held
+
+    # A failed insert gives the reserved place back
+    save = database.save_appointment
+    database.save_appointment = lambda **kwargs: None
+    failed = booking.save_appointment('+971500000005', 'Basic Health Check Up tomorrow at 4pm')
+    database.save_appointment = save
+    assert failed.startswith('Unable') and inventory.remaining(tomorrow, '16:00') == 1, failed
+
+    print("free-text bookings: off-grid time rejected, full and held slots refused, failed insert released")
+
+def main():
+    processes = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else 16
+    attempts = int(sys.argv[3]) if len(sys.argv) > 3 else 10
+
+    db_path = os.path.join(tempfile.mkdtemp(), 'slots.db')
+    inventory = SlotInventory(db_path=db_path, capacity=CAPACITY, horizon_days=DAYS)
+    inventory.ensure_days(START, DAYS)
+    total_capacity = DAYS * len(inventory.slot_times) * CAPACITY
+
+    results = multiprocessing.Queue()
+    workers = [
+        multiprocessing.Process(target=booker, args=(db_path, threads, attempts, results))
+        for _ in range(processes)
+    ]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    outcomes = [results.get() for _ in workers]
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - start
+
+    reserved = sum(won for won, _ in outcomes)
+    retries = sum(retry for _, retry in outcomes)
+    conn = sqlite3.connect(db_path)
+    booked, overbooked = conn.execute(
+        'SELECT SUM(booked), SUM(booked > capacity) FROM slot_inventory'
+    ).fetchone()
+
+    print(f"bookers: {processes} processes x {threads} threads, {attempts} attempts each")
+    print(f"capacity: {total_capacity} places, reserved: {reserved}, booked in table: {booked}, "
+          f"overbooked slots: {overbooked}")
+    print(f"elapsed: {elapsed:.2f}s, CAS retries: {retries}")
+    assert reserved == booked == total_capacity and overbooked == 0
+    cancellation_check()
+    booking_check()
+
+    # Query cost of the availability index on a large inventory
+    big = SlotInventory(db_path=os.path.join(tempfile.mkdtemp(), 'big.db'), capacity=CAPACITY, horizon_days=3650)
+    big.ensure_days(START, 3650)
+    big_conn = sqlite3.connect(big.db_path)
+    big_conn.execute("UPDATE slot_inventory SET booked = capacity WHERE date < '2039-01-01'")
+    big_conn.commit()
+    big.next_available(4, start=START)
+    runs = 200
+    t0 = time.perf_counter()
+    for _ in range(runs):
+        big.next_available(4, start=START)
+    print(f"next_available(4) with 9 years fully booked ahead: "
+          f"{(time.perf_counter() - t0) / runs * 1e6:.1f} us/query")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+"""
+Startup time of the two apps against a tracked budget.
+
+For main (the webhook app) and website_chat (the websocket app), each
+run starts a fresh interpreter with ``python -X importtime -c "import
+fastapi, <app>"`` and a scratch HEALTHCARE_DB_PATH. fastapi is imported
+first, as the baseline every app pays, so the app's own import cost is
+what remains. Wall-clock import times move by hundreds of milliseconds
+with machine load; the budget only covers the app's own cost, and the
+fastest of --runs is compared to it. The report gives:
+
+- the app's own import time (fastest and median of --runs) against the
+  budget in benchmarks/startup_budget.json, next to the fastapi baseline
+- the packages that take longest to import, by self time summed per
+  top-level package
+- modules that should be imported on first use (pandas, openai, stripe
+  ...) but were imported with the app; any of these fails the run
+- whether importing created the database file (it should not)
+- lifespan startup with the warm-up (database, catalog, openai, stripe,
+  language profiles), and /test-chatbot right after it and, with
+  STARTUP_WARM_UP=false, on a cold app
+
+Exits 1 when an app's own import cost is over budget, a deferred module
+is imported or importing touched the database. --write-budget records the
+fastest measured own import times plus --headroom as the new budget.
+
+Usage: python benchmarks/bench_startup.py [--runs 5] [--write-budget] [--headroom 0.3]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BUDGET_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'startup_budget.json')
+APPS = ('main', 'website_chat')
+
+# Imported on first use or by the lifespan warm-up, never by importing an app
+DEFERRED_MODULES = ('pandas', 'numpy', 'openai', 'stripe', 'fuzzywuzzy', 'langdetect', 'requests',
+                    'twilio.rest', 'multiprocessing')
+
+LIFESPAN_SCRIPT = '''
+import json, sys, time
+from fastapi.testclient import TestClient
+start = time.perf_counter()
+import {app} as app_module
+imported = time.perf_counter()
+client = TestClient(app_module.app)
+client.__enter__()
+started = time.perf_counter()
+first_request = None
+if {app!r} == 'main':
+    client.get('/test-chatbot').raise_for_status()
+    first_request = time.perf_counter() - started
+client.__exit__(None, None, None)
+print(json.dumps({{'import': imported - start, 'startup': started - imported, 'first_request': first_request}}))
+'''
+
+def scratch_env(**overrides):
+    env = dict(os.environ)
+    env['HEALTHCARE_DB_PATH'] = os.path.join(tempfile.mkdtemp(), 'startup.db')
+    env['REMINDERS_ENABLED'] = 'false'
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [PROJECT_DIR, env.get('PYTHONPATH')]))
+    env.update(overrides)
+    return env
+
+def import_run(app):
+    """
+    Import the app in a fresh interpreter
+
+    :return: (app import seconds on top of fastapi, fastapi import seconds, {module: self seconds},
+              deferred modules imported, database created)
+    """
+    env = scratch_env()
+    check = (f"import fastapi, {app}, sys, json; "
+             f"print(json.dumps([m for m in {DEFERRED_MODULES!r} if m in sys.modules]))")
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', check], cwd=PROJECT_DIR, env=env,
+                            capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"importing {app} failed:\n{result.stderr[-2000:]}")
+
+    top_level = {}
+    self_times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        self_times[name.strip()] = int(self_us) / 1e6
+        if name.startswith(' ') and not name.startswith('  '):
+            top_level[name.strip()] = int(cumulative_us) / 1e6
+    deferred = json.loads(result.stdout.strip().splitlines()[-1])
+    return top_level[app], top_level['fastapi'], self_times, deferred, os.path.exists(env['HEALTHCARE_DB_PATH'])
+
+def lifespan_run(app, **overrides):
+    result = subprocess.run([sys.executable, '-c', LIFESPAN_SCRIPT.format(app=app)], cwd=PROJECT_DIR,
+                            env=scratch_env(**overrides), capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"starting {app} failed:\n{result.stderr[-2000:]}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=8, help='slowest packages to list')
+    parser.add_argument('--write-budget', action='store_true', help='record the measured times as the budget')
+    parser.add_argument('--headroom', type=float, default=0.3, help='budget = fastest run * (1 + headroom)')
+    args = parser.parse_args()
+
+    with open(BUDGET_PATH) as budget_file:
+        budget = json.load(budget_file)
+
+    failures = []
+    measured = {}
+    for app in APPS:
+        runs = [import_run(app) for _ in range(args.runs)]
+        seconds = min(run[0] for run in runs)
+        measured[app] = seconds
+        limit = budget['import_seconds_over_fastapi'][app]
+        print(f"\nimport {app}: {seconds * 1e3:6.1f} ms on top of fastapi, fastest of {args.runs} runs "
+              f"(median {statistics.median(run[0] for run in runs) * 1e3:.1f}, budget {limit * 1e3:.0f} ms); "
+              f"fastapi itself {min(run[1] for run in runs) * 1e3:.1f} ms")
+
+        packages = {}
+        for name, self_seconds in runs[0][2].items():
+            package = name.split('.')[0]
+            packages[package] = packages.get(package, 0.0) + self_seconds
+        for package, self_seconds in sorted(packages.items(), key=lambda item: -item[1])[:args.top]:
+            print(f"  {self_seconds * 1e3:6.1f} ms  {package}")
+
+        deferred = sorted(set(module for run in runs for module in run[3]))
+        touched = any(run[4] for run in runs)
+        print(f"  deferred modules imported: {', '.join(deferred) or 'none'}; "
+              f"database created: {'yes' if touched else 'no'}")
+
+        if seconds > limit and not args.write_budget:
+            failures.append(f"importing {app} takes {seconds * 1e3:.0f} ms on top of fastapi "
+                            f"(budget {limit * 1e3:.0f} ms)")
+        if deferred:
+            failures.append(f"importing {app} imports {', '.join(deferred)}")
+        if touched:
+            failures.append(f"importing {app} created the database")
+
+        warm = lifespan_run(app)
+        line = f"  lifespan startup with warm-up: {warm['startup'] * 1e3:6.1f} ms"
+        if warm['first_request'] is not None:
+            cold = lifespan_run(app, STARTUP_WARM_UP='false')
+            line += (f"; first /test-chatbot {warm['first_request'] * 1e3:.1f} ms after warm-up, "
+                     f"{cold['first_request'] * 1e3:.1f} ms without")
+        print(line)
+
+    if args.write_budget:
+        budget['import_seconds_over_fastapi'] = {app: round(seconds * (1 + args.headroom), 3)
+                                                 for app, seconds in measured.items()}
+        with open(BUDGET_PATH, 'w') as budget_file:
+            json.dump(budget, budget_file, indent=2)
+            budget_file.write('\n')
+        print(f"\nwrote {BUDGET_PATH}")
+        return
+
+    if failures:
+        print('\n' + '\n'.join(failures))
+        sys.exit(1)
+    print("\nwithin the startup budget")
+
+if __name__ == "__main__":
+    main()
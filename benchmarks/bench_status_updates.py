@@ -0,0 +1,61 @@
+"""
+Appointment status updates: one call per appointment versus the batch API.
+
+Confirms 10k pending appointments with update_appointment_status() (one
+connection and commit each) and then with update_appointment_statuses()
+(one transaction), counting the change events delivered to a listener.
+Also checks per-id results for ids that don't exist or are already in the
+target status.
+
+Usage: python benchmarks/bench_status_updates.py [appointments]
+"""
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+# Add the parent directory to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import HealthcareDatabase
+
+def reset(db, count):
+    conn = sqlite3.connect(db.db_path)
+    conn.execute('DELETE FROM appointments')
+    conn.executemany(
+        "INSERT INTO appointments (id, phone_number, service, date, time, status) VALUES (?, ?, ?, ?, ?, 'Pending')",
+        [(i, f"+9715{i:08d}", 'Basic Health Check Up', '2030-01-01', '09:00') for i in range(1, count + 1)]
+    )
+    conn.commit()
+    conn.close()
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    db = HealthcareDatabase(os.path.join(tempfile.mkdtemp(), 'bench.db'))
+    events = []
+    db.add_change_listener(lambda table, changes: events.append(len(changes)))
+    ids = list(range(1, count + 1))
+
+    reset(db, count)
+    start = time.perf_counter()
+    for appointment_id in ids:
+        db.update_appointment_status(appointment_id, 'Confirmed')
+    single = time.perf_counter() - start
+    print(f"{count} updates, one call each:  {single:7.2f}s  ({len(events)} change events)")
+
+    reset(db, count)
+    events.clear()
+    start = time.perf_counter()
+    results = db.update_appointment_statuses([(appointment_id, 'Confirmed') for appointment_id in ids])
+    batch = time.perf_counter() - start
+    print(f"{count} updates, one transaction: {batch:7.2f}s  ({len(events)} change event, "
+          f"{sum(events)} changes, {single / batch:.0f}x faster)")
+    assert all(result == 'updated' for result in results.values())
+
+    results = db.update_appointment_statuses([(1, 'Confirmed'), (2, 'Cancelled'), (count + 1, 'Cancelled')])
+    print(f"per-id results: {results}")
+    assert results == {1: 'unchanged', 2: 'updated', count + 1: 'not_found'}
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""
+Payment reconciliation against a local Stripe stub.
+
+Seeds a payments table with pending Checkout Sessions, then brings it up to
+date two ways against benchmarks/fake_stripe.py (with simulated network
+latency): one Session.retrieve call per payment (the old verify_payment
+loop) versus reconcile_payments(), which lists sessions 100 per call and
+writes each page in one transaction. Then checks that PaymentReconciler
+runs it from its background thread. Finally posts signed
+checkout.session.* events to POST /webhook/stripe and checks that a bad
+signature is rejected and that the queued statuses are written by the app
+shutdown, not lost with the batcher's buffer.
+
+Usage: python benchmarks/bench_stripe_reconciliation.py [payments] [latency_ms]
+"""
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+# Add the parent directory to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+WEBHOOK_SECRET = 'whsec_benchmark'
+os.environ['STRIPE_SECRET_KEY'] = 'sk_test_benchmark'
+os.environ['STRIPE_WEBHOOK_SECRET'] = WEBHOOK_SECRET
+# The app's own reconciler would overwrite the statuses the webhook check looks for
+os.environ['PAYMENT_RECONCILE_SECONDS'] = '0'
+os.environ.setdefault('STARTUP_WARM_UP', 'false')
+os.environ.setdefault('REMINDERS_ENABLED', 'false')
+
+import stripe
+import payments
+from database import HealthcareDatabase
+from fake_stripe import FakeStripe, make_session, sign_payload
+
+def seed(db, sessions):
+    conn = sqlite3.connect(db.db_path)
+    conn.executemany(
+        "INSERT INTO payments (phone_number, service, amount, status, session_id) VALUES (?, ?, ?, 'Pending', ?)",
+        [(f"+9715{i:08d}", 'Basic Health Check Up', 1399, s['id']) for i, s in enumerate(sessions)]
+    )
+    conn.commit()
+    conn.close()
+
+def status_counts(db):
+    conn = sqlite3.connect(db.db_path)
+    counts = dict(conn.execute('SELECT status, COUNT(*) FROM payments GROUP BY status').fetchall())
+    conn.close()
+    return counts
+
+def reset(db):
+    conn = sqlite3.connect(db.db_path)
+    conn.execute("UPDATE payments SET status = 'Pending'")
+    conn.commit()
+    conn.close()
+
+def webhook_check(db, sessions):
+    from fastapi.testclient import TestClient
+    import main
+
+    reset(db)
+    # Nothing is flushed on the timer during the check: only the shutdown can write the batch
+    payments.payment_status_batcher.flush_interval = 60
+    client = TestClient(main.app)
+    client.__enter__()
+    events = [
+        ('checkout.session.completed', sessions[1], 'Paid'),
+        ('checkout.session.async_payment_failed', sessions[10], 'Failed'),
+        ('checkout.session.expired', sessions[20], 'Expired'),
+    ]
+    for event_type, session, _ in events:
+        payload = json.dumps({
+            'id': f"evt_{session['id']}", 'object': 'event', 'type': event_type,
+            'data': {'object': session}
+        })
+        response = client.post('/webhook/stripe', content=payload, headers={
+            'Stripe-Signature': sign_payload(payload, WEBHOOK_SECRET),
+            'Content-Type': 'application/json'
+        })
+        assert response.status_code == 200, response.text
+
+    bad = client.post('/webhook/stripe', content='{}', headers={'Stripe-Signature': 't=1,v1=deadbeef'})
+    assert bad.status_code == 400
+
+    assert status_counts(db) == {'Pending': len(sessions)}, "statuses were written before shutdown"
+    client.__exit__(None, None, None)
+    # Let the startup's background Stripe Price lookup finish before the stub goes away
+    main.executor.shutdown()
+    conn = sqlite3.connect(db.db_path)
+    for _, session, expected in events:
+        (status,) = conn.execute('SELECT status FROM payments WHERE session_id = ?', (session['id'],)).fetchone()
+        assert status == expected, (session['id'], status, expected)
+    conn.close()
+    print("webhook: forged signature rejected with 400, 3 queued events written at shutdown")
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    latency = (float(sys.argv[2]) if len(sys.argv) > 2 else 20) / 1000
+
+    now = int(time.time())
+    sessions = [make_session(i, now - i * 60, paid=i % 10 != 0) for i in range(count)]
+    fake = FakeStripe(sessions, latency=latency).start()
+    stripe.api_base = fake.url
+
+    db = HealthcareDatabase(os.path.join(tempfile.mkdtemp(), 'bench.db'))
+    payments.db = db
+    seed(db, sessions)
+    print(f"{count} pending payments, {latency * 1000:.0f} ms simulated Stripe latency")
+
+    fake.requests = 0
+    start = time.perf_counter()
+    for session in sessions:
+        payments.verify_payment(session['id'])
+    per_session = time.perf_counter() - start
+    print(f"  retrieve per session:  {per_session:7.2f}s  {fake.requests:5d} API calls  {status_counts(db)}")
+
+    reset(db)
+    fake.requests = 0
+    start = time.perf_counter()
+    changed = payments.reconcile_payments(since=now - count * 60)
+    paged = time.perf_counter() - start
+    print(f"  paged reconciliation:  {paged:7.2f}s  {fake.requests:5d} API calls  {status_counts(db)} "
+          f"({changed} changed, {per_session / paged:.0f}x faster)")
+
+    reset(db)
+    reconciler = payments.PaymentReconciler(interval=3600, lookback=count * 60 + 60)
+    assert reconciler.start()
+    deadline = time.time() + 60
+    while reconciler.last_run is None and time.time() < deadline:
+        time.sleep(0.05)
+    reconciler.stop()
+    assert reconciler.last_changed == changed, (reconciler.last_changed, changed)
+    print(f"  background reconciler: first run on start changed {reconciler.last_changed}")
+
+    webhook_check(db, sessions)
+    fake.stop()
+
+if __name__ == "__main__":
+    main()
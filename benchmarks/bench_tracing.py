@@ -0,0 +1,122 @@
+"""
+Tracing overhead per message.
+
+Runs a message pipeline shaped like the WhatsApp webhook: a traced
+message with the stages process_message, get_context_for_gpt,
+generate_gpt4_response (with detect_language and translate_response
+nested inside it) and db.log_chat. The stages do no work, so the
+difference between the tracer enabled and disabled is the cost of
+tracing. It is measured from 1 and 8 threads and through run_io (which
+copies the context into the worker), and checked against the 50 us per
+message budget. Finally it times a /metrics render with every
+channel/route/stage series populated.
+
+Usage: python benchmarks/bench_tracing.py [messages]
+"""
+import asyncio
+import os
+import sys
+import threading
+import time
+
+# Add the parent directory to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from executor import run_io
+from metrics import registry
+from tracing import Tracer, message_stage_duration_seconds
+
+BUDGET_SECONDS = 50e-6
+CHANNELS = [('whatsapp', '/webhook/whatsapp'), ('website', '/ws/chat'), ('instagram', 'instagram_handler')]
+
+def build_pipeline(tracer):
+    @tracer.traced('detect_language')
+    def detect_language(text):
+        return 'en'
+
+    @tracer.traced('translate_response')
+    def translate_response(text, language):
+        return text
+
+    @tracer.traced('generate_gpt4_response')
+    def generate_gpt4_response(text):
+        return translate_response(text, detect_language(text))
+
+    @tracer.traced('process_message')
+    def process_message(text):
+        return {'response': text, 'state': 'menu'}
+
+    @tracer.traced('db.log_chat')
+    def log_chat(text, response):
+        return 1
+
+    def handle(channel, route, text):
+        with tracer.trace(channel, route):
+            response = process_message(text)['response']
+            with tracer.span('get_context_for_gpt'):
+                context = text
+            response = generate_gpt4_response(context)
+            log_chat(text, response)
+            return response
+
+    return handle, log_chat
+
+def per_message(handle, messages, threads=1):
+    per_thread = messages // threads
+
+    def worker(number):
+        channel, route = CHANNELS[number % len(CHANNELS)]
+        for _ in range(per_thread):
+            handle(channel, route, 'vitamin d test')
+
+    workers = [threading.Thread(target=worker, args=(number,)) for number in range(threads)]
+    start = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return (time.perf_counter() - start) / (per_thread * threads)
+
+async def through_pool(log_chat, tracer, messages):
+    # As in /ws/chat: the message span is on the event loop, the stage runs in the I/O pool
+    start = time.perf_counter()
+    for _ in range(messages):
+        with tracer.trace('website', '/ws/chat'):
+            await run_io(log_chat, 'vitamin d test', 'reply')
+    return (time.perf_counter() - start) / messages
+
+def main():
+    messages = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    enabled_tracer = Tracer(enabled=True)
+    enabled, enabled_log_chat = build_pipeline(enabled_tracer)
+    disabled_tracer = Tracer(enabled=False)
+    disabled, disabled_log_chat = build_pipeline(disabled_tracer)
+
+    results = {}
+    for threads in (1, 8):
+        base = min(per_message(disabled, messages, threads) for _ in range(3))
+        traced = min(per_message(enabled, messages, threads) for _ in range(3))
+        results[threads] = traced - base
+        print(f"{threads} thread(s): disabled {base * 1e6:5.2f} us/message, enabled {traced * 1e6:5.2f} us/message, "
+              f"overhead {(traced - base) * 1e6:5.2f} us/message (7 spans)")
+
+    pool_messages = messages // 10
+    before = message_stage_duration_seconds.count(channel='website', route='/ws/chat', stage='db.log_chat')
+    base = asyncio.run(through_pool(disabled_log_chat, disabled_tracer, pool_messages))
+    traced = asyncio.run(through_pool(enabled_log_chat, enabled_tracer, pool_messages))
+    print(f"through run_io: disabled {base * 1e6:5.1f} us/message, enabled {traced * 1e6:5.1f} us/message")
+
+    count = message_stage_duration_seconds.count(channel='whatsapp', route='/webhook/whatsapp', stage='detect_language')
+    assert count > 0, "stages were not recorded"
+    count = message_stage_duration_seconds.count(channel='website', route='/ws/chat', stage='db.log_chat')
+    assert count - before == pool_messages, "the span context did not reach the I/O pool"
+
+    start = time.perf_counter()
+    text = registry.render()
+    print(f"/metrics render: {(time.perf_counter() - start) * 1e3:.2f} ms, {len(text.splitlines())} lines")
+
+    assert results[1] < BUDGET_SECONDS, f"tracing costs {results[1] * 1e6:.1f} us per message"
+    print(f"within the {BUDGET_SECONDS * 1e6:.0f} us per message budget")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Measure Twilio signature validation overhead per webhook request.
+
+Compares the old per-call validator construction with the cached validator
+and the full TwilioSignatureMiddleware path (body read + parse + validate).
+Also checks that a malformed Content-Length is rejected with 400 and an
+oversized one with 413.
+
+Usage: python benchmarks/bench_twilio_validation.py [requests]
+"""
+import asyncio
+import os
+import sys
+import time
+from urllib.parse import urlencode
+
+# Add the parent directory to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault('TWILIO_AUTH_TOKEN', 'bench-auth-token')
+os.environ['TWILIO_WEBHOOK_BASE_URL'] = 'https://bench.example.com'
+
+from twilio.request_validator import RequestValidator
+from middleware import TwilioSignatureMiddleware
+from utils import get_twilio_validator
+
+URL = 'https://bench.example.com/webhook/whatsapp'
+
+def build_requests(count):
+    """Build signed Twilio-style form posts"""
+    signer = RequestValidator(os.environ['TWILIO_AUTH_TOKEN'])
+    requests = []
+    for i in range(count):
+        params = {
+            'MessageSid': f'SM{i:032d}',
+            'From': f'whatsapp:+9715{i % 100000000:08d}',
+            'To': 'whatsapp:+14155238886',
+            'Body': 'Do you have a vitamin D test?',
+            'NumMedia': '0',
+        }
+        requests.append((params, signer.compute_signature(URL, params)))
+    return requests
+
+def bench_uncached(requests):
+    for params, signature in requests:
+        RequestValidator(os.getenv('TWILIO_AUTH_TOKEN')).validate(URL, params, signature)
+
+def bench_cached(requests):
+    for params, signature in requests:
+        get_twilio_validator().validate(URL, params, signature)
+
+async def ok_app(scope, receive, send):
+    await receive()
+    await send({'type': 'http.response.start', 'status': 200, 'headers': []})
+    await send({'type': 'http.response.body', 'body': b''})
+
+async def bench_middleware(requests, spoofed=False, content_length=None):
+    middleware = TwilioSignatureMiddleware(ok_app)
+    statuses = []
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            statuses.append(message['status'])
+
+    for params, signature in requests:
+        body = urlencode(params).encode()
+        headers = [(b'host', b'bench.example.com'), (b'content-type', b'application/x-www-form-urlencoded')]
+        if not spoofed:
+            headers.append((b'x-twilio-signature', signature.encode()))
+        if content_length is not None:
+            headers.append((b'content-length', content_length))
+
+        async def receive(body=body):
+            return {'type': 'http.request', 'body': body, 'more_body': False}
+
+        scope = {'type': 'http', 'method': 'POST', 'path': '/webhook/whatsapp',
+                 'scheme': 'https', 'query_string': b'', 'headers': headers}
+        await middleware(scope, receive, send)
+    return statuses
+
+def report(label, seconds, count):
+    print(f"{label:<36} {seconds / count * 1e6:8.2f} us/request")
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    requests = build_requests(count)
+
+    start = time.perf_counter()
+    bench_uncached(requests)
+    report('validator per request (old)', time.perf_counter() - start, count)
+
+    start = time.perf_counter()
+    bench_cached(requests)
+    report('cached validator', time.perf_counter() - start, count)
+
+    start = time.perf_counter()
+    statuses = asyncio.run(bench_middleware(requests))
+    report('middleware, valid signature', time.perf_counter() - start, count)
+    assert all(status == 200 for status in statuses)
+
+    start = time.perf_counter()
+    statuses = asyncio.run(bench_middleware(requests, spoofed=True))
+    report('middleware, missing signature', time.perf_counter() - start, count)
+    assert all(status == 403 for status in statuses)
+
+    statuses = asyncio.run(bench_middleware(requests[:100], content_length=b'12abc'))
+    assert all(status == 400 for status in statuses), "malformed Content-Length was not rejected with 400"
+    statuses = asyncio.run(bench_middleware(requests[:100], content_length=b'10000000'))
+    assert all(status == 413 for status in statuses), "oversized Content-Length was not rejected with 413"
+    print("malformed Content-Length -> 400, oversized -> 413")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Check that a webhook whose first delivery fails is processed on retry.
+
+For the memory and SQLite dedup backends, an Instagram message is handed
+to instagram_handler three times with the same mid, as Meta redelivers
+unacknowledged events:
+
+1. GPT-4 raises (outage): no reply is sent and the claim is released
+2. the retry is processed again, answered and sent
+3. a further retry is a duplicate and replays the answer from 2 without
+   calling GPT-4 or sending again
+
+It also times claim/complete and claim/release per message for each
+backend. GPT-4 and the Graph API are replaced by local fakes and chat
+logging goes to a temporary database.
+
+Usage: python benchmarks/bench_webhook_retries.py [--messages 2000]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+# Add the parent directory to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault('RATE_LIMIT_PER_MINUTE', '100000')
+os.environ.setdefault('RATE_LIMIT_BURST', '100000')
+
+import instagram_handler as instagram_module
+from database import HealthcareDatabase
+from idempotency import MemorySeenSet, SQLiteSeenSet, WebhookDeduplicator, webhook_dedup, NEW
+
+class FlakyGPT:
+    def __init__(self, failures):
+        self.failures = failures
+        self.calls = 0
+
+    def __call__(self, message, context=None, language=None):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise RuntimeError("GPT-4 unavailable")
+        return f"answer to {message}"
+
+def check_retry(backend, name):
+    webhook_dedup.backend = backend
+    gpt = FlakyGPT(failures=1)
+    sent = []
+    instagram_module.generate_gpt4_response = gpt
+    instagram_module.instagram_handler.send_message = lambda recipient_id, message: sent.append(message)
+
+    payload = {'object': 'instagram', 'entry': [{'messaging': [{
+        'sender': {'id': f'ig-{name}'},
+        'message': {'mid': f'mid.retry.{name}', 'text': 'vitamin d price'},
+    }]}]}
+    handle = instagram_module.instagram_handler.handle_incoming_message
+    first, retry, replay = handle(payload), handle(payload), handle(payload)
+
+    print(f"{name:>6}: first delivery -> {first!r}, retry -> {retry!r}, "
+          f"replay -> {replay!r}; GPT-4 calls {gpt.calls}, messages sent {len(sent)}")
+    assert first is None, "the failed delivery returned a reply"
+    assert retry == 'answer to vitamin d price', "the retry after a failure was not processed"
+    assert replay == retry and gpt.calls == 2 and len(sent) == 1, "the replay re-ran the message"
+
+def time_backend(backend, messages):
+    dedup = WebhookDeduplicator(backend)
+    start = time.perf_counter()
+    for number in range(messages):
+        status, _ = dedup.claim('bench', f'done-{number}')
+        assert status == NEW
+        dedup.complete('bench', f'done-{number}', 'ok')
+    completed = (time.perf_counter() - start) / messages
+    start = time.perf_counter()
+    for number in range(messages):
+        dedup.claim('bench', f'failed-{number}')
+        dedup.release('bench', f'failed-{number}')
+    released = (time.perf_counter() - start) / messages
+    return completed, released
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--messages', type=int, default=2000)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    instagram_module.db = HealthcareDatabase(os.path.join(tmp, 'bench.db'))
+    backends = {
+        'memory': lambda: MemorySeenSet(3600, 50000),
+        'sqlite': lambda: SQLiteSeenSet(os.path.join(tmp, f'dedup-{time.monotonic_ns()}.db'), 3600, 50000),
+    }
+
+    for name, build in backends.items():
+        check_retry(build(), name)
+
+    print()
+    for name, build in backends.items():
+        completed, released = time_backend(build(), args.messages)
+        print(f"{name:>6}: claim+complete {completed * 1e6:8.1f} us/message, "
+              f"claim+release {released * 1e6:8.1f} us/message")
+
+    print("\nfailed first deliveries are processed on retry")
+
+if __name__ == "__main__":
+    main()
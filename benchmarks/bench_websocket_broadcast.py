@@ -0,0 +1,111 @@
+"""
+Broadcast to 10k simulated websocket clients.
+
+Most clients are fast, some are slow (send takes longer than the send
+timeout) and some are dead (send raises). Reports how long broadcast()
+itself blocks, when the last healthy client received the message, and how
+many clients were evicted. Then checks the heartbeat: by default idle
+clients get no chat-level ping frames and stay connected; with the
+opt-in application heartbeat they get pings, and only clients whose
+socket fails are evicted.
+
+Usage: python benchmarks/bench_websocket_broadcast.py [clients] [messages]
+"""
+import asyncio
+import os
+import random
+import sys
+import time
+
+# Add the parent directory to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from website_chat import WebsiteChatManager
+
+class FakeWebSocket:
+    def __init__(self, kind):
+        self.kind = kind
+        self.received = 0
+        self.last_received_at = None
+        self.closed = False
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, message):
+        if self.kind == 'dead':
+            raise ConnectionResetError('client went away')
+        if self.kind == 'slow':
+            await asyncio.sleep(3600)
+        await asyncio.sleep(random.uniform(0, 0.002))
+        self.received += 1
+        self.last_received_at = time.perf_counter()
+
+    async def close(self, code=1000):
+        self.closed = True
+
+async def run(client_count, message_count):
+    manager = WebsiteChatManager(queue_size=8, send_timeout=0.5)
+    sockets = []
+    for i in range(client_count):
+        roll = random.random()
+        kind = 'dead' if roll < 0.01 else 'slow' if roll < 0.02 else 'fast'
+        websocket = FakeWebSocket(kind)
+        sockets.append(websocket)
+        await manager.connect(websocket, f'client-{i}')
+
+    fast = [ws for ws in sockets if ws.kind == 'fast']
+    broadcast_times = []
+    start = time.perf_counter()
+    for i in range(message_count):
+        t0 = time.perf_counter()
+        await manager.broadcast(f'{{"sender": "system", "message": "announcement {i}"}}')
+        broadcast_times.append(time.perf_counter() - t0)
+        await asyncio.sleep(0)
+
+    # Wait for healthy clients to drain and slow ones to time out
+    while any(ws.received < message_count for ws in fast):
+        await asyncio.sleep(0.01)
+    delivered_at = max(ws.last_received_at for ws in fast) - start
+    await asyncio.sleep(manager.send_timeout + 0.1)
+
+    print(f"clients: {client_count} ({len(fast)} fast, "
+          f"{sum(ws.kind == 'slow' for ws in sockets)} slow, {sum(ws.kind == 'dead' for ws in sockets)} dead)")
+    print(f"broadcast() call: avg {sum(broadcast_times) / len(broadcast_times) * 1e3:.2f} ms, "
+          f"max {max(broadcast_times) * 1e3:.2f} ms")
+    print(f"all {message_count} messages delivered to healthy clients after {delivered_at * 1e3:.1f} ms")
+    print(f"evicted: {manager.evicted_count}, still connected: {len(manager.active_connections)}")
+
+    for connection in list(manager.active_connections.values()):
+        connection.sender_task.cancel()
+
+async def heartbeat_check(app_heartbeat):
+    manager = WebsiteChatManager(send_timeout=0.5, heartbeat_interval=0.05, app_heartbeat=app_heartbeat)
+    idle, dead = FakeWebSocket('fast'), FakeWebSocket('dead')
+    await manager.connect(idle, 'idle')
+    await manager.connect(dead, 'dead')
+    manager.start_heartbeat()
+    # Several heartbeat intervals without any frame from the clients
+    await asyncio.sleep(0.5)
+    manager.stop_heartbeat()
+
+    connected = sorted(manager.active_connections)
+    print(f"heartbeat {'on' if app_heartbeat else 'off'}: idle client got {idle.received} pings, "
+          f"still connected: {', '.join(connected)}")
+    assert 'idle' in connected, "an idle client was evicted"
+    if app_heartbeat:
+        assert idle.received > 0 and 'dead' not in connected
+    else:
+        assert idle.received == 0, "chat frames were injected without WS_APP_HEARTBEAT"
+    for connection in list(manager.active_connections.values()):
+        connection.sender_task.cancel()
+
+def main():
+    client_count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    message_count = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    asyncio.run(run(client_count, message_count))
+    asyncio.run(heartbeat_check(app_heartbeat=False))
+    asyncio.run(heartbeat_check(app_heartbeat=True))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Check that /ws/chat clients get independent latencies.
+
+Drives websocket_chat_endpoint with 200 concurrent simulated clients. GPT-4
+is replaced by a blocking call that sleeps (5% of clients hit a 2s "slow
+model" call, the rest 100ms) and chat logging goes to a temporary database.
+With blocking work offloaded, fast clients should see ~100ms regardless of
+the slow ones, and the whole run should take about as long as the slowest
+single call rather than the sum of all calls.
+
+It also runs the chatbot through a CPU_POOL_MODE=process pool: the call must
+pickle by name and the chatbot must be built in the worker, not the parent.
+
+Usage: python benchmarks/bench_ws_concurrency.py [clients]
+"""
+import asyncio
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+# Add the parent directory to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault('IO_POOL_WORKERS', '256')
+os.environ.setdefault('LLM_MAX_CONCURRENCY', '256')
+
+from fastapi import WebSocketDisconnect
+import website_chat
+from database import HealthcareDatabase
+from executor import ExecutionLayer
+from lazy import is_loaded
+
+FAST_SECONDS = 0.1
+SLOW_SECONDS = 2.0
+
+def fake_gpt4_response(message, context=None, language=None):
+    time.sleep(SLOW_SECONDS if message.startswith('slow') else FAST_SECONDS)
+    return f"answer to {message}"
+
+class FakeWebSocket:
+    def __init__(self, message):
+        self.inbox = asyncio.Queue()
+        self.inbox.put_nowait(json.dumps({'message': message}))
+        self.sent_at = None
+        self.answered_at = None
+        self.answered = asyncio.Event()
+
+    async def accept(self):
+        pass
+
+    async def receive_text(self):
+        item = await self.inbox.get()
+        if item is None:
+            raise WebSocketDisconnect()
+        self.sent_at = time.perf_counter()
+        return item
+
+    async def send_text(self, message):
+        if json.loads(message).get('sender') == 'ai':
+            self.answered_at = time.perf_counter()
+            self.answered.set()
+            self.inbox.put_nowait(None)
+
+    async def close(self, code=1000):
+        pass
+
+async def run(client_count):
+    sockets = []
+    for i in range(client_count):
+        kind = 'slow' if i % 20 == 0 else 'fast'
+        sockets.append((kind, FakeWebSocket(f'{kind} question {i}')))
+
+    start = time.perf_counter()
+    await asyncio.gather(*[
+        website_chat.websocket_chat_endpoint(ws, client_id=f'client-{i}')
+        for i, (_, ws) in enumerate(sockets)
+    ])
+    elapsed = time.perf_counter() - start
+
+    for kind in ('fast', 'slow'):
+        latencies = sorted(ws.answered_at - ws.sent_at for k, ws in sockets if k == kind)
+        p95 = latencies[int(len(latencies) * 0.95) - 1]
+        print(f"{kind:>4} clients: {len(latencies):4d}  median {statistics.median(latencies) * 1e3:7.1f} ms  "
+              f"p95 {p95 * 1e3:7.1f} ms  max {latencies[-1] * 1e3:7.1f} ms")
+    print(f"wall time for {client_count} clients: {elapsed:.2f}s "
+          f"(sequential would be {sum(SLOW_SECONDS if k == 'slow' else FAST_SECONDS for k, _ in sockets):.1f}s)")
+
+    fast = [ws.answered_at - ws.sent_at for k, ws in sockets if k == 'fast']
+    assert max(fast) < SLOW_SECONDS, "fast clients were blocked behind slow ones"
+
+def process_mode_check():
+    pool = ExecutionLayer(cpu_workers=1, cpu_mode='process')
+    reply = asyncio.run(pool.run_cpu(website_chat.process_message, 'hello', 'client-process'))
+    pool.shutdown()
+    print(f"process pool chatbot reply state: {reply['state']}; "
+          f"chatbot built in the parent: {is_loaded(website_chat.health_chatbot)}")
+    assert reply['state'] == 'menu', "the process pool did not run the chatbot"
+    assert not is_loaded(website_chat.health_chatbot), "process mode built the parent's chatbot"
+
+def main():
+    client_count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+
+    website_chat.generate_gpt4_response = fake_gpt4_response
+    website_chat.detect_language = lambda text: 'en'
+    website_chat.db = HealthcareDatabase(os.path.join(tempfile.mkdtemp(), 'bench.db'))
+
+    process_mode_check()
+    asyncio.run(run(client_count))
+    website_chat.executor.shutdown()
+
+if __name__ == "__main__":
+    main()
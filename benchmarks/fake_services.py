@@ -0,0 +1,165 @@
+"""
+Local stand-ins for the OpenAI, Twilio and Meta Graph APIs (Stripe is in
+fake_stripe.py), each a threaded HTTP server with a configurable
+per-request latency and a request counter.
+
+- FakeOpenAI: POST /v1/chat/completions
+  (OPENAI_API_BASE=<url>/v1)
+- FakeTwilio: POST /2010-04-01/Accounts/<sid>/Messages.json
+  (TWILIO_API_BASE=<url>)
+- FakeMeta: POST /v17.0/<page id>/messages
+  (META_GRAPH_URL=<url>/v17.0)
+
+Usage:
+    openai_server = FakeOpenAI(latency=0.3).start()
+    os.environ['OPENAI_API_BASE'] = openai_server.url + '/v1'
+"""
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+class FakeService:
+    """
+    Threaded HTTP server answering JSON for a table of routes
+
+    Subclasses fill ``routes`` with (method, path regex, handler) where
+    ``handler(match, body)`` returns (status, dict); ``body`` is the decoded
+    JSON or form body.
+    """
+
+    routes = []
+
+    def __init__(self, latency=0.0):
+        """
+        :param latency: Seconds to sleep before answering each request
+        """
+        self.latency = latency
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._routes = [(method, re.compile(pattern), handler) for method, pattern, handler in self.routes]
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler())
+        self.server.daemon_threads = True
+        # Stdlib default (5) drops connections when many clients connect at once
+        self.server.request_queue_size = 1024
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def reset_counters(self):
+        with self._lock:
+            self.requests = 0
+
+    def _dispatch(self, method, path, body):
+        with self._lock:
+            self.requests += 1
+        if self.latency:
+            time.sleep(self.latency)
+        for route_method, pattern, handler in self._routes:
+            match = pattern.fullmatch(path)
+            if route_method == method and match:
+                return handler(self, match, body)
+        return 404, {'error': {'message': f"No route for {method} {path}"}}
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def _reply(self, status, body):
+                data = json.dumps(body).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _body(self):
+                raw = self.rfile.read(int(self.headers.get('Content-Length', 0) or 0)).decode('utf-8')
+                if self.headers.get('Content-Type', '').startswith('application/json'):
+                    return json.loads(raw or '{}')
+                return {key: values[0] for key, values in parse_qs(raw).items()}
+
+            def do_POST(self):
+                body = self._body()
+                self._reply(*fake._dispatch('POST', urlparse(self.path).path, body))
+
+            def do_GET(self):
+                self._reply(*fake._dispatch('GET', urlparse(self.path).path, {}))
+
+        return Handler
+
+class FakeOpenAI(FakeService):
+    """
+    Chat Completions: translation prompts echo the text, anything else gets a short canned answer
+    """
+
+    def chat_completion(self, match, body):
+        messages = body.get('messages', [])
+        system = next((m['content'] for m in messages if m['role'] == 'system'), '')
+        user = next((m['content'] for m in reversed(messages) if m['role'] == 'user'), '')
+        if system.startswith('Translate'):
+            content = user
+        else:
+            content = (f"Thanks for your question about \"{user[:60]}\". Our clinic offers this service; "
+                       "reply BOOK to choose a time or PAY for a payment link.")
+        return 200, {
+            'id': f"chatcmpl-{time.time_ns()}",
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': body.get('model', 'gpt-4'),
+            'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': content}, 'finish_reason': 'stop'}],
+            'usage': {'prompt_tokens': sum(len(m['content']) // 4 for m in messages),
+                      'completion_tokens': len(content) // 4,
+                      'total_tokens': 0},
+        }
+
+    routes = [('POST', r'/v1/chat/completions', chat_completion)]
+
+class FakeTwilio(FakeService):
+    """
+    Programmable Messaging: accepts outbound messages
+    """
+
+    def create_message(self, match, body):
+        return 201, {
+            'sid': f"SM{time.time_ns():032x}"[:34],
+            'account_sid': match.group(1),
+            'from': body.get('From'),
+            'to': body.get('To'),
+            'body': body.get('Body', ''),
+            'status': 'queued',
+            'num_segments': '1',
+            'direction': 'outbound-api',
+            'date_created': time.strftime('%a, %d %b %Y %H:%M:%S +0000', time.gmtime()),
+        }
+
+    routes = [('POST', r'/2010-04-01/Accounts/([^/]+)/Messages\.json', create_message)]
+
+class FakeMeta(FakeService):
+    """
+    Graph API Send API for Instagram messages
+    """
+
+    def send_message(self, match, body):
+        return 200, {
+            'recipient_id': body.get('recipient', {}).get('id'),
+            'message_id': f"mid.{time.time_ns()}",
+        }
+
+    routes = [('POST', r'/v\d+\.\d+/([^/]+)/messages', send_message)]
@@ -0,0 +1,143 @@
+"""
+In-memory stand-in for the parts of gspread the dashboards and the sheets
+mirror use, counting requests and cells transferred.
+
+Usage:
+    client = FakeSheetsClient({'Payment Logs': [header, row, ...]})
+    SheetsMirror(db_path, client_factory=lambda: client)
+"""
+import re
+import time
+from types import SimpleNamespace
+
+def _a1_to_rowcol(label):
+    match = re.match(r'([A-Z]+)(\d+)', label)
+    column = 0
+    for char in match.group(1):
+        column = column * 26 + ord(char) - 64
+    return int(match.group(2)), column
+
+class FakeWorksheet:
+    def __init__(self, spreadsheet, rows):
+        self.spreadsheet = spreadsheet
+        self.rows = [list(map(str, row)) for row in rows]
+
+    def _transfer(self, cells):
+        self.spreadsheet.client.requests += 1
+        self.spreadsheet.client.cells += cells
+        if self.spreadsheet.client.latency:
+            time.sleep(self.spreadsheet.client.latency)
+
+    def touch(self):
+        self.spreadsheet.modified_time = f"{time.time_ns()}"
+
+    def row_values(self, row):
+        values = list(self.rows[row - 1]) if row <= len(self.rows) else []
+        while values and values[-1] == '':
+            values.pop()
+        self._transfer(len(values))
+        return values
+
+    def col_values(self, col):
+        values = [row[col - 1] if col <= len(row) else '' for row in self.rows]
+        while values and values[-1] == '':
+            values.pop()
+        self._transfer(len(values))
+        return values
+
+    def get(self, range_name):
+        start, end = range_name.split(':')
+        first_row, first_col = _a1_to_rowcol(start)
+        last_row, last_col = _a1_to_rowcol(end)
+        values = [row[first_col - 1:last_col] for row in self.rows[first_row - 1:last_row]]
+        self._transfer(sum(len(row) for row in values))
+        return values
+
+    def batch_get(self, ranges):
+        values = []
+        for range_name in ranges:
+            row, col = _a1_to_rowcol(range_name)
+            cell = self.rows[row - 1][col - 1] if row <= len(self.rows) and col <= len(self.rows[row - 1]) else ''
+            values.append([[cell]] if cell != '' else [])
+        self._transfer(len(ranges))
+        return values
+
+    def delete_rows(self, row):
+        self._transfer(0)
+        del self.rows[row - 1]
+        self.touch()
+
+    def get_all_records(self):
+        header = self.rows[0]
+        self._transfer(sum(len(row) for row in self.rows))
+        return [dict(zip(header, row)) for row in self.rows[1:]]
+
+    def get_all_values(self):
+        self._transfer(sum(len(row) for row in self.rows))
+        return [list(row) for row in self.rows]
+
+    def find(self, query):
+        self._transfer(sum(len(row) for row in self.rows))
+        for row_number, row in enumerate(self.rows, start=1):
+            for col_number, value in enumerate(row, start=1):
+                if value == str(query):
+                    return SimpleNamespace(row=row_number, col=col_number, value=value)
+        return None
+
+    def update_cell(self, row, col, value):
+        self._transfer(1)
+        self.rows[row - 1][col - 1] = str(value)
+        self.touch()
+
+    def batch_update(self, data, **kwargs):
+        self._transfer(len(data))
+        for update in data:
+            row, col = _a1_to_rowcol(update['range'])
+            for row_offset, values in enumerate(update['values']):
+                for col_offset, value in enumerate(values):
+                    self.rows[row - 1 + row_offset][col - 1 + col_offset] = str(value)
+        self.touch()
+
+    def append_rows(self, rows):
+        self._transfer(sum(len(row) for row in rows))
+        self.rows.extend(list(map(str, row)) for row in rows)
+        self.touch()
+
+class FakeSpreadsheet:
+    def __init__(self, client, rows):
+        self.client = client
+        self.modified_time = f"{time.time_ns()}"
+        self.sheet1 = FakeWorksheet(self, rows)
+
+    @property
+    def lastUpdateTime(self):
+        # Drive metadata request, like gspread
+        self.client.requests += 1
+        if self.client.latency:
+            time.sleep(self.client.latency)
+        return self.modified_time
+
+class FakeSheetsClient:
+    """
+    gspread client serving spreadsheets from memory
+
+    :param sheets: Title -> list of rows (first row is the header)
+    :param latency: Seconds added to every request
+    """
+
+    def __init__(self, sheets, latency=0.0):
+        self.latency = latency
+        self.requests = 0
+        self.cells = 0
+        self.spreadsheets = {title: FakeSpreadsheet(self, rows) for title, rows in sheets.items()}
+
+    def open(self, title):
+        # Spreadsheet metadata
+        self.requests += 1
+        if self.latency:
+            time.sleep(self.latency)
+        return self.spreadsheets[title]
+
+    def reset_counters(self):
+        self.requests = 0
+        self.cells = 0
@@ -0,0 +1,189 @@
+"""
+Minimal local stand-in for the Stripe Checkout Sessions API.
+
+Serves GET /v1/checkout/sessions (list, with limit / starting_after /
+has_more pagination), GET /v1/checkout/sessions/<id> (retrieve),
+POST /v1/checkout/sessions (create) and GET/POST /v1/prices (list by
+lookup_keys, create), with a configurable per-request latency so API round
+trips can be compared without touching the real Stripe API. Point the client at it with
+STRIPE_API_BASE=http://127.0.0.1:<port>.
+"""
+import hashlib
+import hmac
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+def make_session(index, created, paid=True):
+    """
+    Build a Checkout Session object
+
+    :param index: Sequence number used for the session id
+    :param created: Unix timestamp
+    :param paid: Whether the payment has completed
+    :return: Session dict in Stripe's JSON shape
+    """
+    return {
+        'id': f"cs_test_{index:024d}",
+        'object': 'checkout.session',
+        'created': created,
+        'status': 'complete' if paid else 'open',
+        'payment_status': 'paid' if paid else 'unpaid',
+        'amount_total': 139900,
+        'currency': 'aed',
+    }
+
+def sign_payload(payload, secret, timestamp=None):
+    """
+    Build a Stripe-Signature header value for a webhook payload
+
+    :param payload: Raw JSON body (str)
+    :param secret: Webhook signing secret
+    :param timestamp: Unix timestamp (default: now)
+    :return: Header value "t=...,v1=..."
+    """
+    timestamp = int(timestamp or time.time())
+    signed = f"{timestamp}.{payload}".encode('utf-8')
+    signature = hmac.new(secret.encode('utf-8'), signed, hashlib.sha256).hexdigest()
+    return f"t={timestamp},v1={signature}"
+
+class FakeStripe:
+    """
+    Threaded HTTP server holding a list of sessions, newest first like Stripe
+    """
+
+    def __init__(self, sessions, latency=0.0):
+        """
+        :param sessions: Session dicts
+        :param latency: Seconds to sleep before answering each request
+        """
+        self.sessions = sorted(sessions, key=lambda s: (s['created'], s['id']), reverse=True)
+        self.by_id = {s['id']: s for s in self.sessions}
+        self.positions = {s['id']: i for i, s in enumerate(self.sessions)}
+        self.prices = {}
+        self.latency = latency
+        self.requests = 0
+        self.created_sessions = 0
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler())
+        self.server.daemon_threads = True
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def list_sessions(self, query):
+        limit = min(int(query.get('limit', ['10'])[0]), 100)
+        gte = int(query.get('created[gte]', ['0'])[0])
+        start = 0
+        if 'starting_after' in query:
+            start = self.positions[query['starting_after'][0]] + 1
+
+        page = []
+        index = start
+        while index < len(self.sessions) and len(page) < limit:
+            session = self.sessions[index]
+            if session['created'] < gte:
+                break
+            page.append(session)
+            index += 1
+
+        has_more = index < len(self.sessions) and self.sessions[index]['created'] >= gte
+        return {'object': 'list', 'url': '/v1/checkout/sessions', 'data': page, 'has_more': has_more}
+
+    def create_session(self, form):
+        with self._lock:
+            self.created_sessions += 1
+            index = len(self.sessions) + self.created_sessions
+        session = make_session(index, int(time.time()), paid=False)
+        session['url'] = f"https://checkout.stripe.test/c/pay/{session['id']}"
+        session['expires_at'] = int(form.get('expires_at', [time.time() + 86400])[0])
+        session['metadata'] = {
+            key[len('metadata['):-1]: values[0] for key, values in form.items() if key.startswith('metadata[')
+        }
+        with self._lock:
+            self.by_id[session['id']] = session
+        return session
+
+    def list_prices(self, query):
+        keys = [values[0] for key, values in query.items() if key.startswith('lookup_keys[')]
+        data = [self.prices[key] for key in keys if key in self.prices]
+        return {'object': 'list', 'url': '/v1/prices', 'data': data, 'has_more': False}
+
+    def create_price(self, form):
+        key = form['lookup_key'][0]
+        price = {
+            'id': f"price_{len(self.prices):024d}",
+            'object': 'price',
+            'lookup_key': key,
+            'unit_amount': int(form['unit_amount'][0]),
+            'currency': form['currency'][0],
+            'active': True,
+        }
+        with self._lock:
+            self.prices[key] = price
+        return price
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _reply(self, status, body):
+                data = json.dumps(body).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _count(self):
+                with fake._lock:
+                    fake.requests += 1
+                if fake.latency:
+                    time.sleep(fake.latency)
+
+            def do_POST(self):
+                self._count()
+                length = int(self.headers.get('Content-Length', 0))
+                form = parse_qs(self.rfile.read(length).decode('utf-8'))
+
+                path = urlparse(self.path).path
+                if path == '/v1/checkout/sessions':
+                    self._reply(200, fake.create_session(form))
+                elif path == '/v1/prices':
+                    self._reply(200, fake.create_price(form))
+                else:
+                    self._reply(404, {'error': {'type': 'invalid_request_error', 'message': 'Unrecognized request URL'}})
+
+            def do_GET(self):
+                self._count()
+
+                parsed = urlparse(self.path)
+                if parsed.path == '/v1/checkout/sessions':
+                    self._reply(200, fake.list_sessions(parse_qs(parsed.query)))
+                    return
+                if parsed.path == '/v1/prices':
+                    self._reply(200, fake.list_prices(parse_qs(parsed.query)))
+                    return
+
+                prefix = '/v1/checkout/sessions/'
+                session = fake.by_id.get(parsed.path[len(prefix):]) if parsed.path.startswith(prefix) else None
+                if session is None:
+                    self._reply(404, {'error': {'type': 'invalid_request_error', 'message': 'No such checkout.session'}})
+                else:
+                    self._reply(200, session)
+
+        return Handler
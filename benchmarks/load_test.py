@@ -0,0 +1,481 @@
+"""
+Load test: replay message traces against the app with local fake services.
+
+Starts fake OpenAI, Twilio, Meta (fake_services.py) and Stripe
+(fake_stripe.py) servers with configurable latency, points the app at
+them and at a temporary database, then replays a trace per scenario:
+
+- whatsapp: signed Twilio webhooks to POST /webhook/whatsapp (main.app, in process over ASGI)
+- website: chat messages over the /ws/chat endpoint
+- instagram: Meta message events through instagram_handler
+- twilio: WhatsAppHandler replies sent through the Twilio REST API (booking, payment links, GPT-4)
+- stripe: signed checkout.session.* events to POST /webhook/stripe
+
+Traces are JSON lines, one message per line like requests.jsonl:
+
+    {"channel": "whatsapp", "sender": "+971501230001", "body": "vitamin d test"}
+
+benchmarks/load_trace.jsonl is the seed trace; --synthetic N adds N
+generated English/Arabic messages per scenario (--seed makes them
+repeatable, --write-trace saves them). Each sender's messages are sent in
+order, one at a time, with up to --concurrency senders in flight. The
+per-sender rate limit is raised because replay compresses time.
+
+For every scenario the report gives p50/p95/p99 latency, throughput,
+errors, peak RSS and the requests made to each fake. --output saves the
+report as JSON; --baseline compares with a saved report and exits with
+status 1 when p95 latency, throughput or the error rate is worse by more
+than --tolerance.
+
+Usage: python benchmarks/load_test.py [--synthetic 200] [--concurrency 20] [--scenarios whatsapp,website]
+                                      [--openai-latency 0.2] [--output report.json] [--baseline report.json]
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import itertools
+import json
+import os
+import random
+import resource
+import sys
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+# Add the parent directory to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from fake_services import FakeMeta, FakeOpenAI, FakeTwilio
+from fake_stripe import FakeStripe, sign_payload
+
+SCENARIOS = ('whatsapp', 'website', 'instagram', 'twilio', 'stripe')
+SEED_TRACE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'load_trace.jsonl')
+
+TWILIO_AUTH_TOKEN = 'load_test_twilio_token'
+TWILIO_WEBHOOK_BASE_URL = 'https://load-test.local'
+STRIPE_WEBHOOK_SECRET = 'whsec_load_test'
+
+# Synthetic traffic; {service} is filled from the service catalog
+GREETINGS = {'en': ['hello', 'hi', 'good morning', 'hey there'], 'ar': ['مرحبا', 'السلام عليكم', 'صباح الخير']}
+QUESTIONS = {
+    'en': ['how much is the {service}?', 'what does {service} include?', '{service} price',
+           'do you have {service}', 'is {service} available this week?'],
+    'ar': ['كم سعر {service}؟', 'هل عندكم {service}', 'ما هي تفاصيل {service}؟', 'أريد معلومات عن {service}'],
+}
+BOOKINGS = {
+    'en': ['book {service} tomorrow at 4pm', 'I want to book {service} on Thursday 10:30 am',
+           'book appointment', 'can I book {service} next friday at 9'],
+    'ar': ['حجز موعد', 'أريد حجز {service} بكرة الساعة 4', 'حجز {service} يوم الخميس'],
+}
+FOLLOW_UPS = {
+    'en': ['is it confidential?', 'do you do home visits?', 'thanks', 'pay', 'what are your opening hours?'],
+    'ar': ['شكرا', 'هل تقدمون خدمة منزلية؟', 'ما هي ساعات العمل؟', 'هل تقبلون التأمين؟'],
+}
+STRIPE_EVENTS = ['checkout.session.completed'] * 8 + ['checkout.session.expired', 'checkout.session.async_payment_failed']
+
+def sender_id(channel, number):
+    if channel == 'website':
+        return f"web-{number:06x}"
+    if channel == 'instagram':
+        return f"178414{number:011d}"
+    return f"+9715{number:08d}"
+
+def synthetic_trace(channel, messages, arabic_share, rng, services):
+    """
+    Generate conversations of 1-5 messages until ``messages`` are produced
+
+    :param channel: Scenario name
+    :param messages: Number of messages
+    :param arabic_share: Fraction of conversations in Arabic
+    :param rng: random.Random instance
+    :param services: Service names to ask about
+    :return: List of trace records
+    """
+    trace = []
+    number = rng.randrange(10 ** 6)
+    while len(trace) < messages:
+        number += 1
+        sender = sender_id(channel, number)
+        if channel == 'stripe':
+            trace.append({'channel': channel, 'sender': sender, 'body': rng.choice(STRIPE_EVENTS)})
+            continue
+
+        language = 'ar' if rng.random() < arabic_share else 'en'
+        conversation = []
+        if rng.random() < 0.5:
+            conversation.append(rng.choice(GREETINGS[language]))
+        conversation.extend(rng.choice(QUESTIONS[language]) for _ in range(rng.randint(1, 2)))
+        if rng.random() < 0.3:
+            conversation.append(rng.choice(BOOKINGS[language]))
+        if rng.random() < 0.4:
+            conversation.append(rng.choice(FOLLOW_UPS[language]))
+        for template in conversation[:5]:
+            body = template.format(service=rng.choice(services))
+            trace.append({'channel': channel, 'sender': sender, 'body': body})
+    return trace[:messages]
+
+def read_trace(path):
+    with open(path, encoding='utf-8') as trace_file:
+        return [json.loads(line) for line in trace_file if line.strip()]
+
+def conversations(trace):
+    """
+    Group a scenario's messages by sender, keeping their order
+
+    :return: List of (sender, [bodies])
+    """
+    by_sender = OrderedDict()
+    for record in trace:
+        by_sender.setdefault(record['sender'], []).append(record['body'])
+    return list(by_sender.items())
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+class RssSampler:
+    """
+    Samples the process resident set size in a background thread
+    """
+
+    def __init__(self, interval=0.02):
+        self.interval = interval
+        self.start_mb = self.peak_mb = self.current_mb()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    @staticmethod
+    def current_mb():
+        try:
+            with open('/proc/self/statm') as statm:
+                return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+        except (OSError, ValueError):
+            # No /proc: lifetime peak (kilobytes on Linux, bytes on macOS)
+            peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            return peak / 2 ** 20 if sys.platform == 'darwin' else peak / 2 ** 10
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak_mb = max(self.peak_mb, self.current_mb())
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak_mb = max(self.peak_mb, self.current_mb())
+
+class FakeWebSocket:
+    """
+    Client side of one /ws/chat connection, fed one message at a time
+    """
+
+    def __init__(self):
+        self.inbox = asyncio.Queue()
+        self.reply = None
+        self.replied = asyncio.Event()
+
+    async def accept(self):
+        pass
+
+    async def receive_text(self):
+        from fastapi import WebSocketDisconnect
+
+        item = await self.inbox.get()
+        if item is None:
+            raise WebSocketDisconnect()
+        return item
+
+    async def send_text(self, message):
+        payload = json.loads(message)
+        if payload.get('sender') in ('ai', 'system'):
+            self.reply = payload
+            self.replied.set()
+
+    async def close(self, code=1000):
+        pass
+
+    async def ask(self, body):
+        self.replied.clear()
+        await self.inbox.put(json.dumps({'message': body}))
+        await self.replied.wait()
+        return self.reply
+
+class Scenarios:
+    """
+    One conversation runner per scenario; each calls ``record(latency, ok)`` per message
+    """
+
+    def __init__(self):
+        import httpx
+        import main
+        from twilio.request_validator import RequestValidator
+
+        self.main = main
+        self.client = httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url='http://testserver',
+                                        timeout=300)
+        self.validator = RequestValidator(TWILIO_AUTH_TOKEN)
+        self.ids = itertools.count(1)
+
+    async def whatsapp(self, sender, bodies, record):
+        for body in bodies:
+            params = {'From': f"whatsapp:{sender}", 'To': 'whatsapp:+14155238886', 'Body': body,
+                      'MessageSid': f"SM{next(self.ids):032d}"}
+            signature = self.validator.compute_signature(TWILIO_WEBHOOK_BASE_URL + '/webhook/whatsapp', params)
+            start = time.perf_counter()
+            response = await self.client.post('/webhook/whatsapp', data=params, headers={'X-Twilio-Signature': signature})
+            ok = response.status_code == 200 and 'something went wrong' not in response.text
+            record(time.perf_counter() - start, ok)
+
+    async def website(self, sender, bodies, record):
+        import website_chat
+
+        websocket = FakeWebSocket()
+        endpoint = asyncio.create_task(website_chat.websocket_chat_endpoint(websocket, client_id=sender))
+        for body in bodies:
+            start = time.perf_counter()
+            reply = await websocket.ask(body)
+            record(time.perf_counter() - start, reply.get('sender') == 'ai')
+        await websocket.inbox.put(None)
+        await endpoint
+
+    async def instagram(self, sender, bodies, record):
+        from executor import run_io
+        from instagram_handler import instagram_handler
+
+        for body in bodies:
+            payload = {'object': 'instagram', 'entry': [{'messaging': [{
+                'sender': {'id': sender},
+                'message': {'mid': f"mid.{next(self.ids)}", 'text': body},
+            }]}]}
+            start = time.perf_counter()
+            response = await run_io(instagram_handler.handle_incoming_message, payload)
+            record(time.perf_counter() - start, response is not None)
+
+    async def twilio(self, sender, bodies, record):
+        from executor import run_io
+        from whatsapp_handler import whatsapp_handler
+
+        for body in bodies:
+            start = time.perf_counter()
+            response = await run_io(whatsapp_handler.handle_incoming_message, sender, body)
+            ok = not response.startswith(('Sorry, an error occurred', 'Invalid phone number'))
+            record(time.perf_counter() - start, ok)
+
+    async def stripe(self, sender, bodies, record):
+        from database import db
+        from executor import run_io
+
+        for event_type in bodies:
+            session_id = f"cs_test_load_{next(self.ids):020d}"
+            await run_io(db.save_payment, sender, 'Vitamin D (30,000 IU) IV Therapy', 250.0, session_id)
+            payload = json.dumps({
+                'id': f"evt_{session_id}",
+                'object': 'event',
+                'type': event_type,
+                'data': {'object': {'id': session_id, 'object': 'checkout.session', 'status': 'complete',
+                                    'payment_status': 'paid' if event_type.endswith('completed') else 'unpaid'}},
+            })
+            start = time.perf_counter()
+            response = await self.client.post('/webhook/stripe', content=payload, headers={
+                'Stripe-Signature': sign_payload(payload, STRIPE_WEBHOOK_SECRET),
+                'Content-Type': 'application/json',
+            })
+            record(time.perf_counter() - start, response.status_code == 200)
+
+async def replay(runner, senders, concurrency):
+    """
+    Replay conversations with up to ``concurrency`` senders in flight
+
+    :return: (latencies of successful and failed messages, error count, elapsed seconds)
+    """
+    latencies = []
+    errors = 0
+
+    def record(latency, ok):
+        nonlocal errors
+        latencies.append(latency)
+        if not ok:
+            errors += 1
+
+    pending = iter(senders)
+
+    async def worker():
+        for sender, bodies in pending:
+            await runner(sender, bodies, record)
+
+    start = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    return latencies, errors, time.perf_counter() - start
+
+async def run_scenarios(traces, args, fakes, verbose):
+    scenarios = Scenarios()
+    report = OrderedDict()
+    try:
+        for name, trace in traces.items():
+            senders = conversations(trace)
+            runner = getattr(scenarios, name)
+            output = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+            with output:
+                # Warm up lazy loads (catalog, language profiles, pools) outside the measurement
+                await runner(*senders[0][:1], senders[0][1][:1], lambda latency, ok: None)
+                for fake in fakes.values():
+                    fake.requests = 0
+                with RssSampler() as rss:
+                    latencies, errors, elapsed = await replay(runner, senders, args.concurrency)
+
+            latencies.sort()
+            report[name] = OrderedDict([
+                ('messages', len(latencies)),
+                ('senders', len(senders)),
+                ('errors', errors),
+                ('duration_s', round(elapsed, 3)),
+                ('throughput_per_s', round(len(latencies) / elapsed, 2) if elapsed else 0.0),
+                ('p50_ms', round(percentile(latencies, 0.50) * 1e3, 2)),
+                ('p95_ms', round(percentile(latencies, 0.95) * 1e3, 2)),
+                ('p99_ms', round(percentile(latencies, 0.99) * 1e3, 2)),
+                ('max_ms', round(latencies[-1] * 1e3, 2) if latencies else 0.0),
+                ('rss_peak_mb', round(rss.peak_mb, 1)),
+                ('rss_growth_mb', round(rss.peak_mb - rss.start_mb, 1)),
+                ('fake_requests', {service: fake.requests for service, fake in fakes.items()}),
+            ])
+    finally:
+        await scenarios.client.aclose()
+    return report
+
+def print_report(report):
+    print(f"{'scenario':<10} {'msgs':>6} {'errors':>6} {'msg/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+          f"{'RSS MB':>7} {'+MB':>5}  fake requests")
+    for name, result in report.items():
+        calls = ', '.join(f"{service} {count}" for service, count in result['fake_requests'].items() if count)
+        print(f"{name:<10} {result['messages']:>6} {result['errors']:>6} {result['throughput_per_s']:>8.1f} "
+              f"{result['p50_ms']:>8.1f} {result['p95_ms']:>8.1f} {result['p99_ms']:>8.1f} "
+              f"{result['rss_peak_mb']:>7.1f} {result['rss_growth_mb']:>5.1f}  {calls or '-'}")
+
+def regressions(report, baseline, tolerance):
+    """
+    Compare a report with a baseline report
+
+    :return: List of regression descriptions
+    """
+    found = []
+    for name, result in report.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        # Ignore sub-millisecond noise on fast scenarios
+        if result['p95_ms'] > base['p95_ms'] * (1 + tolerance) and result['p95_ms'] - base['p95_ms'] > 1:
+            found.append(f"{name}: p95 {base['p95_ms']:.1f} -> {result['p95_ms']:.1f} ms")
+        if result['throughput_per_s'] < base['throughput_per_s'] * (1 - tolerance):
+            found.append(f"{name}: throughput {base['throughput_per_s']:.1f} -> {result['throughput_per_s']:.1f} msg/s")
+        error_rate = result['errors'] / max(1, result['messages'])
+        base_error_rate = base['errors'] / max(1, base['messages'])
+        if error_rate > base_error_rate + tolerance / 10:
+            found.append(f"{name}: error rate {base_error_rate:.1%} -> {error_rate:.1%}")
+    return found
+
+def configure_environment(fakes, workdir):
+    """
+    Point the app at the fakes and a scratch database; must run before the app is imported
+    """
+    os.environ.update({
+        'HEALTHCARE_DB_PATH': os.path.join(workdir, 'healthcare.db'),
+        'INTERACTION_LOG_DIR': os.path.join(workdir, 'logs'),
+        'OPENAI_API_KEY': 'sk-load-test',
+        'OPENAI_API_BASE': fakes['openai'].url + '/v1',
+        'TWILIO_ACCOUNT_SID': 'AC' + '0' * 32,
+        'TWILIO_AUTH_TOKEN': TWILIO_AUTH_TOKEN,
+        'TWILIO_API_BASE': fakes['twilio'].url,
+        'TWILIO_WEBHOOK_BASE_URL': TWILIO_WEBHOOK_BASE_URL,
+        'TWILIO_VALIDATE_SIGNATURE': 'true',
+        'META_ACCESS_TOKEN': 'meta-load-test',
+        'INSTAGRAM_PAGE_ID': '17841400000000000',
+        'META_GRAPH_URL': fakes['meta'].url + '/v17.0',
+        'STRIPE_SECRET_KEY': 'sk_test_load_test',
+        'STRIPE_API_BASE': fakes['stripe'].url,
+        'STRIPE_WEBHOOK_SECRET': STRIPE_WEBHOOK_SECRET,
+        'REMINDERS_ENABLED': 'false',
+    })
+    # Replay compresses hours of traffic into seconds; keep the per-sender limiter out of the way
+    os.environ.setdefault('RATE_LIMIT_PER_MINUTE', '100000')
+    os.environ.setdefault('RATE_LIMIT_BURST', '1000')
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay message traces against the app with local fake services")
+    parser.add_argument('--trace', default=SEED_TRACE, help="Trace file (JSON lines); empty string for none")
+    parser.add_argument('--synthetic', type=int, default=200, help="Generated messages per scenario")
+    parser.add_argument('--arabic', type=float, default=0.3, help="Share of generated conversations in Arabic")
+    parser.add_argument('--seed', type=int, default=1, help="Seed for generated traffic")
+    parser.add_argument('--write-trace', help="Save the combined trace to this file")
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS), help="Comma-separated scenarios to run")
+    parser.add_argument('--concurrency', type=int, default=20, help="Senders in flight at once")
+    parser.add_argument('--openai-latency', type=float, default=0.2, help="Seconds per fake OpenAI request")
+    parser.add_argument('--twilio-latency', type=float, default=0.03, help="Seconds per fake Twilio request")
+    parser.add_argument('--stripe-latency', type=float, default=0.05, help="Seconds per fake Stripe request")
+    parser.add_argument('--meta-latency', type=float, default=0.03, help="Seconds per fake Meta request")
+    parser.add_argument('--output', help="Save the report as JSON")
+    parser.add_argument('--baseline', help="Report to compare with; exit 1 on regressions")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="Allowed relative slowdown against the baseline")
+    parser.add_argument('--verbose', action='store_true', help="Show the app's own output")
+    args = parser.parse_args()
+
+    names = [name for name in args.scenarios.split(',') if name]
+    unknown = set(names) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    fakes = OrderedDict([
+        ('openai', FakeOpenAI(args.openai_latency).start()),
+        ('twilio', FakeTwilio(args.twilio_latency).start()),
+        ('stripe', FakeStripe([], args.stripe_latency).start()),
+        ('meta', FakeMeta(args.meta_latency).start()),
+    ])
+    workdir = tempfile.mkdtemp(prefix='load_test_')
+    configure_environment(fakes, workdir)
+
+    from services import service_manager
+
+    rng = random.Random(args.seed)
+    services = [service['name'] for service in service_manager.get_all_services()]
+    seed_trace = read_trace(args.trace) if args.trace else []
+    traces = OrderedDict()
+    for name in names:
+        traces[name] = [record for record in seed_trace if record['channel'] == name]
+        traces[name] += synthetic_trace(name, args.synthetic, args.arabic, rng, services)
+    if args.write_trace:
+        with open(args.write_trace, 'w', encoding='utf-8') as trace_file:
+            for trace in traces.values():
+                for record in trace:
+                    trace_file.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+    print(f"fake latency: OpenAI {args.openai_latency * 1e3:.0f} ms, Twilio {args.twilio_latency * 1e3:.0f} ms, "
+          f"Stripe {args.stripe_latency * 1e3:.0f} ms, Meta {args.meta_latency * 1e3:.0f} ms; "
+          f"concurrency {args.concurrency}; database {workdir}")
+    report = asyncio.run(run_scenarios(traces, args, fakes, args.verbose))
+    print_report(report)
+
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            json.dump({'config': vars(args), 'scenarios': report}, output_file, indent=2)
+    for fake in fakes.values():
+        fake.stop()
+
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            found = regressions(report, json.load(baseline_file)['scenarios'], args.tolerance)
+        for regression in found:
+            print(f"REGRESSION {regression}")
+        if found:
+            sys.exit(1)
+        print(f"no regressions against {args.baseline} (tolerance {args.tolerance:.0%})")
+
+if __name__ == "__main__":
+    main()
@@ -2,6 +2,8 @@ import os
 from datetime import datetime
 from dotenv import load_dotenv
 from database import db  # Import the database module
+from booking_parser import booking_parser
+from slots import slot_inventory
 
 # Load environment variables
 load_dotenv()
@@ -10,15 +12,44 @@ def save_appointment(phone_number, message):
     """
     Save appointment details to SQLite database
     
+    The date, time and service are read from the message by the booking
+    parser; if the date or time is missing the user is asked for it
+    instead of being booked for "now". The time must be one of the slot
+    inventory's slot times, and a place is reserved in that slot before
+    the appointment is saved, so free-text bookings respect the same
+    capacity as the slots offered in the booking conversation.
+    
     :param phone_number: User's phone number
     :param message: Message containing appointment details
     :return: Appointment confirmation details
     """
     try:
-        # Simplified parsing - you'd want more robust parsing in production
-        date = datetime.now().strftime("%Y-%m-%d")
-        time = datetime.now().strftime("%H:%M")
-        service = "General Consultation"  # Default service
+        details = booking_parser.parse(message)
+        
+        if not details['date'] or not details['time']:
+            missing = ' and '.join(part for part in ('date', 'time') if not details[part])
+            return (f"Please include the {missing} for your appointment, "
+                    f"e.g. \"Vitamin D IV tomorrow at 3pm\" or \"Basic Health Check Up 15/10 at 10:30\".")
+        
+        date = details['date']
+        time = details['time']
+        service = details['service'] or "General Consultation"  # Default service
+        
+        appointment_at = datetime.strptime(f"{date} {time}", "%Y-%m-%d %H:%M")
+        if appointment_at < datetime.now():
+            return f"{date} at {time} has already passed. Please choose a future date and time."
+        
+        days_ahead = (appointment_at.date() - datetime.now().date()).days
+        if days_ahead >= slot_inventory.horizon_days:
+            return f"Appointments can be booked up to {slot_inventory.horizon_days} days ahead. Please choose an earlier date."
+        
+        if time not in slot_inventory.slot_times:
+            return (f"Appointments start at {format_slot_times(slot_inventory.slot_times)}. "
+                    f"{free_slots_message(date)}")
+        
+        # Take a place in the slot first, so the clinic can't be overbooked
+        if not slot_inventory.reserve(date, time):
+            return f"{date} at {time} is fully booked. {free_slots_message(date)}"
         
         # Save to database
         appointment_id = db.save_appointment(
@@ -29,14 +60,43 @@ def save_appointment(phone_number, message):
         )
         
         if appointment_id:
-            return f"Appointment booked for {date} at {time} (ID: {appointment_id})"
+            return f"Appointment booked for {service} on {date} at {time} (ID: {appointment_id})"
         else:
+            slot_inventory.release(date, time)
             return "Unable to book appointment. Please try again."
     
     except Exception as e:
         print(f"Appointment Booking Error: {e}")
         return "Unable to book appointment. Please try again."
 
+def format_slot_times(slot_times):
+    """
+    Slot times as a readable list, e.g. "9:00 AM, 11:00 AM or 2:00 PM"
+
+    :param slot_times: Times as HH:MM
+    :return: Formatted list
+    """
+    labels = [datetime.strptime(slot_time, "%H:%M").strftime("%I:%M %p").lstrip('0') for slot_time in slot_times]
+    return labels[0] if len(labels) == 1 else f"{', '.join(labels[:-1])} or {labels[-1]}"
+
+def free_slots_message(date):
+    """
+    Tell the user which slots are still free on a day
+
+    :param date: Day (YYYY-MM-DD)
+    :return: Sentence listing the free slot times, or saying the day is full
+    """
+    day = datetime.strptime(date, "%Y-%m-%d").date()
+    now = datetime.now()
+    free = [
+        slot_time
+        for slot_date, slot_time, _ in slot_inventory.next_available(len(slot_inventory.slot_times), start=day)
+        if slot_date == date and datetime.strptime(f"{slot_date} {slot_time}", "%Y-%m-%d %H:%M") > now
+    ]
+    if not free:
+        return f"There are no free slots on {date}; please choose another day."
+    return f"Free on {date}: {format_slot_times(free)}."
+
 def get_available_appointments(phone_number=None):
     """
     Retrieve available appointments from database
@@ -70,4 +130,19 @@ def update_appointment_status(appointment_id, status):
     
     except Exception as e:
         print(f"Updating Appointment Status Error: {e}")
-        return False 
\ No newline at end of file
+        return False
+
+def update_appointment_statuses(appointment_ids, status):
+    """
+    Update the status of many appointments in one transaction
+    
+    :param appointment_ids: IDs of the appointments
+    :param status: New status for all of them
+    :return: Result per appointment ID ('updated', 'unchanged' or 'not_found'), or None on failure
+    """
+    try:
+        return db.update_appointment_statuses([(appointment_id, status) for appointment_id in appointment_ids])
+    
+    except Exception as e:
+        print(f"Updating Appointment Statuses Error: {e}")
+        return None
@@ -0,0 +1,239 @@
+import re
+from datetime import date as date_cls, timedelta
+from typing import Dict, Iterable, List, Optional
+from services import service_manager
+
+WEEKDAYS = {
+    'monday': 0, 'mon': 0, 'tuesday': 1, 'tues': 1, 'tue': 1, 'wednesday': 2, 'wed': 2,
+    'thursday': 3, 'thurs': 3, 'thur': 3, 'thu': 3, 'friday': 4, 'fri': 4,
+    'saturday': 5, 'sat': 5, 'sunday': 6, 'sun': 6,
+    'الاثنين': 0, 'الإثنين': 0, 'الثلاثاء': 1, 'الأربعاء': 2, 'الاربعاء': 2, 'الخميس': 3,
+    'الجمعة': 4, 'السبت': 5, 'الأحد': 6, 'الاحد': 6,
+}
+
+MONTHS = {
+    'january': 1, 'jan': 1, 'february': 2, 'feb': 2, 'march': 3, 'mar': 3, 'april': 4, 'apr': 4,
+    'may': 5, 'june': 6, 'jun': 6, 'july': 7, 'jul': 7, 'august': 8, 'aug': 8,
+    'september': 9, 'sept': 9, 'sep': 9, 'october': 10, 'oct': 10, 'november': 11, 'nov': 11,
+    'december': 12, 'dec': 12,
+}
+
+RELATIVE_DAYS = {
+    'today': 0, 'tonight': 0, 'tomorrow': 1, 'tmrw': 1, 'tmr': 1, 'tomorow': 1,
+    'day after tomorrow': 2, 'the day after tomorrow': 2,
+    'اليوم': 0, 'غدا': 1, 'غداً': 1, 'بكرة': 1, 'بكره': 1, 'بعد غد': 2, 'بعد بكرة': 2,
+}
+
+# Arabic-Indic and Persian digits to ASCII
+DIGITS = str.maketrans('٠١٢٣٤٥٦٧٨٩۰۱۲۳۴۵۶۷۸۹', '01234567890123456789')
+
+# Words dropped from either end of catalog names to build the short forms people type
+SERVICE_PREFIXES = ('complete', 'the')
+SERVICE_SUFFIXES = ('therapy', 'iv', 'test', 'tests', 'profile', 'package', 'up')
+
+def _alternation(words: Iterable[str]) -> str:
+    """
+    Regex matching any of the literal phrases, built as a prefix trie
+
+    Python's re engine tries alternatives one by one; factoring shared
+    prefixes ("thu|thur|thurs|thursday" -> "thu(?:r(?:s(?:day)?)?)?")
+    means a non-matching position fails after one character instead of
+    after every phrase. Spaces match any run of whitespace.
+
+    :param words: Lowercase phrases
+    :return: Regex source (longest match preferred)
+    """
+    trie = {}
+    for word in set(words):
+        node = trie
+        for char in ' '.join(word.split()):
+            node = node.setdefault(char, {})
+        node[''] = {}
+
+    def build(node):
+        branches = [
+            (r'\s+' if char == ' ' else re.escape(char)) + build(child)
+            for char, child in sorted(node.items()) if char
+        ]
+        if not branches:
+            return ''
+        body = '|'.join(branches)
+        if '' in node:
+            # A phrase ends here; the rest is optional (greedy, so longer phrases win)
+            return f'(?:{body})?'
+        return body if len(branches) == 1 else f'(?:{body})'
+
+    return build(trie)
+
+class BookingParser:
+    """
+    Extracts date, time and service from a free-text booking request.
+
+    Everything is matched by one precompiled regex in a single left-to-right
+    pass: relative days ("tomorrow", "in 3 days", "بكرة"), weekdays
+    ("Thursday", "next thu"), numeric dates (day first: "15/10",
+    "15-10-2025", ISO "2025-10-15"), month-name dates ("15th Oct",
+    "October 15"), times ("3pm", "15:30", "at 9", "noon") and catalog
+    service names including their common short forms ("nad 250",
+    "vitamin d iv", "std test"). The first match of each kind wins.
+    """
+
+    def __init__(self, services: List[Dict] = None, clinic_opens: int = 8, clinic_closes: int = 20):
+        """
+        Initialize the parser
+
+        :param services: Catalog services to recognise (default: the service manager catalog)
+        :param clinic_opens: Opening hour; a bare "at 3" before it is read as PM
+        :param clinic_closes: Closing hour
+        """
+        self.clinic_opens = clinic_opens
+        self.clinic_closes = clinic_closes
+        self.services = {}
+        for service in (services if services is not None else service_manager.get_all_services()):
+            for alias in self.service_aliases(service):
+                # Aliases shared by two services are ambiguous; drop them
+                self.services[alias] = None if alias in self.services and self.services[alias] is not service else service
+        self.services = {alias: service for alias, service in self.services.items() if service is not None}
+        self.pattern = self._compile()
+
+    @staticmethod
+    def service_aliases(service: Dict) -> List[str]:
+        """
+        Lowercase names a service can be referred to by
+
+        :param service: Catalog service
+        :return: Aliases, including the full name
+        """
+        name = service['name'].lower()
+        forms = {name, re.sub(r'\s*\([^)]*\)', '', name)}
+        if service.get('id'):
+            forms.add(service['id'].replace('_', ' '))
+
+        for form in list(forms):
+            words = form.split()
+            if len(words) > 1 and words[0] in SERVICE_PREFIXES:
+                forms.add(' '.join(words[1:]))
+            while len(words) > 1 and words[-1] in SERVICE_SUFFIXES:
+                words = words[:-1]
+                forms.add(' '.join(words))
+            # "nad 250mg" is usually typed as "nad 250"
+            forms.add(re.sub(r'(\d+)\s*mg\b', r'\1', ' '.join(words)))
+
+        return [form.strip() for form in forms if len(form.strip()) > 2]
+
+    def _compile(self):
+        weekday = _alternation(WEEKDAYS)
+        month = _alternation(MONTHS)
+        relative = _alternation(RELATIVE_DAYS)
+        service = _alternation(self.services) or r'(?!x)x'
+        # One lookbehind up front lets the engine skip mid-word positions
+        # before trying any alternative; every alternative must end a word
+        return re.compile(
+            r'(?<!\w)(?:'
+            rf'(?P<service>{service})'
+            rf'|(?P<time>(?P<t_h>\d{{1,2}})(?::|\.(?=\d\d\s*[ap]))(?P<t_m>\d{{2}})\s*(?P<t_ap>[ap])\.?m?\.?'
+            rf'|(?P<t_h2>\d{{1,2}})\s*(?P<t_ap2>[ap])\.?m\.?'
+            rf'|(?P<t_h3>[01]?\d|2[0-3]):(?P<t_m3>[0-5]\d)'
+            rf'|(?:at|@|الساعة)\s*(?P<t_h4>\d{{1,2}})(?!\s*(?:[/.:\-]\d|[ap]\.?m\b|%))'
+            rf'|(?P<noon>noon|midday))'
+            rf'|(?P<iso>(?P<iso_y>\d{{4}})-(?P<iso_m>\d{{1,2}})-(?P<iso_d>\d{{1,2}}))'
+            rf'|(?P<dmy>(?P<dmy_d>\d{{1,2}})[/.\-](?P<dmy_m>\d{{1,2}})(?:[/.\-](?P<dmy_y>\d{{2,4}}))?)'
+            rf'|(?P<in_days>in\s+(?P<in_n>\d{{1,2}})\s+days?)'
+            rf'|(?P<relative>{relative})'
+            rf'|(?P<dm_name>(?P<dm_d>\d{{1,2}})(?:st|nd|rd|th)?\s*(?:of\s+)?(?P<dm_m>{month})'
+            rf'|(?P<md_m>{month})\s+(?P<md_d>\d{{1,2}})(?:st|nd|rd|th)?)'
+            rf'|(?P<weekday>(?:(?:next|this|coming)\s+)?(?P<wd>{weekday}))'
+            r')(?!\w)',
+            re.IGNORECASE
+        )
+
+    def parse(self, message: str, today: date_cls = None) -> Dict[str, Optional[str]]:
+        """
+        Extract booking details from a message
+
+        :param message: User's message
+        :param today: Reference date for relative expressions (default: today)
+        :return: Dict with 'date' (YYYY-MM-DD), 'time' (HH:MM), 'service' and 'service_id', each None if not found
+        """
+        today = today or date_cls.today()
+        result = {'date': None, 'time': None, 'service': None, 'service_id': None}
+
+        for match in self.pattern.finditer((message or '').translate(DIGITS)):
+            # The outer group of each alternative closes last, so lastgroup names the kind of match
+            kind = match.lastgroup
+
+            if kind == 'service':
+                if result['service'] is None:
+                    service = self.services[' '.join(match.group('service').lower().split())]
+                    result['service'] = service['name']
+                    result['service_id'] = service.get('id')
+            elif kind == 'time':
+                if result['time'] is None:
+                    result['time'] = self._time(match.groupdict())
+            elif result['date'] is None:
+                result['date'] = self._match_date(kind, match.groupdict(), today)
+
+            if result['date'] and result['time'] and result['service']:
+                break
+
+        return result
+
+    def _match_date(self, kind: str, groups: Dict[str, Optional[str]], today: date_cls) -> Optional[str]:
+        if kind == 'relative':
+            offset = RELATIVE_DAYS[' '.join(groups['relative'].lower().split())]
+            return (today + timedelta(days=offset)).isoformat()
+        if kind == 'in_days':
+            return (today + timedelta(days=int(groups['in_n']))).isoformat()
+        if kind == 'iso':
+            return self._date(today, int(groups['iso_d']), int(groups['iso_m']), int(groups['iso_y']))
+        if kind == 'dmy':
+            year = groups['dmy_y']
+            year = int(year) + (2000 if len(year) == 2 else 0) if year else None
+            return self._date(today, int(groups['dmy_d']), int(groups['dmy_m']), year)
+        if kind == 'dm_name':
+            day = groups['dm_d'] or groups['md_d']
+            month = MONTHS[(groups['dm_m'] or groups['md_m']).lower()]
+            return self._date(today, int(day), month, None)
+        if kind == 'weekday':
+            # Next occurrence after today ("Thursday" said on a Thursday means next week)
+            ahead = (WEEKDAYS[groups['wd'].lower()] - today.weekday()) % 7 or 7
+            return (today + timedelta(days=ahead)).isoformat()
+        return None
+
+    def _time(self, groups: Dict[str, Optional[str]]) -> Optional[str]:
+        if groups['noon'] is not None:
+            return '12:00'
+        if groups['t_h3'] is not None:
+            return f"{int(groups['t_h3']):02d}:{groups['t_m3']}"
+
+        hour = int(groups['t_h'] or groups['t_h2'] or groups['t_h4'])
+        minute = int(groups['t_m'] or 0)
+        meridiem = (groups['t_ap'] or groups['t_ap2'] or '').lower()
+        if hour > 23 or (meridiem and not 1 <= hour <= 12):
+            return None
+        if meridiem == 'p' and hour != 12:
+            hour += 12
+        elif meridiem == 'a' and hour == 12:
+            hour = 0
+        elif not meridiem and hour < self.clinic_opens and hour + 12 <= self.clinic_closes:
+            # "at 3" means 3 PM at a clinic open 8-20
+            hour += 12
+        return f"{hour:02d}:{minute:02d}"
+
+    @staticmethod
+    def _date(today: date_cls, day: int, month: int, year: Optional[int]) -> Optional[str]:
+        """
+        Build a date; without a year, the next occurrence from today
+        """
+        try:
+            if year is not None:
+                return date_cls(year, month, day).isoformat()
+            candidate = date_cls(today.year, month, day)
+            if candidate < today:
+                candidate = date_cls(today.year + 1, month, day)
+            return candidate.isoformat()
+        except ValueError:
+            return None
+
+# Create a global booking parser instance
+booking_parser = BookingParser()
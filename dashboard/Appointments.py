@@ -1,94 +1,88 @@
 import streamlit as st
 import pandas as pd
-import gspread
-from google.oauth2.service_account import Credentials
 import os
+import sys
 from dotenv import load_dotenv
 
+# Add the parent directory to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analytics import analytics, sheets_mirror
+
 # Load environment variables
 load_dotenv()
 
-def get_google_sheets_client():
+def report_status_update(appointment_ids, status):
     """
-    Authenticate and return Google Sheets client
+    Apply one status to the selected appointments in a single batch and report the outcome
     """
-    try:
-        credentials_path = os.getenv('GOOGLE_SHEETS_CREDENTIALS')
-        
-        scopes = [
-            'https://www.googleapis.com/auth/spreadsheets',
-            'https://www.googleapis.com/auth/drive'
-        ]
-        
-        credentials = Credentials.from_service_account_file(
-            credentials_path, 
-            scopes=scopes
-        )
-        
-        return gspread.authorize(credentials)
-    except Exception as e:
-        st.error(f"Google Sheets Authentication Error: {e}")
-        return None
+    results = analytics.update_statuses('appointments', [(appointment_id, status) for appointment_id in appointment_ids])
+    updated = [appointment_id for appointment_id, result in results.items() if result == 'updated']
+    unchanged = [appointment_id for appointment_id, result in results.items() if result == 'unchanged']
+    missing = [appointment_id for appointment_id, result in results.items() if result == 'not_found']
+
+    if updated:
+        st.success(f"{len(updated)} appointment(s) {status.lower()}")
+    if unchanged:
+        st.info(f"{len(unchanged)} appointment(s) were already {status.lower()}")
+    if missing:
+        st.error(f"Not found: {', '.join(f'#{appointment_id}' for appointment_id in missing)}")
 
 def main():
     st.title("📅 Appointments Management")
-    
-    # Fetch appointments from Google Sheets
+
+    # Fetch appointments from the local analytics store
     try:
-        client = get_google_sheets_client()
-        appointments_sheet = client.open('Healthcare Appointments').sheet1
-        appointments_data = appointments_sheet.get_all_records()
-        
-        # Convert to DataFrame for easier manipulation
-        df = pd.DataFrame(appointments_data)
-        
+        if analytics.backend == 'sheets' and st.sidebar.button("Sync from Google Sheets"):
+            sheets_mirror.sync_all()
+
         # Filters
         st.sidebar.header("Appointment Filters")
+        statuses = analytics.appointment_statuses()
         status_filter = st.sidebar.multiselect(
-            "Filter by Status", 
-            options=df['Status'].unique(),
-            default=df['Status'].unique()
+            "Filter by Status",
+            options=statuses,
+            default=statuses
         )
-        
+
         # Date range filter
-        from_date = st.sidebar.date_input("From Date")
-        to_date = st.sidebar.date_input("To Date")
-        
-        # Apply filters
-        filtered_df = df[
-            (df['Status'].isin(status_filter)) & 
-            (pd.to_datetime(df['Date']) >= pd.to_datetime(from_date)) & 
-            (pd.to_datetime(df['Date']) <= pd.to_datetime(to_date))
-        ]
-        
+        date_range = st.sidebar.date_input("Date Range", value=())
+        from_date = date_range[0].isoformat() if len(date_range) > 0 else None
+        to_date = date_range[-1].isoformat() if len(date_range) > 0 else None
+
+        # Filtering runs in SQLite
+        filtered_df = pd.DataFrame(analytics.appointments(
+            statuses=status_filter,
+            date_from=from_date,
+            date_to=to_date
+        ))
+
         # Display appointments
         st.dataframe(filtered_df)
-        
-        # Appointment actions
+
+        if filtered_df.empty:
+            return
+
+        # Appointment actions: every selected appointment is updated in one batch
         st.subheader("Appointment Actions")
-        selected_appointment = st.selectbox(
-            "Select Appointment", 
-            filtered_df.index
+        selected_appointments = st.multiselect(
+            "Select Appointments",
+            [int(appointment_id) for appointment_id in filtered_df['id']],
+            format_func=lambda appointment_id: f"#{appointment_id}"
         )
-        
+
         col1, col2 = st.columns(2)
-        
+
         with col1:
-            if st.button("Confirm Appointment"):
-                # Update status in Google Sheets
-                cell = appointments_sheet.find(str(selected_appointment))
-                appointments_sheet.update_cell(cell.row, 5, "Confirmed")
-                st.success("Appointment Confirmed!")
-        
+            if st.button("Confirm Appointments", disabled=not selected_appointments):
+                report_status_update(selected_appointments, "Confirmed")
+
         with col2:
-            if st.button("Cancel Appointment"):
-                # Update status in Google Sheets
-                cell = appointments_sheet.find(str(selected_appointment))
-                appointments_sheet.update_cell(cell.row, 5, "Cancelled")
-                st.warning("Appointment Cancelled!")
-    
+            if st.button("Cancel Appointments", disabled=not selected_appointments):
+                report_status_update(selected_appointments, "Cancelled")
+
     except Exception as e:
         st.error(f"Error loading appointments: {e}")
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
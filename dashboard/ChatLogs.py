@@ -2,73 +2,146 @@ import streamlit as st
 import pandas as pd
 import sys
 import os
+from dotenv import load_dotenv
 
 # Add the parent directory to Python path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from database import db
+from interaction_log import interaction_log
+
+# Load environment variables
+load_dotenv()
+
+CHAT_LOGS_CACHE_SECONDS = int(os.getenv('CHAT_LOGS_CACHE_SECONDS', '15'))
+PAGE_SIZES = [50, 100, 250, 500]
+LIVE_LOG_RECORDS = 200
+
+@st.cache_data(ttl=CHAT_LOGS_CACHE_SECONDS, show_spinner=False)
+def load_chat_logs_page(phone_number, directions, date_from, date_to, cursor, limit):
+    """
+    One page of chat logs, cached briefly so reruns don't hit SQLite again
+    """
+    return db.get_chat_logs_page(
+        phone_number=phone_number,
+        directions=list(directions) if directions else None,
+        date_from=date_from,
+        date_to=date_to,
+        cursor=cursor,
+        limit=limit
+    )
+
+@st.cache_data(ttl=600, show_spinner=False)
+def load_chat_directions():
+    return db.get_chat_directions()
+
+@st.cache_data(ttl=60, show_spinner=False)
+def load_chat_phone_numbers(prefix):
+    return db.get_chat_phone_numbers(prefix)
+
+def show_interaction_log():
+    """
+    Follow logs/interactions.jsonl: each rerun reads only the lines appended since the last one
+    """
+    with st.expander("Live Interaction Log"):
+        if 'interaction_log_offset' not in st.session_state:
+            records, offset = interaction_log.recent(LIVE_LOG_RECORDS)
+        else:
+            records, offset = interaction_log.tail(st.session_state['interaction_log_offset'])
+            records = (st.session_state['interaction_log_records'] + records)[-LIVE_LOG_RECORDS:]
+        st.session_state['interaction_log_offset'] = offset
+        st.session_state['interaction_log_records'] = records
+
+        st.button("Refresh")
+        if records:
+            st.dataframe(pd.DataFrame(records[::-1]))
+        else:
+            st.caption("No interactions logged yet")
 
 def main():
     st.title("💬 Chat Logs")
-    
-    # Fetch chat logs from SQLite database
+
     try:
-        # Connect to database and fetch logs
-        conn = db._connect()
-        cursor = db.cursor
-        
-        # Fetch chat logs
-        cursor.execute("SELECT * FROM chat_logs ORDER BY created_at DESC")
-        columns = [column[0] for column in cursor.description]
-        chat_logs = [dict(zip(columns, row)) for row in cursor.fetchall()]
-        
-        # Convert to DataFrame
-        df = pd.DataFrame(chat_logs)
-        
         # Filters
         st.sidebar.header("Chat Log Filters")
-        
-        # Phone number filter
-        phone_numbers = df['phone_number'].unique()
-        selected_phone = st.sidebar.selectbox(
-            "Filter by Phone Number", 
-            options=['All'] + list(phone_numbers)
-        )
-        
+
+        # Phone number filter: search by prefix instead of listing every number
+        phone_prefix = st.sidebar.text_input("Search Phone Number").strip()
+        selected_phone = 'All'
+        if phone_prefix:
+            selected_phone = st.sidebar.selectbox(
+                "Filter by Phone Number",
+                options=['All'] + load_chat_phone_numbers(phone_prefix)
+            )
+
         # Direction filter
+        directions = load_chat_directions()
         direction_filter = st.sidebar.multiselect(
-            "Filter by Direction", 
-            options=df['direction'].unique(),
-            default=df['direction'].unique()
+            "Filter by Direction",
+            options=directions,
+            default=directions
         )
-        
-        # Apply filters
-        filtered_df = df[
-            ((selected_phone == 'All') or (df['phone_number'] == selected_phone)) &
-            (df['direction'].isin(direction_filter))
-        ]
-        
-        # Display filtered logs
-        st.dataframe(filtered_df)
-        
-        # Detailed log view
-        st.subheader("Detailed Chat Log")
-        selected_log = st.selectbox(
-            "Select a Chat Log", 
-            filtered_df.index
+
+        # Date range filter
+        date_range = st.sidebar.date_input("Date Range", value=())
+        date_from = date_range[0].isoformat() if len(date_range) > 0 else None
+        date_to = date_range[-1].isoformat() if len(date_range) > 0 else None
+
+        page_size = st.sidebar.selectbox("Rows per Page", options=PAGE_SIZES, index=1)
+
+        filters = (
+            None if selected_phone == 'All' else selected_phone,
+            # Every direction selected is the same as no filter and keeps the query simpler
+            None if set(direction_filter) == set(directions) else tuple(sorted(direction_filter)),
+            date_from,
+            date_to,
+            page_size
         )
-        
-        # Display selected log details
-        if selected_log is not None:
-            log_details = filtered_df.loc[selected_log]
-            st.json(log_details.to_dict())
-    
+
+        # Cursors of the pages seen so far; reset whenever a filter changes
+        if st.session_state.get('chat_logs_filters') != filters:
+            st.session_state['chat_logs_filters'] = filters
+            st.session_state['chat_logs_cursors'] = [None]
+        cursors = st.session_state['chat_logs_cursors']
+
+        if direction_filter:
+            page = load_chat_logs_page(*filters[:4], cursors[-1], page_size)
+        else:
+            page = {'chat_logs': [], 'next_cursor': None}
+        df = pd.DataFrame(page['chat_logs'])
+
+        # Display current page
+        st.caption(f"Page {len(cursors)} · {len(df)} chat logs")
+        st.dataframe(df)
+
+        first_col, previous_col, next_col = st.columns(3)
+        if first_col.button("⏮ First", disabled=len(cursors) == 1):
+            st.session_state['chat_logs_cursors'] = [None]
+            st.experimental_rerun()
+        if previous_col.button("◀ Previous", disabled=len(cursors) == 1):
+            cursors.pop()
+            st.experimental_rerun()
+        if next_col.button("Next ▶", disabled=page['next_cursor'] is None):
+            cursors.append(page['next_cursor'])
+            st.experimental_rerun()
+
+        # Detailed log view
+        if not df.empty:
+            st.subheader("Detailed Chat Log")
+            selected_log = st.selectbox(
+                "Select a Chat Log",
+                df.index,
+                format_func=lambda index: f"#{df.loc[index, 'id']} · {df.loc[index, 'phone_number']} · {df.loc[index, 'created_at']}"
+            )
+
+            # Display selected log details
+            if selected_log is not None:
+                st.json(df.loc[selected_log].to_dict())
+
+        show_interaction_log()
+
     except Exception as e:
         st.error(f"Error loading chat logs: {e}")
-    
-    finally:
-        # Close database connection
-        db._close()
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
@@ -1,35 +1,17 @@
 import streamlit as st
 import pandas as pd
-import gspread
-from google.oauth2.service_account import Credentials
 import os
+import sys
 from dotenv import load_dotenv
 
+# Add the parent directory to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analytics import analytics
+
 # Load environment variables
 load_dotenv()
 
-def get_google_sheets_client():
-    """
-    Authenticate and return Google Sheets client
-    """
-    try:
-        credentials_path = os.getenv('GOOGLE_SHEETS_CREDENTIALS')
-        
-        scopes = [
-            'https://www.googleapis.com/auth/spreadsheets',
-            'https://www.googleapis.com/auth/drive'
-        ]
-        
-        credentials = Credentials.from_service_account_file(
-            credentials_path, 
-            scopes=scopes
-        )
-        
-        return gspread.authorize(credentials)
-    except Exception as e:
-        st.error(f"Google Sheets Authentication Error: {e}")
-        return None
-
 def main():
     st.set_page_config(
         page_title="Healthcare Assistant Dashboard",
@@ -61,17 +43,9 @@ def main():
     if page == "Dashboard":
         st.header("Dashboard Overview")
         
-        # Fetch data from Google Sheets
+        # Aggregates from the local analytics store (cached, no network calls)
         try:
-            client = get_google_sheets_client()
-            
-            # Appointments
-            appointments_sheet = client.open('Healthcare Appointments').sheet1
-            appointments_data = appointments_sheet.get_all_records()
-            
-            # Payments
-            payments_sheet = client.open('Payment Logs').sheet1
-            payments_data = payments_sheet.get_all_records()
+            summary = analytics.summary()
             
             # Display metrics
             col1, col2, col3 = st.columns(3)
@@ -79,20 +53,28 @@ def main():
             with col1:
                 st.metric(
                     label="Total Appointments", 
-                    value=len(appointments_data)
+                    value=summary['appointments']
                 )
             
             with col2:
                 st.metric(
                     label="Total Revenue", 
-                    value=f"AED {sum(float(payment['Amount']) for payment in payments_data):.2f}"
+                    value=f"AED {summary['revenue']:.2f}"
                 )
             
             with col3:
                 st.metric(
                     label="Pending Payments", 
-                    value=len([p for p in payments_data if p['Status'] == 'Pending'])
+                    value=summary['pending_payments']
                 )
+            
+            # Last 30 days, read from the daily rollups
+            daily = pd.DataFrame(analytics.daily_totals(days=30))
+            if not daily.empty:
+                daily = daily.set_index('day')
+                st.subheader("Last 30 Days")
+                st.line_chart(daily[['appointments', 'payments']])
+                st.bar_chart(daily['revenue'])
         
         except Exception as e:
             st.error(f"Error fetching dashboard data: {e}")
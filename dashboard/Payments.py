@@ -1,69 +1,56 @@
 import streamlit as st
 import pandas as pd
-import gspread
-from google.oauth2.service_account import Credentials
 import os
+import sys
 from dotenv import load_dotenv
 import stripe
 
+# Add the parent directory to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analytics import analytics, sheets_mirror
+from executor import executor
+from payments import session_payment_status
+
 # Load environment variables
 load_dotenv()
 
 # Configure Stripe
 stripe.api_key = os.getenv('STRIPE_SECRET_KEY')
 
-def get_google_sheets_client():
-    """
-    Authenticate and return Google Sheets client
-    """
-    try:
-        credentials_path = os.getenv('GOOGLE_SHEETS_CREDENTIALS')
-        
-        scopes = [
-            'https://www.googleapis.com/auth/spreadsheets',
-            'https://www.googleapis.com/auth/drive'
-        ]
-        
-        credentials = Credentials.from_service_account_file(
-            credentials_path, 
-            scopes=scopes
-        )
-        
-        return gspread.authorize(credentials)
-    except Exception as e:
-        st.error(f"Google Sheets Authentication Error: {e}")
-        return None
-
 def main():
     st.title("💳 Payment Management")
     
-    # Fetch payment logs from Google Sheets
+    # Fetch payments from the local analytics store
     try:
-        client = get_google_sheets_client()
-        payments_sheet = client.open('Payment Logs').sheet1
-        payments_data = payments_sheet.get_all_records()
-        
-        # Convert to DataFrame for easier manipulation
-        df = pd.DataFrame(payments_data)
+        if analytics.backend == 'sheets' and st.sidebar.button("Sync from Google Sheets"):
+            sheets_mirror.sync_all()
         
         # Filters
         st.sidebar.header("Payment Filters")
+        statuses = analytics.payment_statuses()
         status_filter = st.sidebar.multiselect(
             "Filter by Status", 
-            options=df['Status'].unique(),
-            default=df['Status'].unique()
+            options=statuses,
+            default=statuses
         )
         
         # Date range filter
-        from_date = st.sidebar.date_input("From Date")
-        to_date = st.sidebar.date_input("To Date")
-        
-        # Apply filters
-        filtered_df = df[
-            (df['Status'].isin(status_filter)) & 
-            (pd.to_datetime(df['Timestamp']) >= pd.to_datetime(from_date)) & 
-            (pd.to_datetime(df['Timestamp']) <= pd.to_datetime(to_date))
-        ]
+        date_range = st.sidebar.date_input("Date Range", value=())
+        from_date = date_range[0].isoformat() if len(date_range) > 0 else None
+        to_date = date_range[-1].isoformat() if len(date_range) > 0 else None
+        
+        # Filtering and totals run in SQLite
+        filtered_df = pd.DataFrame(analytics.payments(
+            statuses=status_filter,
+            date_from=from_date,
+            date_to=to_date
+        ))
+        summary = analytics.payment_summary(
+            statuses=status_filter,
+            date_from=from_date,
+            date_to=to_date
+        )
         
         # Display payments
         st.dataframe(filtered_df)
@@ -75,65 +62,68 @@ def main():
         with col1:
             st.metric(
                 label="Total Payments", 
-                value=len(filtered_df)
+                value=summary['payments']
             )
         
         with col2:
             st.metric(
                 label="Total Revenue", 
-                value=f"AED {filtered_df['Amount'].sum():.2f}"
+                value=f"AED {summary['revenue']:.2f}"
             )
         
         with col3:
             st.metric(
                 label="Pending Payments", 
-                value=len(filtered_df[filtered_df['Status'] == 'Pending'])
+                value=summary['pending']
             )
         
-        # Detailed payment actions
+        if filtered_df.empty:
+            return
+        
+        # Payment actions: Stripe is called per session, statuses are written in one batch
         st.subheader("Payment Actions")
-        selected_payment = st.selectbox(
-            "Select Payment", 
-            filtered_df.index
+        selected_sessions = st.multiselect(
+            "Select Payments", 
+            list(filtered_df['session_id'].dropna()),
+            format_func=lambda session_id: f"#{filtered_df.loc[filtered_df['session_id'] == session_id, 'id'].iloc[0]} · {session_id}"
         )
         
         col1, col2 = st.columns(2)
         
         with col1:
-            if st.button("Verify Payment"):
+            if st.button("Verify Payments", disabled=not selected_sessions):
                 # Verify Stripe payment status
-                session_id = filtered_df.loc[selected_payment, 'SessionID']
                 try:
-                    session = stripe.checkout.Session.retrieve(session_id)
-                    status = session.payment_status
+                    sessions = list(executor.io_pool.map(stripe.checkout.Session.retrieve, selected_sessions))
+                    updates = [(session.id, session_payment_status(session)) for session in sessions]
                     
-                    # Update status in Google Sheets
-                    cell = payments_sheet.find(session_id)
-                    payments_sheet.update_cell(cell.row, 6, status)
+                    analytics.update_statuses('payments', updates)
                     
-                    st.success(f"Payment Status: {status}")
+                    for session_id, status in updates:
+                        st.success(f"{session_id}: {status}")
                 except Exception as e:
                     st.error(f"Verification Error: {e}")
         
         with col2:
-            if st.button("Refund Payment"):
-                # Initiate Stripe refund
-                session_id = filtered_df.loc[selected_payment, 'SessionID']
-                try:
-                    session = stripe.checkout.Session.retrieve(session_id)
-                    payment_intent = session.payment_intent
-                    
-                    refund = stripe.Refund.create(
-                        payment_intent=payment_intent
-                    )
-                    
-                    # Update status in Google Sheets
-                    cell = payments_sheet.find(session_id)
-                    payments_sheet.update_cell(cell.row, 6, "Refunded")
-                    
-                    st.warning(f"Refund Processed: {refund.id}")
-                except Exception as e:
-                    st.error(f"Refund Error: {e}")
+            if st.button("Refund Payments", disabled=not selected_sessions):
+                # Initiate Stripe refunds
+                refunded = []
+                for session_id in selected_sessions:
+                    try:
+                        session = stripe.checkout.Session.retrieve(session_id)
+                        payment_intent = session.payment_intent
+                        
+                        refund = stripe.Refund.create(
+                            payment_intent=payment_intent
+                        )
+                        refunded.append((session_id, "Refunded"))
+                        
+                        st.warning(f"Refund Processed: {refund.id}")
+                    except Exception as e:
+                        st.error(f"Refund Error ({session_id}): {e}")
+                
+                if refunded:
+                    analytics.update_statuses('payments', refunded)
     
     except Exception as e:
         st.error(f"Error loading payments: {e}")
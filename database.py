@@ -1,43 +1,84 @@
 import sqlite3
 import os
+import threading
 from datetime import datetime
-from typing import Dict, Any, List
+from typing import Callable, Dict, Any, Iterator, List, Tuple
+from migrations import apply_migrations
+from tracing import tracer
 
 class HealthcareDatabase:
-    def __init__(self, db_path='healthcare.db'):
+    def __init__(self, db_path='healthcare.db', initialize: bool = True):
         """
         Initialize database connection
         
-        :param db_path: Path to SQLite database file
+        :param db_path: Path to SQLite database file (relative paths are in the project directory;
+                        the global instance uses HEALTHCARE_DB_PATH, default healthcare.db)
+        :param initialize: Create the tables and apply migrations now; when False this happens
+                           on the first connection (the global instance, so importing is cheap)
         """
         # Ensure the database is in the project directory
         self.db_path = os.path.join(os.path.dirname(__file__), db_path)
-        self.conn = None
-        self.cursor = None
-        self._create_tables()
+        # Connections are per thread so methods can run from worker pools
+        self._local = threading.local()
+        # Callbacks notified after committed changes: callback(table, changes)
+        self._change_listeners = []
+        self._initialized = False
+        self._init_lock = threading.Lock()
+        if initialize:
+            self.initialize()
+
+    def initialize(self):
+        """
+        Create the tables and apply pending migrations, once per process
+        
+        Runs on the first connection; the apps call it at startup so the
+        first request doesn't wait for it.
+        """
+        if self._initialized:
+            return
+        with self._init_lock:
+            if not self._initialized:
+                self._create_tables()
+                self._migrate()
+                self._initialized = True
+
+    @property
+    def conn(self):
+        return getattr(self._local, 'conn', None)
+
+    @property
+    def cursor(self):
+        return getattr(self._local, 'cursor', None)
 
     def _connect(self):
         """
-        Establish database connection
+        Establish database connection for the current thread
         """
         if not self.conn:
-            self.conn = sqlite3.connect(self.db_path)
-            self.cursor = self.conn.cursor()
+            self.initialize()
+            self._open()
+
+    def _open(self):
+        self._local.conn = sqlite3.connect(self.db_path, timeout=30)
+        self._local.cursor = self._local.conn.cursor()
 
     def _close(self):
         """
-        Close database connection
+        Close the current thread's database connection
         """
         if self.conn:
             self.conn.close()
-            self.conn = None
-            self.cursor = None
+            self._local.conn = None
+            self._local.cursor = None
 
     def _create_tables(self):
         """
         Create necessary tables if they don't exist
         """
-        self._connect()
+        self._open()
+        
+        # WAL lets readers run alongside a writer from another worker process
+        self.cursor.execute('PRAGMA journal_mode=WAL')
         
         # Appointments table
         self.cursor.execute('''
@@ -80,14 +121,23 @@ class HealthcareDatabase:
         self.conn.commit()
         self._close()
 
-    def save_appointment(self, phone_number: str, service: str, date: str, time: str) -> int:
+    def _migrate(self):
+        """
+        Apply pending schema migrations (indexes etc.) from migrations.py
+        """
+        applied = apply_migrations(self.db_path)
+        if applied:
+            print(f"Applied database migrations: {applied}")
+
+    def save_appointment(self, phone_number: str, service: str, date: str, time: str, status: str = 'Pending') -> int:
         """
         Save an appointment to the database
         
         :param phone_number: User's phone number
         :param service: Service type
-        :param date: Appointment date
-        :param time: Appointment time
+        :param date: Appointment date (YYYY-MM-DD)
+        :param time: Appointment time (HH:MM)
+        :param status: Initial status
         :return: Appointment ID
         """
         self._connect()
@@ -95,9 +145,9 @@ class HealthcareDatabase:
         try:
             self.cursor.execute('''
                 INSERT INTO appointments 
-                (phone_number, service, date, time) 
-                VALUES (?, ?, ?, ?)
-            ''', (phone_number, service, date, time))
+                (phone_number, service, date, time, status) 
+                VALUES (?, ?, ?, ?, ?)
+            ''', (phone_number, service, date, time, status))
             
             self.conn.commit()
             appointment_id = self.cursor.lastrowid
@@ -110,6 +160,41 @@ class HealthcareDatabase:
         finally:
             self._close()
 
+    def save_appointments_bulk(self, appointments: List[Dict[str, Any]]) -> int:
+        """
+        Insert many appointments in a single transaction
+        
+        :param appointments: Dicts with phone_number, service, date, time and optional status/created_at
+        :return: Number of rows inserted (0 if the transaction was rolled back)
+        """
+        self._connect()
+        
+        try:
+            with self.conn:
+                self.cursor.executemany('''
+                    INSERT INTO appointments 
+                    (phone_number, service, date, time, status, created_at) 
+                    VALUES (?, ?, ?, ?, ?, COALESCE(?, CURRENT_TIMESTAMP))
+                ''', [
+                    (
+                        appointment['phone_number'],
+                        appointment['service'],
+                        appointment['date'],
+                        appointment['time'],
+                        appointment.get('status', 'Pending'),
+                        appointment.get('created_at')
+                    )
+                    for appointment in appointments
+                ])
+            return len(appointments)
+        
+        except sqlite3.Error as e:
+            print(f"Database error: {e}")
+            return 0
+        
+        finally:
+            self._close()
+
     def save_payment(self, phone_number: str, service: str, amount: float, session_id: str) -> int:
         """
         Save a payment to the database
@@ -140,6 +225,64 @@ class HealthcareDatabase:
         finally:
             self._close()
 
+    def update_payment_statuses(self, updates: List[Tuple[str, str]]) -> int:
+        """
+        Update the status of many payments by Stripe session ID in one transaction
+        
+        Late or out-of-order events never move a payment out of 'Paid' or
+        'Refunded', except 'Paid' -> 'Refunded'.
+        
+        :param updates: List of (session_id, status) pairs
+        :return: Number of rows changed, or None if the transaction was rolled back
+        """
+        self._connect()
+        
+        try:
+            with self.conn:
+                self.cursor.executemany('''
+                    UPDATE payments 
+                    SET status = ? 
+                    WHERE session_id = ? 
+                    AND status != ? 
+                    AND (status NOT IN ('Paid', 'Refunded') OR (status = 'Paid' AND ? = 'Refunded'))
+                ''', [(status, session_id, status, status) for session_id, status in updates])
+            return self.cursor.rowcount
+        
+        except sqlite3.Error as e:
+            print(f"Database error: {e}")
+            return None
+        
+        finally:
+            self._close()
+
+    def get_payment_statuses(self, session_ids: List[str]) -> Dict[str, str]:
+        """
+        Current status of payments by Stripe session ID
+        
+        :param session_ids: Stripe session IDs
+        :return: Session ID -> status for the sessions found
+        """
+        self._connect()
+        
+        try:
+            statuses = {}
+            for start in range(0, len(session_ids), 500):
+                chunk = session_ids[start:start + 500]
+                self.cursor.execute(
+                    f"SELECT session_id, status FROM payments WHERE session_id IN ({','.join('?' * len(chunk))})",
+                    chunk
+                )
+                statuses.update(self.cursor.fetchall())
+            return statuses
+        
+        except sqlite3.Error as e:
+            print(f"Database error: {e}")
+            return {}
+        
+        finally:
+            self._close()
+
+    @tracer.traced('db.log_chat')
     def log_chat(self, phone_number: str, message: str, response: str, direction: str = 'incoming') -> int:
         """
         Log chat interactions
@@ -164,19 +307,24 @@ class HealthcareDatabase:
             return log_id
         
         except sqlite3.Error as e:
+            tracer.record_error(e)
             print(f"Database error: {e}")
             return None
         
         finally:
             self._close()
 
-    def get_appointments(self, phone_number: str = None, status: str = None) -> List[Dict[str, Any]]:
+    def get_appointments(self, phone_number: str = None, status: str = None, date: str = None,
+                         limit: int = None, offset: int = 0) -> List[Dict[str, Any]]:
         """
         Retrieve appointments with optional filtering
         
         :param phone_number: Optional phone number to filter
         :param status: Optional status to filter
-        :return: List of appointments
+        :param date: Optional appointment date (YYYY-MM-DD) to filter
+        :param limit: Optional page size; all matching rows when omitted
+        :param offset: Rows to skip when paginating
+        :return: List of appointments ordered by date and time
         """
         self._connect()
         
@@ -192,6 +340,16 @@ class HealthcareDatabase:
                 query += " AND status = ?"
                 params.append(status)
             
+            if date:
+                query += " AND date = ?"
+                params.append(date)
+            
+            query += " ORDER BY date, time, id"
+            
+            if limit is not None:
+                query += " LIMIT ? OFFSET ?"
+                params.extend([limit, offset])
+            
             self.cursor.execute(query, params)
             columns = [column[0] for column in self.cursor.description]
             return [dict(zip(columns, row)) for row in self.cursor.fetchall()]
@@ -203,6 +361,245 @@ class HealthcareDatabase:
         finally:
             self._close()
 
+    @staticmethod
+    def _appointment_filters(phone_number: str = None, status: str = None,
+                             date_from: str = None, date_to: str = None) -> Tuple[str, list]:
+        """
+        Build the WHERE clause shared by the paginated appointment queries
+        """
+        clauses = []
+        params = []
+        
+        if phone_number:
+            clauses.append("phone_number = ?")
+            params.append(phone_number)
+        
+        if status:
+            clauses.append("status = ?")
+            params.append(status)
+        
+        if date_from:
+            clauses.append("date >= ?")
+            params.append(date_from)
+        
+        if date_to:
+            clauses.append("date <= ?")
+            params.append(date_to)
+        
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def get_appointments_page(self, phone_number: str = None, status: str = None, date_from: str = None,
+                              date_to: str = None, cursor: str = None, limit: int = 50) -> Dict[str, Any]:
+        """
+        Retrieve one page of appointments ordered by date, time and id
+        
+        Uses keyset pagination: the cursor encodes the sort key of the last
+        row of the previous page, so every page costs the same regardless of
+        how deep it is.
+        
+        :param phone_number: Optional phone number to filter
+        :param status: Optional status to filter
+        :param date_from: Optional first date (YYYY-MM-DD, inclusive)
+        :param date_to: Optional last date (YYYY-MM-DD, inclusive)
+        :param cursor: next_cursor from the previous page
+        :param limit: Page size
+        :return: Dictionary with 'appointments' and 'next_cursor' (None on the last page)
+        """
+        where, params = self._appointment_filters(phone_number, status, date_from, date_to)
+        
+        if cursor:
+            try:
+                last_date, last_time, last_id = cursor.split('|')
+                last_id = int(last_id)
+            except ValueError:
+                raise ValueError(f"Invalid appointments cursor: {cursor}")
+            where += (" AND " if where else " WHERE ") + "(date, time, id) > (?, ?, ?)"
+            params.extend([last_date, last_time, last_id])
+        
+        self._connect()
+        
+        try:
+            self.cursor.execute(
+                f"SELECT * FROM appointments{where} ORDER BY date, time, id LIMIT ?",
+                params + [limit + 1]
+            )
+            columns = [column[0] for column in self.cursor.description]
+            rows = [dict(zip(columns, row)) for row in self.cursor.fetchall()]
+            
+            next_cursor = None
+            if len(rows) > limit:
+                rows = rows[:limit]
+                last = rows[-1]
+                next_cursor = f"{last['date']}|{last['time']}|{last['id']}"
+            
+            return {'appointments': rows, 'next_cursor': next_cursor}
+        
+        except sqlite3.Error as e:
+            print(f"Database error: {e}")
+            return {'appointments': [], 'next_cursor': None}
+        
+        finally:
+            self._close()
+
+    def iter_appointments(self, phone_number: str = None, status: str = None, date_from: str = None,
+                          date_to: str = None, batch_size: int = 1000) -> Iterator[Dict[str, Any]]:
+        """
+        Stream appointments without loading the whole result into memory
+        
+        Uses its own connection, so other database methods can be called
+        while the generator is being consumed.
+        
+        :param phone_number: Optional phone number to filter
+        :param status: Optional status to filter
+        :param date_from: Optional first date (inclusive)
+        :param date_to: Optional last date (inclusive)
+        :param batch_size: Rows fetched from SQLite per round trip
+        :return: Generator of appointment dicts ordered by date, time and id
+        """
+        where, params = self._appointment_filters(phone_number, status, date_from, date_to)
+        self.initialize()
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        
+        try:
+            cursor = conn.execute(f"SELECT * FROM appointments{where} ORDER BY date, time, id", params)
+            columns = [column[0] for column in cursor.description]
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                for row in rows:
+                    yield dict(zip(columns, row))
+        
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _chat_log_filters(phone_number: str = None, directions: List[str] = None,
+                          date_from: str = None, date_to: str = None) -> Tuple[str, list]:
+        """
+        Build the WHERE clause shared by the chat log queries
+        """
+        clauses = []
+        params = []
+        
+        if phone_number:
+            clauses.append("phone_number = ?")
+            params.append(phone_number)
+        
+        if directions:
+            clauses.append(f"direction IN ({','.join('?' * len(directions))})")
+            params.extend(directions)
+        
+        if date_from:
+            clauses.append("created_at >= ?")
+            params.append(date_from)
+        
+        if date_to:
+            # created_at carries a time, so compare against the start of the next day
+            clauses.append("created_at < date(?, '+1 day')")
+            params.append(date_to)
+        
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def get_chat_logs_page(self, phone_number: str = None, directions: List[str] = None, date_from: str = None,
+                           date_to: str = None, cursor: str = None, limit: int = 100) -> Dict[str, Any]:
+        """
+        Retrieve one page of chat logs, newest first
+        
+        Filtering and keyset pagination (on created_at and id) happen in
+        SQLite, so a page costs the same however many logs are stored.
+        
+        :param phone_number: Optional phone number to filter
+        :param directions: Optional list of directions to include
+        :param date_from: Optional first day (YYYY-MM-DD, inclusive)
+        :param date_to: Optional last day (YYYY-MM-DD, inclusive)
+        :param cursor: next_cursor from the previous page
+        :param limit: Page size
+        :return: Dictionary with 'chat_logs' and 'next_cursor' (None on the last page)
+        """
+        where, params = self._chat_log_filters(phone_number, directions, date_from, date_to)
+        
+        if cursor:
+            try:
+                last_created_at, last_id = cursor.rsplit('|', 1)
+                last_id = int(last_id)
+            except ValueError:
+                raise ValueError(f"Invalid chat logs cursor: {cursor}")
+            where += (" AND " if where else " WHERE ") + "(created_at, id) < (?, ?)"
+            params.extend([last_created_at, last_id])
+        
+        self._connect()
+        
+        try:
+            self.cursor.execute(
+                f"SELECT * FROM chat_logs{where} ORDER BY created_at DESC, id DESC LIMIT ?",
+                params + [limit + 1]
+            )
+            columns = [column[0] for column in self.cursor.description]
+            rows = [dict(zip(columns, row)) for row in self.cursor.fetchall()]
+            
+            next_cursor = None
+            if len(rows) > limit:
+                rows = rows[:limit]
+                last = rows[-1]
+                next_cursor = f"{last['created_at']}|{last['id']}"
+            
+            return {'chat_logs': rows, 'next_cursor': next_cursor}
+        
+        except sqlite3.Error as e:
+            print(f"Database error: {e}")
+            return {'chat_logs': [], 'next_cursor': None}
+        
+        finally:
+            self._close()
+
+    def get_chat_phone_numbers(self, prefix: str = '', limit: int = 50) -> List[str]:
+        """
+        Phone numbers that have chat logs, optionally starting with a prefix
+        
+        :param prefix: Leading characters of the phone number
+        :param limit: Maximum numbers returned
+        :return: Sorted list of phone numbers
+        """
+        self._connect()
+        
+        try:
+            # A range rather than LIKE so the phone number index is used
+            self.cursor.execute(
+                "SELECT DISTINCT phone_number FROM chat_logs WHERE phone_number >= ? AND phone_number < ? "
+                "ORDER BY phone_number LIMIT ?",
+                (prefix, prefix + '\U0010ffff', limit)
+            )
+            return [row[0] for row in self.cursor.fetchall()]
+        
+        except sqlite3.Error as e:
+            print(f"Database error: {e}")
+            return []
+        
+        finally:
+            self._close()
+
+    def get_chat_directions(self) -> List[str]:
+        """
+        Distinct chat log directions
+        
+        :return: Sorted list of directions
+        """
+        self._connect()
+        
+        try:
+            self.cursor.execute(
+                "SELECT DISTINCT direction FROM chat_logs WHERE direction IS NOT NULL ORDER BY direction"
+            )
+            return [row[0] for row in self.cursor.fetchall()]
+        
+        except sqlite3.Error as e:
+            print(f"Database error: {e}")
+            return []
+        
+        finally:
+            self._close()
+
     def update_appointment_status(self, appointment_id: int, status: str) -> bool:
         """
         Update appointment status
@@ -211,24 +608,82 @@ class HealthcareDatabase:
         :param status: New status
         :return: Success status
         """
+        results = self.update_appointment_statuses([(appointment_id, status)])
+        return bool(results) and results[appointment_id] in ('updated', 'unchanged')
+
+    def update_appointment_statuses(self, updates: List[Tuple[int, str]]) -> Dict[int, str]:
+        """
+        Update the status of many appointments in one transaction
+        
+        Change listeners are notified once, after the commit, with every
+        appointment whose status actually changed.
+        
+        :param updates: List of (appointment_id, status) pairs
+        :return: Result per appointment ID: 'updated', 'unchanged' or 'not_found';
+                 None if the transaction was rolled back
+        """
+        wanted = dict(updates)
+        if not wanted:
+            return {}
+        
         self._connect()
         
         try:
-            self.cursor.execute('''
-                UPDATE appointments 
-                SET status = ? 
-                WHERE id = ?
-            ''', (status, appointment_id))
+            # Take the write lock first so the statuses read below can't change before the update
+            self.cursor.execute('BEGIN IMMEDIATE')
+            current = {}
+            ids = list(wanted)
+            for start in range(0, len(ids), 500):
+                chunk = ids[start:start + 500]
+                self.cursor.execute(
+                    f"SELECT id, status FROM appointments WHERE id IN ({','.join('?' * len(chunk))})", chunk
+                )
+                current.update(self.cursor.fetchall())
             
+            changes = [
+                {'id': appointment_id, 'old_status': current[appointment_id], 'status': status}
+                for appointment_id, status in wanted.items()
+                if appointment_id in current and current[appointment_id] != status
+            ]
+            self.cursor.executemany(
+                'UPDATE appointments SET status = ? WHERE id = ?',
+                [(change['status'], change['id']) for change in changes]
+            )
             self.conn.commit()
-            return self.cursor.rowcount > 0
         
         except sqlite3.Error as e:
+            self.conn.rollback()
             print(f"Database error: {e}")
-            return False
+            return None
         
         finally:
             self._close()
+        
+        changed = {change['id'] for change in changes}
+        results = {
+            appointment_id: 'not_found' if appointment_id not in current
+            else 'updated' if appointment_id in changed else 'unchanged'
+            for appointment_id in wanted
+        }
+        if changes:
+            self._notify('appointments', changes)
+        return results
+
+    def add_change_listener(self, callback: Callable[[str, List[Dict[str, Any]]], None]):
+        """
+        Register a callback for committed changes (e.g. to invalidate caches)
+        
+        :param callback: Called as callback(table, changes); changes is a list of dicts
+                         with 'id', 'old_status' and 'status'
+        """
+        self._change_listeners.append(callback)
+
+    def _notify(self, table: str, changes: List[Dict[str, Any]]):
+        for callback in list(self._change_listeners):
+            try:
+                callback(table, changes)
+            except Exception as e:
+                print(f"Change listener error: {e}")
 
 # Create a global database instance
-db = HealthcareDatabase() 
\ No newline at end of file
+db = HealthcareDatabase(os.getenv('HEALTHCARE_DB_PATH', 'healthcare.db'), initialize=False)
\ No newline at end of file
@@ -0,0 +1,97 @@
+import asyncio
+import contextvars
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from dotenv import load_dotenv
+from profiling import bind_worker
+
+# Load environment variables
+load_dotenv()
+
+class ExecutionLayer:
+    """
+    Dedicated pools for work that must not run on the event loop.
+
+    ``run_io`` is for blocking network and database calls (OpenAI, SQLite);
+    ``run_cpu`` is for CPU-bound work such as language detection and fuzzy
+    search. Pools are created on first use.
+    """
+
+    def __init__(self, io_workers: int = None, cpu_workers: int = None, cpu_mode: str = None):
+        """
+        Initialize the execution layer
+
+        :param io_workers: Threads for blocking I/O (env IO_POOL_WORKERS, default 32)
+        :param cpu_workers: Workers for CPU-bound work (env CPU_POOL_WORKERS, default CPU count)
+        :param cpu_mode: 'thread' or 'process' (env CPU_POOL_MODE, default 'thread');
+                         process mode needs picklable, module-level functions
+                         (not bound methods of singletons, which pickle the instance)
+        """
+        self.io_workers = io_workers or int(os.getenv('IO_POOL_WORKERS', '32'))
+        self.cpu_workers = cpu_workers or int(os.getenv('CPU_POOL_WORKERS', str(os.cpu_count() or 2)))
+        self.cpu_mode = cpu_mode or os.getenv('CPU_POOL_MODE', 'thread')
+        self._io_pool = None
+        self._cpu_pool = None
+
+    @property
+    def io_pool(self):
+        if self._io_pool is None:
+            self._io_pool = ThreadPoolExecutor(max_workers=self.io_workers, thread_name_prefix='io')
+        return self._io_pool
+
+    @property
+    def cpu_pool(self):
+        if self._cpu_pool is None:
+            if self.cpu_mode == 'process':
+                # Imports multiprocessing, so only when process mode is used
+                from concurrent.futures import ProcessPoolExecutor
+                self._cpu_pool = ProcessPoolExecutor(max_workers=self.cpu_workers)
+            else:
+                self._cpu_pool = ThreadPoolExecutor(max_workers=self.cpu_workers, thread_name_prefix='cpu')
+        return self._cpu_pool
+
+    async def run_io(self, func, *args, **kwargs):
+        """
+        Run a blocking I/O call in the I/O pool
+
+        :param func: Callable to run
+        :return: The callable's result
+        """
+        loop = asyncio.get_running_loop()
+        # Carry context variables (the current trace span) into the worker thread,
+        # and let the profiler sample it while the call belongs to a profiled request
+        context = contextvars.copy_context()
+        func = bind_worker(func)
+        return await loop.run_in_executor(self.io_pool, partial(context.run, func, *args, **kwargs))
+
+    async def run_cpu(self, func, *args, **kwargs):
+        """
+        Run CPU-bound work in the CPU pool
+
+        :param func: Callable to run
+        :return: The callable's result
+        """
+        loop = asyncio.get_running_loop()
+        if self.cpu_mode == 'process':
+            return await loop.run_in_executor(self.cpu_pool, partial(func, *args, **kwargs))
+        context = contextvars.copy_context()
+        func = bind_worker(func)
+        return await loop.run_in_executor(self.cpu_pool, partial(context.run, func, *args, **kwargs))
+
+    def shutdown(self, wait: bool = True):
+        """
+        Shut down both pools
+
+        :param wait: Wait for running work to finish
+        """
+        for pool in (self._io_pool, self._cpu_pool):
+            if pool is not None:
+                pool.shutdown(wait=wait)
+        self._io_pool = None
+        self._cpu_pool = None
+
+# Create a global execution layer
+executor = ExecutionLayer()
+run_io = executor.run_io
+run_cpu = executor.run_cpu
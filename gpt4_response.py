@@ -1,30 +1,44 @@
 import os
-import openai
+from functools import lru_cache
 from dotenv import load_dotenv
-from langdetect import detect
 from services import service_manager  # Import service manager
+from tracing import tracer
 
 # Load environment variables
 load_dotenv()
 
-# Configure OpenAI API
-openai.api_key = os.getenv('OPENAI_API_KEY')
+@lru_cache(maxsize=1)
+def get_openai():
+    """
+    Import and configure the OpenAI module on first use
+
+    Importing openai takes ~0.3 s, so it is deferred until the first
+    completion (or app startup).
+
+    :return: The configured openai module
+    """
+    import openai
+    openai.api_key = os.getenv('OPENAI_API_KEY')
+    return openai
 
+@tracer.traced('detect_language')
 def detect_language(text):
     """
     Detect the language of the input text
     """
+    from langdetect import detect
     try:
         return detect(text)
     except:
         return 'en'  # Default to English if detection fails
 
+@tracer.traced('translate_response')
 def translate_response(text, target_language='en'):
     """
     Translate response using OpenAI API (simplified)
     """
     try:
-        response = openai.ChatCompletion.create(
+        response = get_openai().ChatCompletion.create(
             model="gpt-4",
             messages=[
                 {"role": "system", "content": f"Translate the following text to {target_language}"},
@@ -33,19 +47,22 @@ def translate_response(text, target_language='en'):
         )
         return response.choices[0].message.content.strip()
     except Exception as e:
+        tracer.record_error(e)
         print(f"Translation error: {e}")
         return text
 
-def generate_gpt4_response(message, context=None):
+@tracer.traced('generate_gpt4_response')
+def generate_gpt4_response(message, context=None, language=None):
     """
     Generate smart response using GPT-4
     
     :param message: User's input message
     :param context: Optional context from previous interactions or services
+    :param language: Input language if already detected by the caller
     :return: AI-generated response
     """
     # Detect input language
-    input_language = detect_language(message)
+    input_language = language or detect_language(message)
     
     try:
         # Prepare context-aware prompt
@@ -66,7 +83,7 @@ def generate_gpt4_response(message, context=None):
         messages.append({"role": "user", "content": message})
         
         # Generate response using GPT-4
-        response = openai.ChatCompletion.create(
+        response = get_openai().ChatCompletion.create(
             model="gpt-4",
             messages=messages,
             max_tokens=150,
@@ -83,5 +100,6 @@ def generate_gpt4_response(message, context=None):
         return response_text
     
     except Exception as e:
+        tracer.record_error(e)
         print(f"GPT-4 Response Error: {e}")
         return "I'm sorry, I couldn't process your request at the moment. Please try again later." 
\ No newline at end of file
@@ -1,17 +1,19 @@
-import pandas as pd
-import os
-from fuzzywuzzy import fuzz, process
-from datetime import datetime, timedelta
-import json
+import re
+from datetime import datetime
+from database import db
+from lazy import LazySingleton
+from slots import slot_inventory
+from tracing import tracer
 
 class HealthPackageChatbot:
     def __init__(self):
         self.excel_path = '/Users/yarkhan/Tech/dubai_health_agent_system/keys/H.xlsx'
-        self.appointments_file = '/Users/yarkhan/Tech/dubai_health_agent_system/appointments.json'
         self.packages_data = self.load_excel_data()
         
     def load_excel_data(self):
         """Load all data from H.xlsx"""
+        # pandas takes ~0.3 s to import; only load it when the chatbot is built
+        import pandas as pd
         try:
             # Read both sheets
             tests_df = pd.read_excel(self.excel_path, sheet_name='CREATE YOUR OWN TESTS')
@@ -31,6 +33,7 @@ class HealthPackageChatbot:
     
     def search_health_items(self, query, threshold=60):
         """Search for health tests and packages based on user query"""
+        from fuzzywuzzy import fuzz, process
         results = {'tests': [], 'packages': []}
         
         # Search in tests
@@ -70,6 +73,7 @@ class HealthPackageChatbot:
     
     def get_all_packages_summary(self):
         """Get a summary of all available packages"""
+        import pandas as pd
         if self.packages_data['packages'].empty:
             return "No packages available at the moment."
         
@@ -86,55 +90,46 @@ class HealthPackageChatbot:
         summary += "\n💬 *Send me a specific test name or package you're interested in for more details!*"
         return summary
     
-    def generate_time_slots(self):
-        """Generate available appointment time slots"""
-        today = datetime.now()
-        slots = []
+    @staticmethod
+    def parse_time_slot(time_slot):
+        """
+        Split a slot label like "Thursday (2025-10-16) - 9:00 AM" into date and time
+
+        :param time_slot: Slot label in SlotInventory.format_slot format (e.g. from appointments.json)
+        :return: Tuple of (YYYY-MM-DD, HH:MM)
+        """
+        match = re.search(r'\((\d{4}-\d{2}-\d{2})\)\s*-\s*(\d{1,2}:\d{2}\s*[AP]M)', time_slot or '', re.IGNORECASE)
+        if not match:
+            raise ValueError(f"Unrecognised time slot: {time_slot}")
+        time_24h = datetime.strptime(match.group(2).upper().replace(' ', ''), "%I:%M%p").strftime("%H:%M")
+        return match.group(1), time_24h
+    
+    def book_held_slot(self, phone_number, hold, package_name):
+        """Convert a slot hold into a confirmed appointment; returns None if the hold is gone"""
+        if not slot_inventory.confirm_hold(hold['id']):
+            return None
         
-        # Generate slots for next 3 days (excluding today)
-        for day in range(1, 4):
-            date = today + timedelta(days=day)
-            day_name = date.strftime("%A")
-            date_str = date.strftime("%Y-%m-%d")
-            
-            # Morning slots
-            slots.append(f"{day_name} ({date_str}) - 9:00 AM")
-            slots.append(f"{day_name} ({date_str}) - 11:00 AM")
-            
-            # Afternoon slots
-            slots.append(f"{day_name} ({date_str}) - 2:00 PM")
-            slots.append(f"{day_name} ({date_str}) - 4:00 PM")
+        appointment_id = db.save_appointment(
+            phone_number=phone_number,
+            service=package_name,
+            date=hold['date'],
+            time=hold['slot_time'],
+            status='Confirmed'
+        )
+        if appointment_id is None:
+            slot_inventory.release(hold['date'], hold['slot_time'])
+            raise RuntimeError("Unable to save appointment")
         
-        return slots[:4]  # Return only 4 slots
-    
-    def save_appointment(self, phone_number, package_name, time_slot):
-        """Save appointment to JSON file"""
-        appointment_data = {
+        return {
+            'id': appointment_id,
             'phone_number': phone_number,
             'package_name': package_name,
-            'time_slot': time_slot,
+            'time_slot': hold['label'],
             'booking_time': datetime.now().isoformat(),
             'status': 'confirmed'
         }
-        
-        # Load existing appointments
-        appointments = []
-        if os.path.exists(self.appointments_file):
-            try:
-                with open(self.appointments_file, 'r') as f:
-                    appointments = json.load(f)
-            except:
-                appointments = []
-        
-        # Add new appointment
-        appointments.append(appointment_data)
-        
-        # Save back to file
-        with open(self.appointments_file, 'w') as f:
-            json.dump(appointments, f, indent=2)
-        
-        return appointment_data
     
+    @tracer.traced('process_message')
     def process_message(self, message, phone_number, conversation_state=None):
         """Process incoming WhatsApp message and return appropriate response"""
         message = message.lower().strip()
@@ -213,7 +208,7 @@ class HealthPackageChatbot:
             selection_num = int(message.strip())
             if 1 <= selection_num <= len(packages):
                 selected_package = packages.iloc[selection_num - 1]
-                time_slots = self.generate_time_slots()
+                time_slots = [hold['label'] for hold in slot_inventory.offer_slots(phone_number, selected_package['Package Name'])]
                 
                 response = f"**Package Selected:** {selected_package['Package Name']}\n"
                 response += f"**Price:** AED {selected_package['Selling Price']}\n\n"
@@ -236,7 +231,7 @@ class HealthPackageChatbot:
         search_results = self.search_health_items(message)
         if search_results['packages']:
             selected_package = search_results['packages'][0]
-            time_slots = self.generate_time_slots()
+            time_slots = [hold['label'] for hold in slot_inventory.offer_slots(phone_number, selected_package['name'])]
             
             response = f"**Package Selected:** {selected_package['name']}\n"
             response += f"**Price:** AED {selected_package['price']}\n\n"
@@ -259,22 +254,35 @@ class HealthPackageChatbot:
         }
     
     def handle_time_selection(self, message, phone_number, selected_package=None):
-        """Handle time slot selection"""
-        time_slots = self.generate_time_slots()
+        """Handle time slot selection by converting the chosen hold into a booking"""
+        holds = slot_inventory.get_holds(phone_number)
+        
+        if not holds:
+            return {
+                'response': "Your reserved time slots have expired. Type 'book' to choose a new time.",
+                'state': 'menu'
+            }
         
         try:
             slot_num = int(message.strip())
-            if 1 <= slot_num <= len(time_slots):
-                selected_slot = time_slots[slot_num - 1]
+            if 1 <= slot_num <= len(holds):
+                hold = holds[slot_num - 1]
+                selected_package = hold['package_name'] or selected_package
                 
                 # Save appointment
-                appointment = self.save_appointment(phone_number, selected_package, selected_slot)
+                appointment = self.book_held_slot(phone_number, hold, selected_package)
+                
+                if appointment is None:
+                    return {
+                        'response': "Sorry, that time slot is no longer reserved for you. Type 'book' to choose a new time.",
+                        'state': 'menu'
+                    }
                 
                 response = "**Appointment Confirmed!**\n\n"
                 response += f"**Phone:** {phone_number}\n"
                 response += f"**Package:** {selected_package}\n"
-                response += f"**Time:** {selected_slot}\n"
-                response += f"**Booking ID:** {appointment['booking_time'][:10]}\n\n"
+                response += f"**Time:** {hold['label']}\n"
+                response += f"**Booking ID:** {appointment['id']}\n\n"
                 response += "Your appointment has been successfully booked!\n"
                 response += "We'll contact you shortly to confirm the details.\n\n"
                 response += "*Type 'menu' for more options or 'book' for another appointment.*"
@@ -312,5 +320,37 @@ class HealthPackageChatbot:
         response += "*Type 'book' to schedule an appointment or ask for more specific information!*"
         return response
 
-# Initialize the chatbot
-health_chatbot = HealthPackageChatbot()
\ No newline at end of file
+    def get_context_for_gpt(self, query):
+        """Get matching tests and packages with prices as context for GPT-4"""
+        results = self.search_health_items(query)
+        items = [
+            f"{item['name']}: AED {item['price']}"
+            for item in results['packages'] + results['tests']
+        ]
+        return '; '.join(items)
+
+# Initialize the chatbot (the Excel file is read on first use)
+health_chatbot = LazySingleton(HealthPackageChatbot)
+
+# Entry points for the worker pools. With CPU_POOL_MODE=process they are pickled
+# by name and each worker process builds its own chatbot on first use, instead of
+# the parent's chatbot and its DataFrames being pickled with every call.
+def process_message(message, phone_number, conversation_state=None):
+    """
+    Process a message with this process's chatbot
+
+    :param message: Incoming message text
+    :param phone_number: Sender's number or website client id
+    :param conversation_state: Current conversation state, if any
+    :return: Dict with 'response' and 'state'
+    """
+    return health_chatbot.process_message(message, phone_number, conversation_state)
+
+def get_context_for_gpt(query):
+    """
+    Get GPT-4 context from this process's chatbot
+
+    :param query: User query
+    :return: Matching tests and packages with prices
+    """
+    return health_chatbot.get_context_for_gpt(query)
@@ -0,0 +1,230 @@
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+from dotenv import load_dotenv
+from lazy import LazySingleton
+from metrics import registry
+
+# Load environment variables
+load_dotenv()
+
+NEW = 'new'
+DUPLICATE = 'duplicate'
+
+webhook_messages_total = registry.counter(
+    'webhook_messages_total', 'Webhook deliveries received', ('channel',)
+)
+webhook_duplicates_total = registry.counter(
+    'webhook_duplicates_total', 'Webhook deliveries dropped as retries of a seen message', ('channel',)
+)
+
+class MemorySeenSet:
+    """
+    Bounded, time-windowed set of message ids kept in process memory.
+
+    Entries are stored in insertion order, which is also expiry order,
+    so expired ids are always at the front.
+    """
+
+    def __init__(self, ttl_seconds: float, max_entries: int):
+        """
+        :param ttl_seconds: How long an id is remembered
+        :param max_entries: Upper bound on remembered ids
+        """
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def claim(self, key: str) -> Tuple[str, Optional[str]]:
+        now = time.monotonic()
+        with self._lock:
+            self._evict(now)
+            entry = self._entries.get(key)
+            if entry is not None:
+                return DUPLICATE, entry[1]
+            self._entries[key] = (now + self.ttl_seconds, None)
+            return NEW, None
+
+    def complete(self, key: str, response: str) -> None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries[key] = (entry[0], response)
+
+    def release(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def _evict(self, now: float) -> None:
+        while self._entries:
+            key, (expires_at, _) = next(iter(self._entries.items()))
+            if expires_at > now and len(self._entries) < self.max_entries:
+                break
+            self._entries.popitem(last=False)
+
+class SQLiteSeenSet:
+    """
+    Time-windowed seen-set stored in SQLite, shared by every worker process
+    that points at the same database file.
+    """
+
+    def __init__(self, db_path: str, ttl_seconds: float, max_entries: int):
+        """
+        :param db_path: SQLite database file
+        :param ttl_seconds: How long an id is remembered
+        :param max_entries: Upper bound on remembered ids
+        """
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._claims = 0
+
+        with self._connect() as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS webhook_dedup (
+                    message_key TEXT PRIMARY KEY,
+                    response TEXT,
+                    created_at REAL NOT NULL
+                )
+            ''')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_webhook_dedup_created ON webhook_dedup(created_at)')
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=10)
+
+    def claim(self, key: str) -> Tuple[str, Optional[str]]:
+        now = time.time()
+        conn = self._connect()
+        try:
+            with conn:
+                # Prune occasionally rather than on every delivery
+                self._claims += 1
+                if self._claims % 100 == 0:
+                    self._prune(conn, now)
+
+                # Expired ids count as new messages again
+                conn.execute(
+                    'DELETE FROM webhook_dedup WHERE message_key = ? AND created_at < ?',
+                    (key, now - self.ttl_seconds)
+                )
+                cursor = conn.execute(
+                    'INSERT OR IGNORE INTO webhook_dedup (message_key, created_at) VALUES (?, ?)',
+                    (key, now)
+                )
+                if cursor.rowcount == 1:
+                    return NEW, None
+
+                row = conn.execute(
+                    'SELECT response FROM webhook_dedup WHERE message_key = ?', (key,)
+                ).fetchone()
+                return DUPLICATE, row[0] if row else None
+        finally:
+            conn.close()
+
+    def complete(self, key: str, response: str) -> None:
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute(
+                    'UPDATE webhook_dedup SET response = ? WHERE message_key = ?', (response, key)
+                )
+        finally:
+            conn.close()
+
+    def release(self, key: str) -> None:
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute('DELETE FROM webhook_dedup WHERE message_key = ?', (key,))
+        finally:
+            conn.close()
+
+    def _prune(self, conn, now: float) -> None:
+        conn.execute('DELETE FROM webhook_dedup WHERE created_at < ?', (now - self.ttl_seconds,))
+        conn.execute('''
+            DELETE FROM webhook_dedup WHERE message_key IN (
+                SELECT message_key FROM webhook_dedup
+                ORDER BY created_at DESC LIMIT -1 OFFSET ?
+            )
+        ''', (self.max_entries,))
+
+class WebhookDeduplicator:
+    """
+    Idempotency layer for Twilio/Meta webhook retries.
+
+    The first delivery of a message id claims it and later stores the
+    response it produced; retries of the same id get that cached response
+    back instead of re-running the chatbot, GPT-4 and database writes.
+    """
+
+    def __init__(self, backend=None):
+        """
+        Initialize the deduplicator
+
+        :param backend: MemorySeenSet or SQLiteSeenSet; built from the environment when omitted
+        """
+        if backend is None:
+            ttl_seconds = float(os.getenv('WEBHOOK_DEDUP_TTL_SECONDS', '3600'))
+            max_entries = int(os.getenv('WEBHOOK_DEDUP_MAX_ENTRIES', '50000'))
+            if os.getenv('WEBHOOK_DEDUP_BACKEND', 'memory') == 'sqlite':
+                db_path = os.path.join(os.path.dirname(__file__), os.getenv('HEALTHCARE_DB_PATH', 'healthcare.db'))
+                backend = SQLiteSeenSet(db_path, ttl_seconds, max_entries)
+            else:
+                backend = MemorySeenSet(ttl_seconds, max_entries)
+        self.backend = backend
+
+    def claim(self, channel: str, message_id: str) -> Tuple[str, Optional[str]]:
+        """
+        Register a delivery
+
+        :param channel: Channel name (e.g. 'whatsapp', 'instagram')
+        :param message_id: Twilio MessageSid or Meta mid
+        :return: (NEW, None) for a first delivery, (DUPLICATE, cached response) for a retry;
+                 the cached response is None while the first delivery is still in flight
+        """
+        webhook_messages_total.inc(channel=channel)
+        status, response = self.backend.claim(f"{channel}:{message_id}")
+        if status == DUPLICATE:
+            webhook_duplicates_total.inc(channel=channel)
+        return status, response
+
+    def complete(self, channel: str, message_id: str, response: str) -> None:
+        """
+        Store the response produced for a claimed message
+
+        :param channel: Channel name
+        :param message_id: Message identifier
+        :param response: Response to replay for retries
+        """
+        self.backend.complete(f"{channel}:{message_id}", response)
+
+    def release(self, channel: str, message_id: str) -> None:
+        """
+        Forget a claimed message whose processing failed, so a retry is processed again
+
+        :param channel: Channel name
+        :param message_id: Message identifier
+        """
+        self.backend.release(f"{channel}:{message_id}")
+
+    def stats(self, channel: str) -> dict:
+        """
+        Delivery and duplicate counts for a channel
+
+        :param channel: Channel name
+        :return: Dictionary with totals and duplicate rate
+        """
+        total = webhook_messages_total.value(channel=channel)
+        duplicates = webhook_duplicates_total.value(channel=channel)
+        return {
+            'messages': total,
+            'duplicates': duplicates,
+            'duplicate_rate': duplicates / total if total else 0.0
+        }
+
+# Create a global deduplicator instance (the SQLite backend's table is created on first use)
+webhook_dedup = LazySingleton(WebhookDeduplicator)
@@ -1,8 +1,11 @@
 import os
-import requests
 from dotenv import load_dotenv
 from gpt4_response import generate_gpt4_response
 from database import db
+from idempotency import webhook_dedup, DUPLICATE
+from health_package_chatbot import health_chatbot
+from rate_limit import sender_limiter, llm_limiter, RATE_LIMITED_MESSAGE
+from tracing import tracer
 
 # Load environment variables
 load_dotenv()
@@ -11,7 +14,8 @@ class InstagramMessageHandler:
     def __init__(self):
         self.access_token = os.getenv('META_ACCESS_TOKEN')
         self.page_id = os.getenv('INSTAGRAM_PAGE_ID')
-        self.graph_url = 'https://graph.facebook.com/v17.0'
+        # META_GRAPH_URL points at a local Graph API stub for testing
+        self.graph_url = os.getenv('META_GRAPH_URL', 'https://graph.facebook.com/v17.0')
 
     def send_message(self, recipient_id, message):
         """
@@ -21,6 +25,7 @@ class InstagramMessageHandler:
         :param message: Message to send
         :return: Response from Meta API
         """
+        import requests
         try:
             url = f"{self.graph_url}/{self.page_id}/messages"
             payload = {
@@ -54,14 +59,34 @@ class InstagramMessageHandler:
         :param payload: Incoming message payload
         :return: Generated response
         """
+        with tracer.trace('instagram', 'instagram_handler'):
+            return self._handle_incoming_message(payload)
+
+    def _handle_incoming_message(self, payload):
+        message_id = None
         try:
             # Extract message details
             messaging = payload.get('entry', [{}])[0].get('messaging', [{}])[0]
             sender_id = messaging.get('sender', {}).get('id')
             message_text = messaging.get('message', {}).get('text', '')
+            message_id = messaging.get('message', {}).get('mid')
+            
+            # Meta redelivers unacknowledged events with the same mid
+            if message_id:
+                status, cached_response = webhook_dedup.claim('instagram', message_id)
+                if status == DUPLICATE:
+                    return cached_response
             
-            # Generate AI response
-            response_text = generate_gpt4_response(message_text)
+            # Per-sender rate limit
+            if not sender_limiter.allow(sender_id, channel='instagram'):
+                response_text = RATE_LIMITED_MESSAGE
+            else:
+                # Generate AI response, or the structured answer when GPT-4 capacity is saturated
+                with llm_limiter.slot('instagram') as llm_available:
+                    if llm_available:
+                        response_text = generate_gpt4_response(message_text)
+                    else:
+                        response_text = health_chatbot.process_message(message_text, sender_id)['response']
             
             # Send response
             self.send_message(sender_id, response_text)
@@ -74,10 +99,17 @@ class InstagramMessageHandler:
                 direction='incoming'
             )
             
+            if message_id:
+                webhook_dedup.complete('instagram', message_id, response_text)
+            
             return response_text
         
         except Exception as e:
+            tracer.record_error(e)
             print(f"Instagram Message Handling Error: {e}")
+            # Let Meta's redelivery retry the message instead of replaying nothing
+            if message_id:
+                webhook_dedup.release('instagram', message_id)
             return None
 
     def verify_webhook(self, hub_mode, hub_challenge, hub_verify_token):
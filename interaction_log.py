@@ -0,0 +1,337 @@
+import atexit
+import glob
+import gzip
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import shutil
+import threading
+import time
+from typing import Any, Dict, List, Tuple
+from dotenv import load_dotenv
+from metrics import registry
+
+# Load environment variables
+load_dotenv()
+
+interaction_log_records = registry.counter(
+    'interaction_log_records_total', 'Interaction log records by outcome', ('result',)
+)
+
+class JsonlFileHandler(logging.Handler):
+    """
+    Writes interaction records as compact JSON lines through a large write buffer.
+
+    The file is rotated when it reaches ``max_bytes`` or is older than
+    ``rotate_seconds``; rotated files are renamed with their start time
+    (``interactions-20250101-120000.jsonl``), optionally gzip-compressed,
+    and only the newest ``backup_count`` are kept. Meant to run on the
+    queue listener thread, so none of this happens on a request.
+    """
+
+    def __init__(self, path: str, max_bytes: int, rotate_seconds: float, backup_count: int,
+                 compress: bool = True, buffer_bytes: int = 1 << 16):
+        """
+        Initialize the handler
+
+        :param path: Active log file
+        :param max_bytes: Rotate when the file reaches this size (0 to disable)
+        :param rotate_seconds: Rotate when the file is this old (0 to disable)
+        :param backup_count: Rotated files to keep
+        :param compress: Gzip rotated files
+        :param buffer_bytes: Write buffer size
+        """
+        super().__init__()
+        self.path = path
+        self.max_bytes = max_bytes
+        self.rotate_seconds = rotate_seconds
+        self.backup_count = backup_count
+        self.compress = compress
+        self.buffer_bytes = buffer_bytes
+        self.stream = None
+        self._size = 0
+        self._opened_at = 0.0
+
+    def _open(self):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        self.stream = open(self.path, 'a', encoding='utf-8', buffering=self.buffer_bytes)
+        self._size = self.stream.tell()
+        # A file left by a previous run keeps its age
+        self._opened_at = os.path.getmtime(self.path) if self._size else time.time()
+
+    def emit(self, record: logging.LogRecord):
+        try:
+            if self.stream is None:
+                self._open()
+
+            line = json.dumps(record.interaction, ensure_ascii=False, separators=(',', ':'), default=str) + '\n'
+            if self._should_rotate(len(line)):
+                self.rotate()
+                self._open()
+
+            self.stream.write(line)
+            self._size += len(line.encode('utf-8'))
+            interaction_log_records.inc(result='written')
+        except Exception:
+            self.handleError(record)
+
+    def _should_rotate(self, incoming: int) -> bool:
+        if not self._size:
+            return False
+        if self.max_bytes and self._size + incoming > self.max_bytes:
+            return True
+        return bool(self.rotate_seconds) and time.time() - self._opened_at >= self.rotate_seconds
+
+    def rotate(self):
+        """
+        Close the active file and move it aside (compressed if enabled)
+        """
+        if self.stream:
+            self.stream.close()
+            self.stream = None
+        if not os.path.exists(self.path) or not os.path.getsize(self.path):
+            return
+
+        base, extension = os.path.splitext(self.path)
+        rotated = f"{base}-{time.strftime('%Y%m%d-%H%M%S', time.localtime(self._opened_at))}{extension}"
+        suffix = 1
+        while os.path.exists(rotated) or os.path.exists(rotated + '.gz'):
+            rotated = f"{base}-{time.strftime('%Y%m%d-%H%M%S', time.localtime(self._opened_at))}-{suffix}{extension}"
+            suffix += 1
+        os.replace(self.path, rotated)
+
+        if self.compress:
+            with open(rotated, 'rb') as source, gzip.open(rotated + '.gz', 'wb', compresslevel=6) as target:
+                shutil.copyfileobj(source, target, 1 << 20)
+            os.remove(rotated)
+
+        for old in rotated_files(self.path)[:-self.backup_count or None]:
+            os.remove(old)
+
+    def flush(self):
+        if self.stream:
+            self.stream.flush()
+
+    def close(self):
+        try:
+            if self.stream:
+                self.stream.close()
+                self.stream = None
+        finally:
+            super().close()
+
+class _DroppingQueueHandler(logging.handlers.QueueHandler):
+    """
+    Queue handler that never blocks the caller: a full queue drops the record
+    """
+
+    def prepare(self, record):
+        # Records carry a ready-made dict; skip QueueHandler's message formatting
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            interaction_log_records.inc(result='dropped')
+
+class _FlushingQueueListener(logging.handlers.QueueListener):
+    """
+    Queue listener that flushes its handlers whenever the queue has been idle
+    for ``flush_interval`` seconds, so buffered lines reach disk promptly
+    """
+
+    def __init__(self, log_queue, *handlers, flush_interval: float = 1.0):
+        super().__init__(log_queue, *handlers)
+        self.flush_interval = flush_interval
+
+    def dequeue(self, block):
+        while True:
+            try:
+                return self.queue.get(block, self.flush_interval)
+            except queue.Empty:
+                for handler in self.handlers:
+                    handler.flush()
+
+class InteractionLog:
+    """
+    Structured, buffered log of user interactions (``logs/interactions.jsonl``).
+
+    ``log()`` builds a record and puts it on a bounded in-memory queue;
+    a listener thread writes it as one JSON line through a buffered file
+    that is flushed when the queue goes idle, rotated by size and age and
+    gzip-compressed. Callers never touch the file system, and if the
+    writer falls behind records are dropped (and counted) rather than
+    slowing requests down. ``tail()`` lets dashboards follow the active
+    file incrementally.
+    """
+
+    def __init__(self, directory: str = None, max_bytes: int = None, rotate_seconds: float = None,
+                 backup_count: int = None, compress: bool = None, queue_size: int = None,
+                 flush_interval: float = None):
+        """
+        Initialize the interaction log
+
+        :param directory: Log directory (env INTERACTION_LOG_DIR, default "logs")
+        :param max_bytes: Rotate at this file size (env INTERACTION_LOG_MAX_BYTES, default 64 MB)
+        :param rotate_seconds: Rotate at this file age (env INTERACTION_LOG_ROTATE_SECONDS, default 86400)
+        :param backup_count: Rotated files kept (env INTERACTION_LOG_BACKUPS, default 30)
+        :param compress: Gzip rotated files (env INTERACTION_LOG_COMPRESS, default true)
+        :param queue_size: Records buffered in memory before dropping (env INTERACTION_LOG_QUEUE_SIZE, default 100000)
+        :param flush_interval: Idle seconds before buffered lines are flushed (env INTERACTION_LOG_FLUSH_SECONDS, default 1)
+        """
+        directory = directory or os.getenv('INTERACTION_LOG_DIR', 'logs')
+        self.path = os.path.join(directory, 'interactions.jsonl')
+        self.max_bytes = int(os.getenv('INTERACTION_LOG_MAX_BYTES', str(64 << 20))) if max_bytes is None else max_bytes
+        self.rotate_seconds = (float(os.getenv('INTERACTION_LOG_ROTATE_SECONDS', '86400'))
+                               if rotate_seconds is None else rotate_seconds)
+        self.backup_count = int(os.getenv('INTERACTION_LOG_BACKUPS', '30')) if backup_count is None else backup_count
+        self.compress = (os.getenv('INTERACTION_LOG_COMPRESS', 'true').lower() == 'true'
+                         if compress is None else compress)
+        self.queue_size = queue_size or int(os.getenv('INTERACTION_LOG_QUEUE_SIZE', '100000'))
+        self.flush_interval = flush_interval or float(os.getenv('INTERACTION_LOG_FLUSH_SECONDS', '1'))
+
+        self._queue_handler = None
+        self._listener = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        """
+        Start the writer thread (called on first use)
+        """
+        with self._lock:
+            if self._listener:
+                return
+            log_queue = queue.Queue(self.queue_size)
+            self.file_handler = JsonlFileHandler(
+                self.path, self.max_bytes, self.rotate_seconds, self.backup_count, self.compress
+            )
+            self._listener = _FlushingQueueListener(log_queue, self.file_handler, flush_interval=self.flush_interval)
+            self._listener.start()
+            self._queue_handler = _DroppingQueueHandler(log_queue)
+            # The listener thread is a daemon; write out what is queued at exit
+            atexit.register(self.stop)
+
+    def stop(self):
+        """
+        Write everything queued, flush and close the file
+        """
+        with self._lock:
+            if not self._listener:
+                return
+            self._queue_handler = None
+            self._listener.stop()
+            self._listener = None
+            self.file_handler.close()
+
+    def log(self, phone_number: str, message_type: str, content: Any, **fields):
+        """
+        Record an interaction
+
+        :param phone_number: User's phone number
+        :param message_type: Type of interaction (e.g. 'incoming', 'outgoing')
+        :param content: Message content
+        :param fields: Extra JSON-serializable fields (channel, conversation id, ...)
+        """
+        handler = self._queue_handler or self._start_handler()
+        # Handed straight to the queue handler: no logger lookup, caller frame walk or formatting
+        record = logging.LogRecord('interactions', logging.INFO, '', 0, message_type, None, None)
+        record.interaction = {
+            'ts': round(record.created, 3),
+            'phone_number': phone_number,
+            'type': message_type,
+            'content': content,
+            **fields
+        }
+        handler.handle(record)
+
+    def _start_handler(self):
+        self.start()
+        return self._queue_handler
+
+    def tail(self, offset: int = 0, limit: int = 1000) -> Tuple[List[Dict[str, Any]], int]:
+        """
+        Read records appended to the active file since ``offset``
+
+        Only complete lines are returned. If the file was rotated (it is
+        now shorter than ``offset``, or ``offset`` is not at a line start),
+        reading restarts at the beginning of the new file.
+
+        :param offset: Offset returned by the previous call (0 to start)
+        :param limit: Maximum records returned
+        :return: Tuple of (records, offset for the next call)
+        """
+        try:
+            size = os.path.getsize(self.path)
+        except OSError:
+            return [], 0
+        if size < offset:
+            offset = 0
+
+        records = []
+        with open(self.path, 'rb') as log_file:
+            if offset:
+                # A new file that has grown past the old offset rarely has a line break there
+                log_file.seek(offset - 1)
+                if log_file.read(1) != b'\n':
+                    offset = 0
+            log_file.seek(offset)
+            while len(records) < limit:
+                line = log_file.readline()
+                if not line.endswith(b'\n'):
+                    break
+                offset += len(line)
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    continue
+        return records, offset
+
+    def recent(self, limit: int = 100) -> Tuple[List[Dict[str, Any]], int]:
+        """
+        Last records of the active file, reading only the end of the file
+
+        :param limit: Maximum records returned
+        :return: Tuple of (records, newest last; offset to pass to tail() for what follows)
+        """
+        try:
+            size = os.path.getsize(self.path)
+        except OSError:
+            return [], 0
+
+        with open(self.path, 'rb') as log_file:
+            data = b''
+            position = size
+            while position and data.count(b'\n') <= limit:
+                position = max(0, position - (1 << 16))
+                log_file.seek(position)
+                data = log_file.read(size - position)
+
+        # Drop a partial first line (mid-file) and a partial last line (still being written)
+        lines = data.split(b'\n')
+        offset = size - len(lines[-1])
+        lines = lines[1 if position else 0:-1]
+
+        records = []
+        for line in lines[-limit:]:
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                continue
+        return records, offset
+
+def rotated_files(path: str) -> List[str]:
+    """
+    Rotated files of a log, oldest first
+
+    :param path: Active log file
+    :return: Paths of rotated files (compressed or not)
+    """
+    base, extension = os.path.splitext(path)
+    return sorted(glob.glob(f"{base}-*{extension}") + glob.glob(f"{base}-*{extension}.gz"),
+                  key=os.path.getmtime)
+
+# Create a global interaction log instance
+interaction_log = InteractionLog()
@@ -0,0 +1,62 @@
+import threading
+
+class LazySingleton:
+    """
+    Module-level singleton that is built on first use.
+
+    Stands in for the instance: attribute reads and writes go to the
+    instance, which is created by ``factory`` the first time one happens.
+    Modules can keep ``from health_package_chatbot import health_chatbot``
+    while importing them stays cheap.
+    """
+
+    __slots__ = ('_lazy_factory', '_lazy_instance', '_lazy_lock')
+
+    def __init__(self, factory):
+        """
+        :param factory: Callable returning the instance (usually the class)
+        """
+        object.__setattr__(self, '_lazy_factory', factory)
+        object.__setattr__(self, '_lazy_instance', None)
+        object.__setattr__(self, '_lazy_lock', threading.Lock())
+
+    def __getattr__(self, name):
+        return getattr(resolve(self), name)
+
+    def __setattr__(self, name, value):
+        setattr(resolve(self), name, value)
+
+    def __delattr__(self, name):
+        delattr(resolve(self), name)
+
+    def __repr__(self):
+        if self._lazy_instance is None:
+            return f"<LazySingleton {getattr(self._lazy_factory, '__name__', self._lazy_factory)} (not built)>"
+        return repr(self._lazy_instance)
+
+def resolve(singleton):
+    """
+    Build a lazy singleton now (e.g. at app startup) and return the instance
+
+    :param singleton: LazySingleton, or an ordinary object (returned as is)
+    :return: The instance
+    """
+    if not isinstance(singleton, LazySingleton):
+        return singleton
+    instance = singleton._lazy_instance
+    if instance is None:
+        with singleton._lazy_lock:
+            instance = singleton._lazy_instance
+            if instance is None:
+                instance = singleton._lazy_factory()
+                object.__setattr__(singleton, '_lazy_instance', instance)
+    return instance
+
+def is_loaded(singleton) -> bool:
+    """
+    Whether a lazy singleton has been built (ordinary objects always have)
+
+    :param singleton: LazySingleton or any object
+    :return: True once the instance exists
+    """
+    return not isinstance(singleton, LazySingleton) or singleton._lazy_instance is not None
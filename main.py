@@ -1,24 +1,92 @@
 import os
+from contextlib import asynccontextmanager
+from datetime import datetime
 from fastapi import FastAPI, Request, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
 from twilio.twiml.messaging_response import MessagingResponse
-from gpt4_response import generate_gpt4_response
-from health_package_chatbot import health_chatbot  # Import our enhanced chatbot
+from gpt4_response import generate_gpt4_response, detect_language, get_openai
+from health_package_chatbot import health_chatbot, process_message, get_context_for_gpt  # Import our enhanced chatbot
 from booking import save_appointment
-from payments import create_payment_link
-from utils import validate_twilio_request
+from payments import (create_payment_link, handle_stripe_webhook, price_catalog, get_stripe,
+                      payment_status_batcher, payment_reconciler)
+from utils import validate_twilio_request, log_interaction
+from interaction_log import interaction_log
+from middleware import TwilioSignatureMiddleware
 from database import db
 from instagram_handler import instagram_handler
-from fastapi.responses import Response
-import json
-import pandas as pd
+from fastapi.responses import Response, PlainTextResponse
+from idempotency import webhook_dedup, DUPLICATE
+from metrics import registry
+from tracing import tracer
+from profiling import ProfilingMiddleware, sampling_profiler
+from rate_limit import sender_limiter, llm_limiter, RATE_LIMITED_MESSAGE
+from executor import executor, run_io, run_cpu
+from reminders import reminder_scheduler
+from lazy import resolve, is_loaded
+import hmac
 
 # Load environment variables
 load_dotenv()
 
+def warm_up():
+    """
+    Do the slow first-use work before serving instead of in the first
+    request: set up the database, read the catalog Excel file (importing
+    pandas), import openai and stripe and load the language profiles.
+    Skipped with STARTUP_WARM_UP=false.
+    """
+    db.initialize()
+    resolve(health_chatbot)
+    get_openai()
+    get_stripe()
+    detect_language('warm up')
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Startup and shutdown: importing this module only defines the app
+    """
+    if os.getenv('STARTUP_WARM_UP', 'true').lower() == 'true':
+        await run_io(warm_up)
+    
+    # Look up or create the catalog's Stripe Prices in the background
+    if os.getenv('STRIPE_SECRET_KEY'):
+        executor.io_pool.submit(price_catalog.load)
+        # Catch up on missed Stripe webhooks every PAYMENT_RECONCILE_SECONDS (default 3600)
+        payment_reconciler.start()
+    
+    # Start the appointment reminder scheduler (REMINDERS_ENABLED, default true)
+    if os.getenv('REMINDERS_ENABLED', 'true').lower() == 'true':
+        reminder_scheduler.start()
+    
+    # Toggle the sampling profiler with PROFILING_SIGNAL (default SIGUSR2)
+    sampling_profiler.install_signal_handler()
+    
+    yield
+    
+    if is_loaded(reminder_scheduler):
+        reminder_scheduler.stop()
+    payment_reconciler.stop()
+    # Webhook status changes already acknowledged to Stripe must reach the database
+    payment_status_batcher.stop()
+    interaction_log.stop()
+
 # Initialize FastAPI app
-app = FastAPI(title="WhatsApp Healthcare Assistant")
+app = FastAPI(title="WhatsApp Healthcare Assistant", lifespan=lifespan)
+
+# Shared secret for staff-only endpoints (sent as the X-Admin-Key header)
+ADMIN_API_KEY = os.getenv('ADMIN_API_KEY')
+
+APPOINTMENT_STATUSES = ('Pending', 'Confirmed', 'Cancelled', 'Completed')
+
+def require_admin(request: Request):
+    """
+    Reject the request unless it carries the admin API key
+    """
+    key = request.headers.get('X-Admin-Key', '')
+    if not ADMIN_API_KEY or not hmac.compare_digest(key, ADMIN_API_KEY):
+        raise HTTPException(status_code=403, detail="Forbidden")
 
 # In-memory conversation state storage (use Redis for production)
 conversation_states = {}
@@ -32,77 +100,116 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Reject unsigned or spoofed Twilio webhooks before any form parsing
+app.add_middleware(TwilioSignatureMiddleware, paths=('/webhook/whatsapp',))
+
+# Outermost, so a profiled request's samples cover the other middleware too
+app.add_middleware(ProfilingMiddleware)
+
 @app.post("/webhook/whatsapp")
 async def handle_whatsapp_message(request: Request):
     """
     Enhanced webhook endpoint with GPT-4 + Excel integration
     """
+    with tracer.trace('whatsapp', '/webhook/whatsapp'):
+        return await _handle_whatsapp_message(request)
+
+async def _handle_whatsapp_message(request: Request):
     # Parse incoming form data
     form_data = await request.form()
     from_number = form_data.get('From', '')
     message_body = form_data.get('Body', '').strip()
+    message_sid = form_data.get('MessageSid', '')
+
+    # Twilio retries slow webhooks with the same MessageSid; replay the first answer
+    if message_sid:
+        status, cached_response = webhook_dedup.claim('whatsapp', message_sid)
+        if status == DUPLICATE:
+            return Response(
+                content=cached_response or str(MessagingResponse()),
+                media_type="application/xml"
+            )
 
     # Initialize Twilio response
     response = MessagingResponse()
 
+    # Drop floods from a single number before any chatbot or GPT-4 work
+    if not sender_limiter.allow(from_number, channel='whatsapp'):
+        response.message(RATE_LIMITED_MESSAGE)
+        if message_sid:
+            webhook_dedup.complete('whatsapp', message_sid, str(response))
+        return Response(content=str(response), media_type="application/xml")
+
     try:
         # Get current conversation state
         current_state = conversation_states.get(from_number, {})
         
         # First, try health package chatbot for structured responses
-        chatbot_response = health_chatbot.process_message(
+        chatbot_response = await run_cpu(
+            process_message,
             message_body, 
             from_number, 
             current_state.get('state')
         )
         
         # If it's a general query (not booking flow), enhance with GPT-4
+        response_message = chatbot_response['response']
         if chatbot_response['state'] in ['menu', 'search_results']:
-            # Get Excel context for GPT-4
-            excel_context = health_chatbot.get_context_for_gpt(message_body)
-            
-            # Generate enhanced response with GPT-4
-            gpt_response = generate_gpt4_response(
-                message_body, 
-                context=excel_context,
-                conversation_history=current_state.get('history', [])
-            )
-            
-            # Combine structured data with AI response
-            if excel_context:
-                response_message = f"{chatbot_response['response']}\n\n🤖 **AI Assistant:**\n{gpt_response}"
-            else:
-                response_message = gpt_response
-        else:
-            # Use structured response for booking flow
-            response_message = chatbot_response['response']
+            # When GPT-4 capacity is saturated, answer from the structured chatbot instead of queueing
+            with llm_limiter.slot('whatsapp') as llm_available:
+                if llm_available:
+                    # Get Excel context for GPT-4
+                    with tracer.span('get_context_for_gpt'):
+                        excel_context = await run_cpu(get_context_for_gpt, message_body)
+                    
+                    # Generate enhanced response with GPT-4 off the event loop, so the slot
+                    # count reflects concurrent webhooks and saturation can shed
+                    gpt_response = await run_io(
+                        generate_gpt4_response,
+                        message_body, 
+                        context=excel_context
+                    )
+                    
+                    # Combine structured data with AI response
+                    if excel_context:
+                        response_message = f"{chatbot_response['response']}\n\n🤖 **AI Assistant:**\n{gpt_response}"
+                    else:
+                        response_message = gpt_response
         
         # Update conversation state
         conversation_states[from_number] = {
             'state': chatbot_response['state'],
             'selected_package': chatbot_response.get('selected_package'),
-            'last_message_time': str(pd.Timestamp.now()),
+            'last_message_time': str(datetime.now()),
             'history': current_state.get('history', []) + [
                 {'user': message_body, 'bot': response_message}
             ]
         }
 
         # Log the chat interaction
-        db.log_chat(
+        await run_io(
+            db.log_chat,
             phone_number=from_number, 
             message=message_body, 
             response=response_message
         )
+        log_interaction(from_number, 'incoming', message_body, channel='whatsapp', message_sid=message_sid)
+        log_interaction(from_number, 'outgoing', response_message, channel='whatsapp', state=chatbot_response['state'])
 
         # Add message to response
         response.message(response_message)
 
     except Exception as e:
+        tracer.record_error(e)
         # Fallback to GPT-4 on error
         try:
-            error_response = generate_gpt4_response(
-                f"Error processing: {message_body}. Please help the user with healthcare queries."
-            )
+            with llm_limiter.slot('whatsapp') as llm_available:
+                if not llm_available:
+                    raise RuntimeError("LLM capacity saturated")
+                error_response = await run_io(
+                    generate_gpt4_response,
+                    f"Error processing: {message_body}. Please help the user with healthcare queries."
+                )
             response.message(error_response)
         except:
             response.message("Sorry, something went wrong. Please try again later.")
@@ -110,12 +217,88 @@ async def handle_whatsapp_message(request: Request):
         print(f"Error: {e}")
 
     print(f"Response XML: {str(response)}")
+    if message_sid:
+        webhook_dedup.complete('whatsapp', message_sid, str(response))
     return Response(content=str(response), media_type="application/xml")
 
+@app.post("/webhook/stripe")
+async def handle_stripe_event(request: Request):
+    """
+    Stripe webhook endpoint: verifies the signature and queues the payment status update
+    """
+    payload = await request.body()
+    signature = request.headers.get('Stripe-Signature', '')
+    stripe = get_stripe()
+    
+    try:
+        event = handle_stripe_webhook(payload, signature)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid payload")
+    except stripe.error.SignatureVerificationError:
+        raise HTTPException(status_code=400, detail="Invalid signature")
+    
+    return {"received": True, "type": event['type']}
+
 @app.get("/")
 async def root():
     return {"message": "WhatsApp Healthcare Assistant API is running!"}
 
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics"""
+    return PlainTextResponse(registry.render())
+
+@app.get("/admin/profiling")
+async def profiling_status(request: Request):
+    """Sampling profiler settings and samples collected per route (staff only)"""
+    require_admin(request)
+    return sampling_profiler.status()
+
+@app.post("/admin/profiling")
+async def configure_profiling(request: Request):
+    """
+    Turn the sampling profiler on or off (staff only).
+    Body: {"enabled": true, "sample_rate": 0.1, "duration_seconds": 300, "reset": false};
+    turning it off writes the profiles to PROFILING_DIR.
+    """
+    require_admin(request)
+    body = await request.json()
+    sample_rate = body.get('sample_rate')
+    duration = body.get('duration_seconds')
+    
+    if sample_rate is not None and not (isinstance(sample_rate, (int, float)) and 0 <= sample_rate <= 1):
+        raise HTTPException(status_code=400, detail="sample_rate must be between 0 and 1")
+    if duration is not None and not (isinstance(duration, (int, float)) and duration > 0):
+        raise HTTPException(status_code=400, detail="duration_seconds must be positive")
+    
+    if body.get('reset'):
+        sampling_profiler.reset()
+    written = []
+    if body.get('enabled', True):
+        sampling_profiler.enable(sample_rate=sample_rate, duration=duration)
+    else:
+        written = sampling_profiler.disable(dump=True)
+    return {**sampling_profiler.status(), "written": written}
+
+@app.get("/admin/profiling/flamegraph")
+async def profiling_flamegraph(request: Request, route: str = None):
+    """
+    Collapsed stacks for flamegraph.pl, inferno or speedscope (staff only).
+    Pass route (e.g. /webhook/whatsapp) for a single route.
+    """
+    require_admin(request)
+    return PlainTextResponse(sampling_profiler.collapsed(route))
+
+@app.get("/stats/webhooks")
+async def webhook_stats():
+    """Webhook delivery and duplicate-retry rates per channel"""
+    return {channel: webhook_dedup.stats(channel) for channel in ['whatsapp', 'instagram']}
+
+@app.get("/stats/reminders")
+async def reminder_stats():
+    """Appointment reminder counts by status"""
+    return reminder_scheduler.stats()
+
 @app.get("/test-chatbot")
 async def test_chatbot():
     """Test endpoint for the health chatbot"""
@@ -134,14 +317,51 @@ async def test_chatbot():
     return results
 
 @app.get("/appointments")
-async def get_appointments():
-    """Get all appointments"""
+async def get_appointments(phone_number: str = None, status: str = None, date: str = None,
+                           date_from: str = None, date_to: str = None, cursor: str = None, limit: int = 50):
+    """
+    Get appointments one page at a time, optionally filtered by phone number, status and date range.
+    Pass the returned next_cursor to fetch the following page.
+    """
+    if date:
+        date_from = date_to = date
     try:
-        with open('/Users/yarkhan/Tech/dubai_health_agent_system/appointments.json', 'r') as f:
-            appointments = json.load(f)
-        return {"appointments": appointments}
-    except:
-        return {"appointments": []}
+        return db.get_appointments_page(
+            phone_number=phone_number,
+            status=status,
+            date_from=date_from,
+            date_to=date_to,
+            cursor=cursor,
+            limit=max(1, min(limit, 500))
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.post("/appointments/status")
+async def update_appointment_statuses(request: Request):
+    """
+    Set the status of many appointments in one transaction (staff only).
+    Body: {"ids": [1, 2, 3], "status": "Confirmed"}; returns the result per id.
+    """
+    require_admin(request)
+    body = await request.json()
+    ids = body.get('ids') or []
+    status = body.get('status')
+    
+    if status not in APPOINTMENT_STATUSES:
+        raise HTTPException(status_code=400, detail=f"status must be one of {', '.join(APPOINTMENT_STATUSES)}")
+    # type() rather than isinstance(): JSON true/false decode to bool, a subclass of int
+    if not isinstance(ids, list) or len(ids) > 10000 or not all(type(i) is int for i in ids):
+        raise HTTPException(status_code=400, detail="ids must be a list of at most 10000 integers")
+    
+    results = await run_io(db.update_appointment_statuses, [(appointment_id, status) for appointment_id in ids])
+    if results is None:
+        raise HTTPException(status_code=500, detail="Unable to update appointments")
+    
+    return {
+        "results": results,
+        "updated": sum(1 for result in results.values() if result == 'updated')
+    }
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,210 @@
+import threading
+from bisect import bisect_left
+from typing import Dict, List, Sequence, Tuple
+
+class Counter:
+    """
+    Monotonic counter with optional labels, rendered in Prometheus text format
+    """
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        """
+        Create a counter
+
+        :param name: Metric name
+        :param documentation: HELP text
+        :param labelnames: Names of the labels every sample carries
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(label, '')) for label in self.labelnames)
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        """
+        Increment the counter
+
+        :param amount: Amount to add
+        :param labels: Label values
+        """
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        """
+        Current value for a label set
+
+        :param labels: Label values
+        :return: Counter value
+        """
+        return self._values.get(self._key(labels), 0)
+
+    def collect(self) -> List[str]:
+        """
+        Render the counter as Prometheus exposition lines
+
+        :return: List of lines
+        """
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {value}")
+        return lines
+
+# Latency buckets in seconds, from sub-millisecond stages to slow GPT-4 calls
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+class Histogram:
+    """
+    Cumulative histogram with optional labels, rendered in Prometheus text format
+    """
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        """
+        Create a histogram
+
+        :param name: Metric name
+        :param documentation: HELP text
+        :param labelnames: Names of the labels every sample carries
+        :param buckets: Upper bounds of the buckets, ascending (+Inf is added)
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Label values -> [count per bucket (last is +Inf), sum]
+        self._values: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(label, '')) for label in self.labelnames)
+
+    def observe(self, value: float, **labels) -> None:
+        """
+        Record an observation
+
+        :param value: Observed value (seconds for latencies)
+        :param labels: Label values
+        """
+        self.observe_key(value, self._key(labels))
+
+    def observe_key(self, value: float, key: Tuple[str, ...]) -> None:
+        """
+        Record an observation for label values already in ``labelnames`` order
+
+        :param value: Observed value
+        :param key: Tuple of label values
+        """
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                series = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def count(self, **labels) -> int:
+        """
+        Number of observations for a label set
+
+        :param labels: Label values
+        :return: Observation count
+        """
+        series = self._values.get(self._key(labels))
+        return sum(series[0]) if series else 0
+
+    def collect(self) -> List[str]:
+        """
+        Render the histogram as Prometheus exposition lines
+
+        :return: List of lines
+        """
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((key, (list(series[0]), series[1])) for key, series in self._values.items())
+        bounds = [_format_bound(bound) for bound in self.buckets] + ['+Inf']
+        for key, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(bounds, counts):
+                cumulative += count
+                labels = _format_labels(self.labelnames + ('le',), key + (bound,))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {total}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+def _format_bound(bound: float) -> str:
+    return repr(float(bound))
+
+def _format_labels(labelnames, values) -> str:
+    if not labelnames:
+        return ''
+    pairs = ','.join(
+        f'{name}="{_escape(value)}"' for name, value in zip(labelnames, values)
+    )
+    return '{' + pairs + '}'
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+class MetricsRegistry:
+    def __init__(self):
+        """
+        Initialize an empty metrics registry
+        """
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()) -> Counter:
+        """
+        Get or create a counter
+
+        :param name: Metric name
+        :param documentation: HELP text
+        :param labelnames: Label names
+        :return: Counter instance
+        """
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = Counter(name, documentation, labelnames)
+            return self._metrics[name]
+
+    def histogram(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        """
+        Get or create a histogram
+
+        :param name: Metric name
+        :param documentation: HELP text
+        :param labelnames: Label names
+        :param buckets: Bucket upper bounds
+        :return: Histogram instance
+        """
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = Histogram(name, documentation, labelnames, buckets)
+            return self._metrics[name]
+
+    def render(self) -> str:
+        """
+        Render all metrics in Prometheus text format
+
+        :return: Exposition text
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.collect())
+        return '\n'.join(lines) + '\n'
+
+# Create a global metrics registry
+registry = MetricsRegistry()
@@ -0,0 +1,146 @@
+import os
+from urllib.parse import parse_qsl
+from dotenv import load_dotenv
+from utils import get_twilio_validator
+
+# Load environment variables
+load_dotenv()
+
+# Twilio webhook payloads are a few KB; anything larger is not a real message
+MAX_TWILIO_BODY_BYTES = 64 * 1024
+
+class TwilioSignatureMiddleware:
+    """
+    ASGI middleware that rejects webhook calls without a valid
+    X-Twilio-Signature before FastAPI parses the form or the route
+    handler reaches the chatbot and GPT-4.
+    """
+
+    def __init__(self, app, paths=('/webhook/whatsapp',)):
+        """
+        Wrap an ASGI application
+
+        :param app: ASGI application to protect
+        :param paths: Request paths that must carry a Twilio signature
+        """
+        self.app = app
+        self.paths = frozenset(paths)
+        self.enabled = os.getenv('TWILIO_VALIDATE_SIGNATURE', 'true').lower() != 'false'
+        self.base_url = os.getenv('TWILIO_WEBHOOK_BASE_URL', '').rstrip('/')
+
+    async def __call__(self, scope, receive, send):
+        if (
+            not self.enabled
+            or scope['type'] != 'http'
+            or scope['method'] != 'POST'
+            or scope['path'] not in self.paths
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope['headers'])
+        signature = headers.get(b'x-twilio-signature', b'').decode('latin-1')
+
+        # Cheap rejects first: no signature, no token, oversized body
+        if not signature:
+            await self._reject(send, 403, b'Missing Twilio signature')
+            return
+
+        validator = get_twilio_validator()
+        if validator is None:
+            await self._reject(send, 403, b'Twilio validation is not configured')
+            return
+
+        content_length = headers.get(b'content-length')
+        if content_length:
+            try:
+                content_length = int(content_length)
+            except ValueError:
+                await self._reject(send, 400, b'Invalid Content-Length')
+                return
+            if content_length > MAX_TWILIO_BODY_BYTES:
+                await self._reject(send, 413, b'Payload too large')
+                return
+
+        body = await self._read_body(receive)
+        if body is None:
+            await self._reject(send, 413, b'Payload too large')
+            return
+
+        params = dict(parse_qsl(body.decode('utf-8', 'replace'), keep_blank_values=True))
+        if not validator.validate(self._request_url(scope, headers), params, signature):
+            await self._reject(send, 403, b'Invalid Twilio signature')
+            return
+
+        await self.app(scope, self._replay(body, receive), send)
+
+    def _request_url(self, scope, headers):
+        """
+        Rebuild the URL Twilio signed
+
+        :param scope: ASGI scope
+        :param headers: Request headers keyed by lowercase bytes
+        :return: Absolute request URL
+        """
+        if self.base_url:
+            url = self.base_url + scope['path']
+        else:
+            host = headers.get(b'host', b'').decode('latin-1')
+            url = f"{scope.get('scheme', 'http')}://{host}{scope['path']}"
+
+        query_string = scope.get('query_string', b'')
+        if query_string:
+            url += '?' + query_string.decode('latin-1')
+        return url
+
+    @staticmethod
+    async def _read_body(receive):
+        """
+        Read the full request body, giving up past MAX_TWILIO_BODY_BYTES
+
+        :param receive: ASGI receive callable
+        :return: Body bytes or None if the body is too large
+        """
+        chunks = []
+        size = 0
+        more_body = True
+        while more_body:
+            message = await receive()
+            if message['type'] != 'http.request':
+                break
+            chunk = message.get('body', b'')
+            size += len(chunk)
+            if size > MAX_TWILIO_BODY_BYTES:
+                return None
+            chunks.append(chunk)
+            more_body = message.get('more_body', False)
+        return b''.join(chunks)
+
+    @staticmethod
+    def _replay(body, receive):
+        """
+        Build a receive callable that hands the buffered body to the app
+
+        :param body: Body already read by the middleware
+        :param receive: Original ASGI receive callable
+        :return: Replacement receive callable
+        """
+        replayed = False
+
+        async def replay_receive():
+            nonlocal replayed
+            if not replayed:
+                replayed = True
+                return {'type': 'http.request', 'body': body, 'more_body': False}
+            return await receive()
+
+        return replay_receive
+
+    @staticmethod
+    async def _reject(send, status, detail):
+        await send({
+            'type': 'http.response.start',
+            'status': status,
+            'headers': [(b'content-type', b'text/plain'), (b'content-length', str(len(detail)).encode())],
+        })
+        await send({'type': 'http.response.body', 'body': detail})
@@ -0,0 +1,87 @@
+import argparse
+import json
+import os
+from datetime import datetime
+from database import db
+from health_package_chatbot import HealthPackageChatbot
+
+def load_json_appointments(json_path):
+    """
+    Convert records from the legacy appointments.json into appointments table rows
+
+    :param json_path: Path to appointments.json
+    :return: Tuple of (rows to insert, records that could not be parsed,
+             records whose booking_time could not be parsed)
+    """
+    with open(json_path, 'r') as f:
+        records = json.load(f)
+
+    rows = []
+    skipped = []
+    bad_booking_times = []
+    for record in records:
+        try:
+            date, time = HealthPackageChatbot.parse_time_slot(record.get('time_slot'))
+        except ValueError:
+            skipped.append(record)
+            continue
+
+        created_at = record.get('booking_time')
+        if created_at:
+            try:
+                created_at = datetime.fromisoformat(created_at).strftime("%Y-%m-%d %H:%M:%S")
+            except (TypeError, ValueError):
+                # Keep the appointment; created_at falls back to the time of the import
+                bad_booking_times.append(record)
+                created_at = None
+
+        rows.append({
+            'phone_number': record.get('phone_number'),
+            'service': record.get('package_name'),
+            'date': date,
+            'time': time,
+            'status': (record.get('status') or 'Pending').capitalize(),
+            'created_at': created_at
+        })
+    return rows, skipped, bad_booking_times
+
+def migrate_appointments(json_path, dry_run=False):
+    """
+    Import appointments.json into the appointments table in one transaction
+
+    The JSON file is renamed to ``<name>.migrated`` afterwards so the
+    import cannot run twice.
+
+    :param json_path: Path to appointments.json
+    :param dry_run: Only report what would be imported
+    :return: Number of imported appointments
+    """
+    rows, skipped, bad_booking_times = load_json_appointments(json_path)
+    print(f"Found {len(rows)} appointments in {json_path} ({len(skipped)} unparseable, "
+          f"{len(bad_booking_times)} with an unparseable booking_time)")
+    for record in skipped:
+        print(f"  Skipping: {record}")
+    for record in bad_booking_times:
+        print(f"  Using the import time as created_at: {record}")
+
+    if dry_run:
+        return 0
+
+    inserted = db.save_appointments_bulk(rows)
+    if inserted != len(rows):
+        print("Migration failed; nothing was imported")
+        return 0
+
+    os.rename(json_path, json_path + '.migrated')
+    print(f"Imported {inserted} appointments into {db.db_path}")
+    return inserted
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import appointments.json into the SQLite appointments table")
+    parser.add_argument(
+        'json_path', nargs='?',
+        default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'appointments.json')
+    )
+    parser.add_argument('--dry-run', action='store_true')
+    args = parser.parse_args()
+    migrate_appointments(args.json_path, dry_run=args.dry_run)
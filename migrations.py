@@ -0,0 +1,196 @@
+import os
+import sqlite3
+import sys
+import time
+from typing import List
+
+# Ordered schema migrations: (version, description, statements).
+# Statements must be idempotent (IF NOT EXISTS etc.) so an interrupted
+# migration can simply be re-run.
+MIGRATIONS = [
+    (1, 'covering indexes for appointment queries', [
+        '''CREATE INDEX IF NOT EXISTS idx_appointments_phone_date
+           ON appointments(phone_number, date, time, service, status, created_at)''',
+        '''CREATE INDEX IF NOT EXISTS idx_appointments_status_date
+           ON appointments(status, date, time, phone_number, service, created_at)''',
+        '''CREATE INDEX IF NOT EXISTS idx_appointments_date
+           ON appointments(date, time, phone_number, service, status, created_at)''',
+    ]),
+    (2, 'indexes for chat log dashboard and Stripe session lookups', [
+        'CREATE INDEX IF NOT EXISTS idx_chat_logs_created ON chat_logs(created_at)',
+        'CREATE INDEX IF NOT EXISTS idx_chat_logs_phone_created ON chat_logs(phone_number, created_at)',
+        'CREATE INDEX IF NOT EXISTS idx_payments_session ON payments(session_id)',
+    ]),
+    (3, 'direction index for filtered chat log pages', [
+        'CREATE INDEX IF NOT EXISTS idx_chat_logs_direction_created ON chat_logs(direction, created_at)',
+    ]),
+    (4, 'indexes for dashboard payment queries', [
+        'CREATE INDEX IF NOT EXISTS idx_payments_created ON payments(created_at)',
+        'CREATE INDEX IF NOT EXISTS idx_payments_status_created ON payments(status, created_at, amount)',
+    ]),
+    (5, 'daily KPI rollups maintained by triggers', [
+        '''CREATE TABLE IF NOT EXISTS appointment_daily_rollup (
+               day TEXT NOT NULL,
+               service TEXT NOT NULL,
+               status TEXT NOT NULL,
+               appointments INTEGER NOT NULL DEFAULT 0,
+               PRIMARY KEY (day, service, status)
+           ) WITHOUT ROWID''',
+        '''CREATE TABLE IF NOT EXISTS payment_daily_rollup (
+               day TEXT NOT NULL,
+               service TEXT NOT NULL,
+               status TEXT NOT NULL,
+               payments INTEGER NOT NULL DEFAULT 0,
+               amount REAL NOT NULL DEFAULT 0,
+               PRIMARY KEY (day, service, status)
+           ) WITHOUT ROWID''',
+        # Keys are never NULL so ON CONFLICT always finds the existing row
+        '''CREATE TRIGGER IF NOT EXISTS trg_appointments_rollup_insert AFTER INSERT ON appointments
+           BEGIN
+               INSERT INTO appointment_daily_rollup (day, service, status, appointments)
+               VALUES (COALESCE(date(NEW.created_at), ''), COALESCE(NEW.service, ''), COALESCE(NEW.status, ''), 1)
+               ON CONFLICT (day, service, status) DO UPDATE SET appointments = appointments + 1;
+           END''',
+        '''CREATE TRIGGER IF NOT EXISTS trg_appointments_rollup_update
+           AFTER UPDATE OF service, status, created_at ON appointments
+           WHEN OLD.service IS NOT NEW.service OR OLD.status IS NOT NEW.status
+                OR OLD.created_at IS NOT NEW.created_at
+           BEGIN
+               UPDATE appointment_daily_rollup SET appointments = appointments - 1
+               WHERE day = COALESCE(date(OLD.created_at), '') AND service = COALESCE(OLD.service, '')
+               AND status = COALESCE(OLD.status, '');
+               INSERT INTO appointment_daily_rollup (day, service, status, appointments)
+               VALUES (COALESCE(date(NEW.created_at), ''), COALESCE(NEW.service, ''), COALESCE(NEW.status, ''), 1)
+               ON CONFLICT (day, service, status) DO UPDATE SET appointments = appointments + 1;
+           END''',
+        '''CREATE TRIGGER IF NOT EXISTS trg_appointments_rollup_delete AFTER DELETE ON appointments
+           BEGIN
+               UPDATE appointment_daily_rollup SET appointments = appointments - 1
+               WHERE day = COALESCE(date(OLD.created_at), '') AND service = COALESCE(OLD.service, '')
+               AND status = COALESCE(OLD.status, '');
+           END''',
+        '''CREATE TRIGGER IF NOT EXISTS trg_payments_rollup_insert AFTER INSERT ON payments
+           BEGIN
+               INSERT INTO payment_daily_rollup (day, service, status, payments, amount)
+               VALUES (COALESCE(date(NEW.created_at), ''), COALESCE(NEW.service, ''), COALESCE(NEW.status, ''),
+                       1, COALESCE(NEW.amount, 0))
+               ON CONFLICT (day, service, status) DO UPDATE
+               SET payments = payments + 1, amount = amount + excluded.amount;
+           END''',
+        '''CREATE TRIGGER IF NOT EXISTS trg_payments_rollup_update
+           AFTER UPDATE OF service, status, amount, created_at ON payments
+           WHEN OLD.service IS NOT NEW.service OR OLD.status IS NOT NEW.status
+                OR OLD.amount IS NOT NEW.amount OR OLD.created_at IS NOT NEW.created_at
+           BEGIN
+               UPDATE payment_daily_rollup
+               SET payments = payments - 1, amount = amount - COALESCE(OLD.amount, 0)
+               WHERE day = COALESCE(date(OLD.created_at), '') AND service = COALESCE(OLD.service, '')
+               AND status = COALESCE(OLD.status, '');
+               INSERT INTO payment_daily_rollup (day, service, status, payments, amount)
+               VALUES (COALESCE(date(NEW.created_at), ''), COALESCE(NEW.service, ''), COALESCE(NEW.status, ''),
+                       1, COALESCE(NEW.amount, 0))
+               ON CONFLICT (day, service, status) DO UPDATE
+               SET payments = payments + 1, amount = amount + excluded.amount;
+           END''',
+        '''CREATE TRIGGER IF NOT EXISTS trg_payments_rollup_delete AFTER DELETE ON payments
+           BEGIN
+               UPDATE payment_daily_rollup
+               SET payments = payments - 1, amount = amount - COALESCE(OLD.amount, 0)
+               WHERE day = COALESCE(date(OLD.created_at), '') AND service = COALESCE(OLD.service, '')
+               AND status = COALESCE(OLD.status, '');
+           END''',
+        # Backfill after the triggers exist; overwriting with exact counts keeps a re-run correct
+        '''INSERT INTO appointment_daily_rollup (day, service, status, appointments)
+           SELECT COALESCE(date(created_at), ''), COALESCE(service, ''), COALESCE(status, ''), COUNT(*)
+           FROM appointments WHERE true GROUP BY 1, 2, 3
+           ON CONFLICT (day, service, status) DO UPDATE SET appointments = excluded.appointments''',
+        '''INSERT INTO payment_daily_rollup (day, service, status, payments, amount)
+           SELECT COALESCE(date(created_at), ''), COALESCE(service, ''), COALESCE(status, ''),
+                  COUNT(*), COALESCE(SUM(amount), 0)
+           FROM payments WHERE true GROUP BY 1, 2, 3
+           ON CONFLICT (day, service, status) DO UPDATE
+           SET payments = excluded.payments, amount = excluded.amount''',
+    ]),
+]
+
+def _connect(db_path):
+    # Autocommit so every statement gets its own short transaction
+    return sqlite3.connect(db_path, timeout=60, isolation_level=None)
+
+def get_schema_version(db_path: str) -> int:
+    """
+    Highest applied migration version
+
+    :param db_path: SQLite database file
+    :return: Version number (0 if nothing has been applied)
+    """
+    conn = _connect(db_path)
+    try:
+        _ensure_version_table(conn)
+        row = conn.execute('SELECT MAX(version) FROM schema_migrations').fetchone()
+        return row[0] or 0
+    finally:
+        conn.close()
+
+def _ensure_version_table(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INTEGER PRIMARY KEY,
+            description TEXT,
+            applied_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            duration_ms REAL
+        )
+    ''')
+
+def apply_migrations(db_path: str, verbose: bool = False) -> List[int]:
+    """
+    Apply pending migrations in order and record each applied version
+
+    Every statement runs in its own transaction, so the write lock is only
+    held for one index build at a time and WAL readers are never blocked.
+    Several workers starting at once are safe: each version is recorded
+    with INSERT OR IGNORE and all statements are idempotent.
+
+    :param db_path: SQLite database file
+    :param verbose: Print progress
+    :return: Versions applied by this call
+    """
+    conn = _connect(db_path)
+    applied = []
+
+    try:
+        _ensure_version_table(conn)
+        done = {row[0] for row in conn.execute('SELECT version FROM schema_migrations')}
+
+        for version, description, statements in MIGRATIONS:
+            if version in done:
+                continue
+
+            start = time.perf_counter()
+            for statement in statements:
+                conn.execute(statement)
+
+            duration_ms = (time.perf_counter() - start) * 1000
+            conn.execute(
+                'INSERT OR IGNORE INTO schema_migrations (version, description, duration_ms) VALUES (?, ?, ?)',
+                (version, description, duration_ms)
+            )
+            applied.append(version)
+            if verbose:
+                print(f"Applied migration {version}: {description} ({duration_ms:.0f} ms)")
+
+        return applied
+
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    from database import HealthcareDatabase
+
+    path = sys.argv[1] if len(sys.argv) > 1 else os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), os.getenv('HEALTHCARE_DB_PATH', 'healthcare.db')
+    )
+    print(f"Schema version before: {get_schema_version(path)}")
+    # Creating the database object creates missing tables and applies pending migrations
+    HealthcareDatabase(path)
+    print(f"Schema version after: {get_schema_version(path)}")
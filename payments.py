@@ -1,5 +1,8 @@
 import os
-import stripe
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
 from dotenv import load_dotenv
 from database import db  # Import the database module
 from services import service_manager  # Import service manager
@@ -7,13 +10,190 @@ from services import service_manager  # Import service manager
 # Load environment variables
 load_dotenv()
 
-# Configure Stripe
-stripe.api_key = os.getenv('STRIPE_SECRET_KEY')
+@lru_cache(maxsize=1)
+def get_stripe():
+    """
+    Import and configure the Stripe module on first use (importing it takes ~0.1 s)
+
+    :return: The configured stripe module
+    """
+    import stripe
+    stripe.api_key = os.getenv('STRIPE_SECRET_KEY')
+    if os.getenv('STRIPE_API_BASE'):
+        # Point at a local Stripe stub for testing
+        stripe.api_base = os.getenv('STRIPE_API_BASE')
+
+    # One pooled HTTP client with keep-alive connections for all Stripe calls
+    stripe.default_http_client = stripe.http_client.RequestsClient(
+        timeout=float(os.getenv('STRIPE_TIMEOUT_SECONDS', '10'))
+    )
+    stripe.max_network_retries = int(os.getenv('STRIPE_MAX_NETWORK_RETRIES', '2'))
+    return stripe
+
+STRIPE_WEBHOOK_SECRET = os.getenv('STRIPE_WEBHOOK_SECRET')
+
+PAYMENT_CURRENCY = 'aed'
+PAYMENT_SUCCESS_URL = 'https://yourdomain.com/payment/success'
+PAYMENT_CANCEL_URL = 'https://yourdomain.com/payment/cancel'
+
+# Checkout Session webhook events and the payment status they imply
+SESSION_EVENT_STATUSES = {
+    'checkout.session.async_payment_succeeded': 'Paid',
+    'checkout.session.async_payment_failed': 'Failed',
+    'checkout.session.expired': 'Expired',
+}
+
+class StripePriceCatalog:
+    """
+    Stripe Price ids for the service catalog.
+
+    Each service gets a Price with the lookup key
+    ``service_<id>_<amount>``, so a price change in config/services.json
+    gets a new Price instead of reusing a stale one. ``load()`` looks up the
+    existing Prices (10 lookup keys per API call) and creates the missing
+    ones; Checkout Sessions can then reference a Price id instead of
+    sending inline product and price data.
+    """
+
+    def __init__(self):
+        self._price_ids = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def lookup_key(service: dict) -> str:
+        """
+        :param service: Service from the catalog
+        :return: Stripe Price lookup key for its current price
+        """
+        service_key = service.get('id') or service['name'].lower().replace(' ', '_')
+        return f"service_{service_key}_{int(service['price'] * 100)}"
+
+    def load(self, services=None) -> int:
+        """
+        Fetch or create a Stripe Price for every catalog service
+
+        :param services: Services to load (default: the whole catalog)
+        :return: Number of services with a Price id
+        """
+        services = services if services is not None else service_manager.get_all_services()
+        by_key = {self.lookup_key(service): service for service in services if service.get('price')}
+        keys = list(by_key)
+        found = {}
+
+        try:
+            stripe = get_stripe()
+            for i in range(0, len(keys), 10):
+                page = stripe.Price.list(lookup_keys=keys[i:i + 10], active=True, limit=10)
+                for price in page['data']:
+                    found[price['lookup_key']] = price['id']
+
+            for key, service in by_key.items():
+                if key not in found:
+                    price = stripe.Price.create(
+                        currency=PAYMENT_CURRENCY,
+                        unit_amount=int(service['price'] * 100),
+                        lookup_key=key,
+                        product_data={'name': service['name']}
+                    )
+                    found[key] = price['id']
+
+        except Exception as e:
+            print(f"Stripe Price Catalog Error: {e}")
+
+        with self._lock:
+            self._price_ids.update(found)
+            return len(self._price_ids)
+
+    def get(self, service: dict):
+        """
+        :param service: Service from the catalog
+        :return: Stripe Price id, or None if it has not been loaded
+        """
+        return self._price_ids.get(self.lookup_key(service))
+
+class CheckoutSessionCache:
+    """
+    Open Checkout Sessions keyed by (phone number, service).
+
+    Lets a user who asks to pay again get the link they already have
+    instead of a new session. Entries are kept in expiry order (every
+    session gets the same lifetime), bounded in size, and dropped as soon
+    as a webhook reports the session paid, failed or expired.
+    """
+
+    def __init__(self, ttl_seconds: float, reuse_margin_seconds: float, max_entries: int):
+        """
+        :param ttl_seconds: Checkout Session lifetime (Stripe allows 30 minutes to 24 hours)
+        :param reuse_margin_seconds: Don't hand out a link closer than this to expiring
+        :param max_entries: Upper bound on cached sessions
+        """
+        self.ttl_seconds = ttl_seconds
+        self.reuse_margin_seconds = reuse_margin_seconds
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._sessions = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, phone_number: str, service_name: str):
+        """
+        :return: URL of a reusable open session, or None
+        """
+        key = (phone_number, service_name.lower())
+        now = time.time()
+        with self._lock:
+            self._evict(now)
+            entry = self._entries.get(key)
+            if entry is not None and entry[2] - now > self.reuse_margin_seconds:
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            return None
+
+    def put(self, phone_number: str, service_name: str, session_id: str, url: str, expires_at: float):
+        key = (phone_number, service_name.lower())
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._sessions.pop(old[0], None)
+            self._entries[key] = (session_id, url, expires_at)
+            self._sessions[session_id] = key
+            self._evict(time.time())
+
+    def discard_session(self, session_id: str):
+        """
+        Forget a session that can no longer be paid (or has been paid)
+
+        :param session_id: Stripe Checkout Session ID
+        """
+        with self._lock:
+            key = self._sessions.pop(session_id, None)
+            if key is not None:
+                self._entries.pop(key, None)
+
+    def _evict(self, now: float):
+        while self._entries:
+            key, (session_id, _, expires_at) = next(iter(self._entries.items()))
+            if expires_at - now > self.reuse_margin_seconds and len(self._entries) <= self.max_entries:
+                break
+            self._entries.popitem(last=False)
+            self._sessions.pop(session_id, None)
+
+price_catalog = StripePriceCatalog()
+checkout_sessions = CheckoutSessionCache(
+    ttl_seconds=float(os.getenv('CHECKOUT_SESSION_TTL_SECONDS', '3600')),
+    reuse_margin_seconds=float(os.getenv('CHECKOUT_SESSION_REUSE_MARGIN_SECONDS', '300')),
+    max_entries=int(os.getenv('CHECKOUT_SESSION_CACHE_SIZE', '10000'))
+)
 
 def create_payment_link(phone_number, service_name=None):
     """
     Create a dynamic Stripe payment link
     
+    Reuses the user's open Checkout Session for the same service if it is
+    not about to expire.
+    
     :param phone_number: User's phone number
     :param service_name: Optional service name to fetch price
     :return: Payment link URL
@@ -23,6 +203,10 @@ def create_payment_link(phone_number, service_name=None):
         if not service_name:
             service_name = "Basic Health Check Up"  # Default service
         
+        cached_url = checkout_sessions.get(phone_number, service_name)
+        if cached_url:
+            return cached_url
+        
         service = service_manager.find_service_by_name(service_name)
         
         if not service:
@@ -30,42 +214,287 @@ def create_payment_link(phone_number, service_name=None):
         
         service_price = service['price']
         
-        # Create Stripe Checkout Session
-        checkout_session = stripe.checkout.Session.create(
-            payment_method_types=['card'],
-            line_items=[{
+        price_id = price_catalog.get(service)
+        if price_id:
+            line_item = {'price': price_id, 'quantity': 1}
+        else:
+            line_item = {
                 'price_data': {
-                    'currency': 'aed',
-                    'unit_amount': service_price * 100,  # Convert to cents
+                    'currency': PAYMENT_CURRENCY,
+                    'unit_amount': int(service_price * 100),  # Convert to cents
                     'product_data': {
-                        'name': service_name,
+                        'name': service['name'],
                     },
                 },
                 'quantity': 1,
-            }],
+            }
+        
+        # Create Stripe Checkout Session
+        expires_at = int(time.time() + checkout_sessions.ttl_seconds)
+        checkout_session = get_stripe().checkout.Session.create(
+            payment_method_types=['card'],
+            line_items=[line_item],
             mode='payment',
-            success_url='https://yourdomain.com/payment/success',
-            cancel_url='https://yourdomain.com/payment/cancel',
+            success_url=PAYMENT_SUCCESS_URL,
+            cancel_url=PAYMENT_CANCEL_URL,
+            expires_at=expires_at,
             metadata={
                 'phone_number': phone_number,
-                'service': service_name
+                'service': service['name']
             }
         )
         
         # Log payment attempt in database
         payment_id = db.save_payment(
             phone_number=phone_number, 
-            service=service_name, 
+            service=service['name'], 
             amount=service_price, 
             session_id=checkout_session.id
         )
         
+        checkout_sessions.put(phone_number, service_name, checkout_session.id, checkout_session.url, expires_at)
+        
         return checkout_session.url
     
     except Exception as e:
         print(f"Payment Link Creation Error: {e}")
         return "Unable to generate payment link. Please try again."
 
+def session_payment_status(session):
+    """
+    Map a Stripe Checkout Session to our payments.status value
+    
+    :param session: Checkout Session object or dict
+    :return: 'Paid', 'Processing', 'Expired' or 'Pending'
+    """
+    if session['payment_status'] in ('paid', 'no_payment_required'):
+        return 'Paid'
+    if session['status'] == 'complete':
+        # Completed checkout with a delayed payment method (bank debit etc.)
+        return 'Processing'
+    if session['status'] == 'expired':
+        return 'Expired'
+    return 'Pending'
+
+class PaymentStatusBatcher:
+    """
+    Buffers payment status changes and writes them to the payments table
+    in one transaction per batch.
+
+    A background thread flushes every ``flush_interval`` seconds, or as
+    soon as ``batch_size`` changes are waiting. If several changes arrive
+    for the same session before a flush, only the latest is written.
+    """
+
+    def __init__(self, batch_size: int = 100, flush_interval: float = 1.0):
+        """
+        :param batch_size: Pending changes that trigger an immediate flush
+        :param flush_interval: Maximum seconds a change waits before being written
+        """
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def add(self, session_id: str, status: str):
+        """
+        Queue a status change
+
+        :param session_id: Stripe Checkout Session ID
+        :param status: New payments.status value
+        """
+        with self._lock:
+            self._pending[session_id] = status
+            pending = len(self._pending)
+            if self._thread is None:
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, name='payment-status-batcher', daemon=True)
+                self._thread.start()
+        if pending >= self.batch_size:
+            self._wakeup.set()
+
+    def flush(self) -> int:
+        """
+        Write all queued changes now
+
+        :return: Number of payments updated
+        """
+        with self._lock:
+            batch, self._pending = self._pending, {}
+        if not batch:
+            return 0
+
+        updated = db.update_payment_statuses(list(batch.items()))
+        if updated is None:
+            # Put the batch back (newer changes win) and retry on the next flush
+            with self._lock:
+                self._pending = {**batch, **self._pending}
+            return 0
+        return updated
+
+    def stop(self):
+        """
+        Stop the flush thread and write everything still queued
+
+        Stripe has already been answered for queued changes, so they must
+        reach the database before the process exits.
+        """
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._stop.set()
+            self._wakeup.set()
+            thread.join(timeout=5)
+        try:
+            self.flush()
+        except Exception as e:
+            print(f"Payment Status Flush Error: {e}")
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Payment Status Flush Error: {e}")
+
+payment_status_batcher = PaymentStatusBatcher()
+
+def handle_stripe_webhook(payload, signature):
+    """
+    Verify a Stripe webhook delivery and queue the payment status change it carries
+    
+    :param payload: Raw request body (bytes)
+    :param signature: Value of the Stripe-Signature header
+    :return: The verified event
+    :raises ValueError: If the payload is not valid JSON
+    :raises stripe.error.SignatureVerificationError: If the signature does not match
+    """
+    stripe = get_stripe()
+    if not STRIPE_WEBHOOK_SECRET:
+        raise stripe.error.SignatureVerificationError("STRIPE_WEBHOOK_SECRET is not set", signature)
+    
+    event = stripe.Webhook.construct_event(payload, signature, STRIPE_WEBHOOK_SECRET)
+    session = event['data']['object']
+    
+    if event['type'].startswith('checkout.session.'):
+        checkout_sessions.discard_session(session['id'])
+    
+    if event['type'] == 'checkout.session.completed':
+        payment_status_batcher.add(session['id'], session_payment_status(session))
+    elif event['type'] in SESSION_EVENT_STATUSES:
+        payment_status_batcher.add(session['id'], SESSION_EVENT_STATUSES[event['type']])
+    
+    return event
+
+def reconcile_payments(since=None, page_size=100):
+    """
+    Bring payments.status in line with Stripe by listing Checkout Sessions page by page
+    
+    Catches anything a missed or failed webhook delivery left behind.
+    Each page of up to 100 sessions is one API call and one database
+    transaction, instead of a retrieve call per session.
+    
+    :param since: Only sessions created at or after this Unix timestamp (default: last 7 days)
+    :param page_size: Sessions per API page (max 100)
+    :return: Number of payments whose status changed
+    """
+    if since is None:
+        since = int(time.time()) - 7 * 24 * 3600
+    
+    changed = 0
+    starting_after = None
+    while True:
+        params = {'limit': page_size, 'created': {'gte': since}}
+        if starting_after:
+            params['starting_after'] = starting_after
+        page = get_stripe().checkout.Session.list(**params)
+        
+        sessions = page['data']
+        if sessions:
+            updates = [(session['id'], session_payment_status(session)) for session in sessions]
+            updated = db.update_payment_statuses(updates)
+            changed += updated or 0
+            for session_id, status in updates:
+                if status != 'Pending':
+                    checkout_sessions.discard_session(session_id)
+        
+        if not page['has_more'] or not sessions:
+            return changed
+        starting_after = sessions[-1]['id']
+
+class PaymentReconciler:
+    """
+    Runs reconcile_payments() in a background thread every
+    ``interval`` seconds, over the sessions created in the last
+    ``lookback`` seconds.
+    """
+
+    def __init__(self, interval: float = None, lookback: float = None):
+        """
+        :param interval: Seconds between runs (env PAYMENT_RECONCILE_SECONDS, default 3600; 0 disables)
+        :param lookback: Age of the oldest session checked (env PAYMENT_RECONCILE_LOOKBACK_SECONDS, default 7 days)
+        """
+        self.interval = float(os.getenv('PAYMENT_RECONCILE_SECONDS', '3600')) if interval is None else interval
+        self.lookback = (float(os.getenv('PAYMENT_RECONCILE_LOOKBACK_SECONDS', str(7 * 24 * 3600)))
+                         if lookback is None else lookback)
+        self.last_run = None
+        self.last_changed = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def run_once(self) -> int:
+        """
+        Reconcile now
+
+        :return: Number of payments whose status changed
+        """
+        changed = reconcile_payments(since=int(time.time() - self.lookback))
+        self.last_run = time.time()
+        self.last_changed = changed
+        return changed
+
+    def start(self) -> bool:
+        """
+        Start the reconciliation thread
+
+        :return: True if the reconciler is running
+        """
+        if self._thread is not None:
+            return True
+        if self.interval <= 0:
+            return False
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='payment-reconciler', daemon=True)
+        self._thread.start()
+        return True
+
+    def stop(self):
+        """
+        Stop the reconciliation thread
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _run(self):
+        # First run right away: catches what was missed while the app was down
+        while not self._stop.is_set():
+            try:
+                changed = self.run_once()
+                if changed:
+                    print(f"Payment reconciliation updated {changed} payments")
+            except Exception as e:
+                print(f"Payment Reconciliation Error: {e}")
+            self._stop.wait(self.interval)
+
+payment_reconciler = PaymentReconciler()
+
 def verify_payment(session_id):
     """
     Verify payment status
@@ -74,13 +503,26 @@ def verify_payment(session_id):
     :return: Payment status
     """
     try:
-        session = stripe.checkout.Session.retrieve(session_id)
+        session = get_stripe().checkout.Session.retrieve(session_id)
         
         # Update payment status in database
-        # This is a placeholder - implement based on your database schema
+        status = session_payment_status(session)
+        db.update_payment_statuses([(session_id, status)])
+        if status != 'Pending':
+            checkout_sessions.discard_session(session_id)
         
         return session.payment_status == 'paid'
     
     except Exception as e:
         print(f"Payment Verification Error: {e}")
-        return False 
\ No newline at end of file
+        return False 
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Bring payments.status in line with Stripe Checkout Sessions")
+    parser.add_argument('--days', type=float, default=7, help="check sessions created in the last DAYS days")
+    args = parser.parse_args()
+
+    changed = reconcile_payments(since=int(time.time() - args.days * 24 * 3600))
+    print(f"Updated {changed} payments")
@@ -0,0 +1,364 @@
+import asyncio
+import contextvars
+import os
+import random
+import signal
+import sys
+import threading
+import time
+from collections import Counter
+from functools import wraps
+from typing import Dict, List, Optional
+from dotenv import load_dotenv
+from metrics import registry
+
+# Load environment variables
+load_dotenv()
+
+profiled_requests_total = registry.counter(
+    'profiled_requests_total', 'Requests picked for sampling profiling', ('route',)
+)
+
+# (profiler, route) of the profiled request the current task belongs to (None when not profiled)
+_profiled_request = contextvars.ContextVar('profiled_request', default=None)
+
+def bind_worker(func):
+    """
+    Tag a callable submitted to a worker pool with the current request's route
+
+    :param func: Callable about to run in another thread
+    :return: The callable, wrapped only when the current request is profiled
+    """
+    profiled = _profiled_request.get()
+    if profiled is None:
+        return func
+    profiler, route = profiled
+
+    @wraps(func)
+    def run_profiled(*args, **kwargs):
+        profiler._enter_thread(route)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            profiler._exit_thread()
+    return run_profiled
+
+class SamplingProfiler:
+    """
+    Opt-in sampling profiler for request hot paths.
+
+    While enabled, a fraction (``sample_rate``) of requests is picked by
+    ``ProfilingMiddleware``. A background thread wakes every ``interval``
+    seconds, reads the stacks of the threads those requests are running
+    on and counts them per route:
+
+    - on the event loop thread, a stack counts only when the loop's
+      current task is a profiled request (awaiting costs nothing);
+    - work handed to the worker pools with ``run_io``/``run_cpu`` is
+      tagged with the route of the request that submitted it
+      (``bind_worker``).
+
+    Stacks are kept in the collapsed format (``frame;frame;frame count``)
+    read by flamegraph.pl, inferno and speedscope. The sampler stretches
+    its interval so its own CPU time stays under ``max_overhead``, and
+    does nothing at all while no profiled request is in flight.
+    """
+
+    def __init__(self, sample_rate: float = None, interval: float = None, max_overhead: float = None,
+                 output_dir: str = None, max_stacks: int = 10000):
+        """
+        Initialize the profiler (disabled until enable() or PROFILING_ENABLED=true)
+
+        :param sample_rate: Fraction of requests profiled (env PROFILING_SAMPLE_RATE, default 0.05)
+        :param interval: Seconds between samples (env PROFILING_INTERVAL_MS, default 5 ms)
+        :param max_overhead: Maximum share of one CPU the sampler may use (env PROFILING_MAX_OVERHEAD, default 0.02)
+        :param output_dir: Where dump() writes .folded files (env PROFILING_DIR, default "profiles")
+        :param max_stacks: Distinct stacks kept per route; further ones are counted as "[other]"
+        """
+        self.sample_rate = float(os.getenv('PROFILING_SAMPLE_RATE', '0.05')) if sample_rate is None else sample_rate
+        self.interval = float(os.getenv('PROFILING_INTERVAL_MS', '5')) / 1000 if interval is None else interval
+        self.max_overhead = (float(os.getenv('PROFILING_MAX_OVERHEAD', '0.02'))
+                             if max_overhead is None else max_overhead)
+        self.output_dir = output_dir or os.getenv('PROFILING_DIR', 'profiles')
+        self.max_stacks = max_stacks
+
+        self.enabled = False
+        self.enabled_at = None
+        self._disable_timer = None
+        self._stacks: Dict[str, Counter] = {}
+        self._samples = 0
+        self._sampling_seconds = 0.0
+        # Profiled work in flight: task -> (loop thread id, route) and worker thread id -> route
+        self._tasks = {}
+        self._threads = {}
+        self._frame_names = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+        if os.getenv('PROFILING_ENABLED', 'false').lower() == 'true':
+            self.enable()
+
+    def enable(self, sample_rate: float = None, duration: float = None):
+        """
+        Start profiling new requests
+
+        :param sample_rate: Fraction of requests to profile (keeps the current one when omitted)
+        :param duration: Seconds after which profiling stops and the profiles are dumped
+        """
+        with self._lock:
+            if sample_rate is not None:
+                self.sample_rate = max(0.0, min(1.0, sample_rate))
+            if self._disable_timer:
+                self._disable_timer.cancel()
+                self._disable_timer = None
+            if duration:
+                self._disable_timer = threading.Timer(duration, self.disable, kwargs={'dump': True})
+                self._disable_timer.daemon = True
+                self._disable_timer.start()
+            if not self.enabled:
+                self.enabled = True
+                self.enabled_at = time.time()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='profiler', daemon=True)
+                self._thread.start()
+
+    def disable(self, dump: bool = False) -> List[str]:
+        """
+        Stop profiling new requests (profiles collected so far are kept)
+
+        :param dump: Write the profiles to output_dir
+        :return: Paths written
+        """
+        with self._lock:
+            self.enabled = False
+            if self._disable_timer:
+                self._disable_timer.cancel()
+                self._disable_timer = None
+        return self.dump() if dump else []
+
+    def toggle(self, *args):
+        """
+        Signal handler: enable, or disable and dump
+        """
+        if self.enabled:
+            paths = self.disable(dump=True)
+            print(f"Profiling disabled; wrote {', '.join(paths) or 'no profiles'}")
+        else:
+            self.enable()
+            print(f"Profiling enabled for {self.sample_rate:.0%} of requests")
+
+    def install_signal_handler(self, signal_name: str = None):
+        """
+        Toggle profiling with a signal (env PROFILING_SIGNAL, default SIGUSR2)
+
+        :param signal_name: Signal name, e.g. "SIGUSR2"
+        """
+        signal_name = signal_name or os.getenv('PROFILING_SIGNAL', 'SIGUSR2')
+        signum = getattr(signal, signal_name, None)
+        if signum is None:
+            return
+        try:
+            signal.signal(signum, self.toggle)
+        except ValueError:
+            # Only the main thread may install signal handlers
+            pass
+
+    def should_profile(self) -> bool:
+        """
+        Decide whether to profile the next request
+
+        :return: True for about ``sample_rate`` of requests while enabled
+        """
+        return self.enabled and random.random() < self.sample_rate
+
+    def start_request(self, route: str):
+        """
+        Mark the current task as a profiled request
+
+        :param route: Route the samples are filed under
+        :return: Token for finish_request()
+        """
+        profiled_requests_total.inc(route=route)
+        task = asyncio.current_task()
+        if task is None:
+            self._enter_thread(route)
+        else:
+            with self._lock:
+                self._tasks[task] = (threading.get_ident(), route)
+            self._wakeup.set()
+        return task, _profiled_request.set((self, route))
+
+    def finish_request(self, token):
+        """
+        Stop sampling the request started with start_request()
+
+        :param token: Token returned by start_request()
+        """
+        task, request_token = token
+        _profiled_request.reset(request_token)
+        if task is None:
+            self._exit_thread()
+        else:
+            with self._lock:
+                self._tasks.pop(task, None)
+
+    def _enter_thread(self, route: str):
+        with self._lock:
+            self._threads[threading.get_ident()] = route
+        self._wakeup.set()
+
+    def _exit_thread(self):
+        with self._lock:
+            self._threads.pop(threading.get_ident(), None)
+
+    def _run(self):
+        while True:
+            if not self._tasks and not self._threads:
+                # Nothing profiled in flight: sleep until a request is picked
+                self._wakeup.wait()
+                self._wakeup.clear()
+                continue
+
+            # CPU time, not wall time: waiting for the GIL costs the app nothing
+            start = time.thread_time()
+            self._sample()
+            elapsed = time.thread_time() - start
+            self._samples += 1
+            self._sampling_seconds += elapsed
+            # Bound the sampler's own CPU share: a slow sample buys a longer pause
+            time.sleep(max(self.interval, elapsed / self.max_overhead - elapsed))
+
+    def _sample(self):
+        with self._lock:
+            tasks = list(self._tasks.items())
+            threads = list(self._threads.items())
+        frames = sys._current_frames()
+
+        samples = []
+        for task, (ident, route) in tasks:
+            frame = frames.get(ident)
+            # Only while the request's task is the one running on its loop
+            if frame is not None and asyncio.current_task(task.get_loop()) is task:
+                samples.append((route, frame))
+        for ident, route in threads:
+            frame = frames.get(ident)
+            if frame is not None:
+                samples.append((route, frame))
+
+        for route, frame in samples:
+            stack = self._collapse(frame)
+            with self._lock:
+                counts = self._stacks.setdefault(route, Counter())
+                if stack not in counts and len(counts) >= self.max_stacks:
+                    stack = '[other]'
+                counts[stack] += 1
+
+    def _collapse(self, frame) -> str:
+        names = []
+        frame_names = self._frame_names
+        while frame is not None:
+            code = frame.f_code
+            name = frame_names.get(code)
+            if name is None:
+                module = os.path.splitext(os.path.basename(code.co_filename))[0]
+                name = frame_names[code] = f"{module}:{code.co_name}".replace(';', ':')
+            names.append(name)
+            frame = frame.f_back
+        names.reverse()
+        return ';'.join(names)
+
+    def collapsed(self, route: str = None) -> str:
+        """
+        Profiles in collapsed stack format
+
+        :param route: Only this route (all routes, prefixed with the route, when omitted)
+        :return: One "frame;frame;frame count" line per distinct stack
+        """
+        with self._lock:
+            if route is not None:
+                items = [(stack, count) for stack, count in self._stacks.get(route, {}).items()]
+            else:
+                items = [(f"{name};{stack}", count) for name, counts in self._stacks.items()
+                         for stack, count in counts.items()]
+        return ''.join(f"{stack} {count}\n" for stack, count in sorted(items))
+
+    def dump(self) -> List[str]:
+        """
+        Write one .folded file per route to output_dir
+
+        :return: Paths written
+        """
+        os.makedirs(self.output_dir, exist_ok=True)
+        stamp = time.strftime('%Y%m%d-%H%M%S')
+        paths = []
+        with self._lock:
+            routes = list(self._stacks)
+        for route in routes:
+            name = route.strip('/').replace('/', '_') or 'root'
+            path = os.path.join(self.output_dir, f"{name}-{stamp}.folded")
+            with open(path, 'w') as profile_file:
+                profile_file.write(self.collapsed(route))
+            paths.append(path)
+        return paths
+
+    def reset(self):
+        """
+        Drop the profiles collected so far
+        """
+        with self._lock:
+            self._stacks = {}
+            self._samples = 0
+            self._sampling_seconds = 0.0
+
+    def status(self) -> dict:
+        """
+        Current settings and collected samples per route
+
+        :return: Status dict
+        """
+        with self._lock:
+            routes = {route: sum(counts.values()) for route, counts in self._stacks.items()}
+            in_flight = len(self._tasks) + len(self._threads)
+        return {
+            'enabled': self.enabled,
+            'enabled_at': self.enabled_at,
+            'sample_rate': self.sample_rate,
+            'interval_ms': self.interval * 1000,
+            'max_overhead': self.max_overhead,
+            'samples': self._samples,
+            'sampler_cpu_seconds': round(self._sampling_seconds, 4),
+            'mean_sample_us': round(self._sampling_seconds / self._samples * 1e6, 1) if self._samples else None,
+            'in_flight': in_flight,
+            'routes': routes,
+        }
+
+class ProfilingMiddleware:
+    """
+    ASGI middleware that hands a sample of HTTP requests and websocket
+    connections to the sampling profiler, filed under their path
+    """
+
+    def __init__(self, app, profiler: Optional[SamplingProfiler] = None):
+        """
+        Wrap an ASGI application
+
+        :param app: ASGI application
+        :param profiler: Profiler to use (the global one by default)
+        """
+        self.app = app
+        self.profiler = profiler or sampling_profiler
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] not in ('http', 'websocket') or not self.profiler.should_profile():
+            await self.app(scope, receive, send)
+            return
+
+        token = self.profiler.start_request(scope['path'])
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.profiler.finish_request(token)
+
+# Create a global sampling profiler
+sampling_profiler = SamplingProfiler()
@@ -0,0 +1,114 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from dotenv import load_dotenv
+from metrics import registry
+
+# Load environment variables
+load_dotenv()
+
+messages_rate_limited_total = registry.counter(
+    'messages_rate_limited_total', 'Messages rejected by the per-sender rate limiter', ('channel',)
+)
+llm_requests_shed_total = registry.counter(
+    'llm_requests_shed_total', 'Messages answered without GPT-4 because the LLM concurrency cap was reached', ('channel',)
+)
+
+class SenderRateLimiter:
+    """
+    Token-bucket rate limiter keyed on sender (phone number, Instagram id
+    or website client id).
+
+    Each sender gets ``burst`` tokens that refill at ``rate_per_minute``.
+    Buckets for the least recently seen senders are dropped once
+    ``max_senders`` is exceeded, which only ever makes a limit more lenient.
+    """
+
+    def __init__(self, rate_per_minute: float = None, burst: int = None, max_senders: int = 100000):
+        """
+        Initialize the rate limiter
+
+        :param rate_per_minute: Sustained messages allowed per sender per minute
+        :param burst: Bucket size (messages allowed back-to-back)
+        :param max_senders: Upper bound on tracked senders
+        """
+        if rate_per_minute is None:
+            rate_per_minute = float(os.getenv('RATE_LIMIT_PER_MINUTE', '10'))
+        if burst is None:
+            burst = int(os.getenv('RATE_LIMIT_BURST', '5'))
+
+        self.refill_per_second = rate_per_minute / 60.0
+        self.burst = burst
+        self.max_senders = max_senders
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def allow(self, sender: str, channel: str = 'whatsapp') -> bool:
+        """
+        Consume one token for a sender
+
+        :param sender: Sender key
+        :param channel: Channel name used for metrics
+        :return: True if the message may be processed
+        """
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated_at = self._buckets.pop(sender, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated_at) * self.refill_per_second)
+
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+
+            self._buckets[sender] = (tokens, now)
+            if len(self._buckets) > self.max_senders:
+                self._buckets.popitem(last=False)
+
+        if not allowed:
+            messages_rate_limited_total.inc(channel=channel)
+        return allowed
+
+class LLMConcurrencyLimiter:
+    """
+    Global cap on concurrent GPT-4 bound work.
+
+    Acquisition never waits: when every slot is busy the caller is told so
+    immediately and should answer from the structured chatbot instead of
+    queueing behind slow LLM calls.
+    """
+
+    def __init__(self, max_concurrency: int = None):
+        """
+        Initialize the limiter
+
+        :param max_concurrency: Maximum simultaneous LLM calls
+        """
+        if max_concurrency is None:
+            max_concurrency = int(os.getenv('LLM_MAX_CONCURRENCY', '8'))
+        self.max_concurrency = max_concurrency
+        self._semaphore = threading.BoundedSemaphore(max_concurrency)
+
+    @contextmanager
+    def slot(self, channel: str = 'whatsapp'):
+        """
+        Try to take an LLM slot for the duration of the block
+
+        :param channel: Channel name used for metrics
+        :return: Context manager yielding True if a slot was acquired
+        """
+        acquired = self._semaphore.acquire(blocking=False)
+        if not acquired:
+            llm_requests_shed_total.inc(channel=channel)
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                self._semaphore.release()
+
+RATE_LIMITED_MESSAGE = "You're sending messages too quickly. Please wait a moment and try again."
+
+# Create global limiter instances
+sender_limiter = SenderRateLimiter()
+llm_limiter = LLMConcurrencyLimiter()
@@ -0,0 +1,480 @@
+import heapq
+import os
+import sqlite3
+import threading
+import time
+from datetime import date as date_cls, datetime
+from typing import Callable, Dict, List, Optional
+from dotenv import load_dotenv
+from database import db
+from lazy import LazySingleton
+from metrics import registry
+
+# Load environment variables
+load_dotenv()
+
+reminders_total = registry.counter(
+    'appointment_reminders_total', 'Appointment reminders by outcome', ('result',)
+)
+
+REMINDER_TEMPLATE = (
+    "⏰ Reminder: your {service} appointment is on {day} at {time}.\n"
+    "Reply to this message if you need to reschedule."
+)
+
+class ReminderScheduler:
+    """
+    Sends WhatsApp reminders ahead of booked appointments.
+
+    Reminders are rows in ``appointment_reminders`` (one per appointment
+    and lead time), created from the ``appointments`` table by a periodic
+    sync. Pending reminders due within the next ``load_window_seconds`` are
+    kept in a heap ordered by send time; the scheduler thread sleeps until
+    the earliest one is due (or the next sync) and never polls the table.
+
+    Due reminders are sent in batches of ``batch_size`` at no more than
+    ``send_rate`` messages per second. Each batch is claimed with a
+    conditional update from 'pending' to 'sending' before anything is
+    sent, so several worker processes can run a scheduler against the same
+    database without double-sending, and a restart simply reloads the
+    pending rows.
+    """
+
+    def __init__(self, db_path: str = None, lead_minutes=None, send_rate: float = None, batch_size: int = None,
+                 sync_interval: float = None, full_sync_interval: float = None, load_window_seconds: float = None,
+                 max_attempts: int = 3, retry_delay: float = 300, claim_timeout: float = 600,
+                 sender: Callable[[str, str], Optional[str]] = None, clock: Callable[[], float] = time.time):
+        """
+        Initialize the reminder scheduler
+
+        :param db_path: SQLite database file (defaults to the healthcare database)
+        :param lead_minutes: Minutes before the appointment to remind (env REMINDER_LEAD_MINUTES, default "1440,120")
+        :param send_rate: Maximum reminders sent per second (env REMINDER_SEND_RATE, default 10)
+        :param batch_size: Reminders claimed and sent per batch (env REMINDER_BATCH_SIZE, default 50)
+        :param sync_interval: Seconds between syncs of newly booked appointments (env REMINDER_SYNC_SECONDS, default 60)
+        :param full_sync_interval: Seconds between syncs that also pick up rescheduled appointments (default 3600)
+        :param load_window_seconds: How far ahead pending reminders are loaded into memory (default 6 hours)
+        :param max_attempts: Send attempts before a reminder is marked failed
+        :param retry_delay: Seconds before a failed send is retried (multiplied by the attempt number)
+        :param claim_timeout: Seconds after which a reminder stuck in 'sending' (crashed worker) is retried
+        :param sender: Callable(phone_number, message) returning a message id or None on failure
+                       (defaults to WhatsAppHandler.send_whatsapp_message)
+        :param clock: Returns the current epoch time
+        """
+        if lead_minutes is None:
+            lead_minutes = [int(m) for m in os.getenv('REMINDER_LEAD_MINUTES', '1440,120').split(',') if m.strip()]
+        if db_path is None:
+            # The syncs read the appointments table
+            db.initialize()
+        self.db_path = db_path or db.db_path
+        self.lead_minutes = sorted(lead_minutes, reverse=True)
+        self.send_rate = send_rate or float(os.getenv('REMINDER_SEND_RATE', '10'))
+        self.batch_size = batch_size or int(os.getenv('REMINDER_BATCH_SIZE', '50'))
+        self.sync_interval = sync_interval or float(os.getenv('REMINDER_SYNC_SECONDS', '60'))
+        self.full_sync_interval = full_sync_interval or 3600
+        self.load_window_seconds = load_window_seconds or 6 * 3600
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.claim_timeout = claim_timeout
+        self.sender = sender
+        self.clock = clock
+
+        self._local = threading.local()
+        self._heap = []
+        self._queued = set()
+        self._lock = threading.Lock()
+        self._loaded_until = 0.0
+        self._synced_through_id = 0
+        self._next_sync = 0.0
+        self._next_full_sync = 0.0
+        self._not_before = 0.0
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._create_tables()
+
+    def _connection(self):
+        """
+        Autocommit connection for the current thread
+        """
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            self._local.conn = conn
+        return conn
+
+    def _create_tables(self):
+        conn = self._connection()
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS appointment_reminders (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                appointment_id INTEGER NOT NULL,
+                appointment_date TEXT NOT NULL,
+                appointment_time TEXT NOT NULL,
+                lead_minutes INTEGER NOT NULL,
+                phone_number TEXT NOT NULL,
+                message TEXT NOT NULL,
+                appointment_at REAL NOT NULL,
+                send_at REAL NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                claimed_at REAL,
+                sent_at REAL,
+                message_sid TEXT,
+                UNIQUE (appointment_id, appointment_date, appointment_time, lead_minutes)
+            )
+        ''')
+        conn.execute('''
+            CREATE INDEX IF NOT EXISTS idx_appointment_reminders_pending
+            ON appointment_reminders(send_at) WHERE status = 'pending'
+        ''')
+        conn.execute('''
+            CREATE INDEX IF NOT EXISTS idx_appointment_reminders_sending
+            ON appointment_reminders(claimed_at) WHERE status = 'sending'
+        ''')
+
+    @staticmethod
+    def appointment_timestamp(date: str, time_str: str) -> Optional[float]:
+        """
+        Local epoch time of an appointment
+
+        :param date: YYYY-MM-DD
+        :param time_str: HH:MM (24h) or e.g. "9:00 AM"
+        :return: Epoch seconds, or None if the date or time cannot be parsed
+        """
+        for fmt in ("%Y-%m-%d %H:%M", "%Y-%m-%d %I:%M %p"):
+            try:
+                return datetime.strptime(f"{date} {time_str.strip().upper()}", fmt).timestamp()
+            except (ValueError, AttributeError):
+                continue
+        return None
+
+    @staticmethod
+    def format_message(service: str, appointment_at: float) -> str:
+        moment = datetime.fromtimestamp(appointment_at)
+        return REMINDER_TEMPLATE.format(
+            service=service or 'clinic',
+            day=moment.strftime("%A, %d %B"),
+            time=moment.strftime("%I:%M %p").lstrip('0')
+        )
+
+    def sync(self, now: float = None, full: bool = False) -> int:
+        """
+        Create reminder rows for upcoming appointments that don't have them yet
+
+        A regular sync only looks at appointments booked since the last one;
+        a full sync also catches appointments whose date or time changed.
+        Reminders whose send time has already passed are recorded as
+        'skipped' so they are not considered again.
+
+        :param now: Current epoch time
+        :param full: Re-check every upcoming appointment
+        :return: Number of pending reminders created
+        """
+        now = self.clock() if now is None else now
+        conn = self._connection()
+        today = date_cls.fromtimestamp(now).isoformat()
+        # A full sync walks the date index; an incremental one only the new rowids
+        # (the unary + keeps SQLite from choosing the date index for it)
+        date_filter = 'a.date >= ?' if full else '+a.date >= ? AND a.id > ?'
+        params = (today,) if full else (today, self._synced_through_id)
+        (max_id,) = conn.execute('SELECT MAX(id) FROM appointments').fetchone()
+        rows = conn.execute(f'''
+            SELECT a.id, a.phone_number, a.service, a.date, a.time FROM appointments a
+            WHERE {date_filter} AND a.status != 'Cancelled'
+            AND NOT EXISTS (
+                SELECT 1 FROM appointment_reminders r
+                WHERE r.appointment_id = a.id AND r.appointment_date = a.date AND r.appointment_time = a.time
+            )
+        ''', params).fetchall()
+
+        reminders = []
+        self._synced_through_id = max(self._synced_through_id, max_id or 0, *(row[0] for row in rows))
+        for appointment_id, phone_number, service, date, time_str in rows:
+            appointment_at = self.appointment_timestamp(date, time_str)
+            if appointment_at is None:
+                continue
+            message = self.format_message(service, appointment_at)
+            for lead in self.lead_minutes:
+                send_at = appointment_at - lead * 60
+                status = 'pending' if send_at > now else 'skipped'
+                reminders.append((appointment_id, date, time_str, lead, phone_number, message,
+                                  appointment_at, send_at, status))
+
+        if not reminders:
+            return 0
+
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.executemany('''
+                INSERT OR IGNORE INTO appointment_reminders
+                (appointment_id, appointment_date, appointment_time, lead_minutes, phone_number, message,
+                 appointment_at, send_at, status)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', reminders)
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+        # Anything new inside the loaded window goes straight onto the heap
+        self._load(conn, 'send_at < ?', (self._loaded_until,))
+        return sum(1 for reminder in reminders if reminder[-1] == 'pending')
+
+    def _load(self, conn, condition: str, params: tuple) -> int:
+        rows = conn.execute(
+            f"SELECT send_at, id FROM appointment_reminders WHERE status = 'pending' AND {condition}", params
+        ).fetchall()
+        added = 0
+        with self._lock:
+            for send_at, reminder_id in rows:
+                if reminder_id not in self._queued:
+                    self._queued.add(reminder_id)
+                    heapq.heappush(self._heap, (send_at, reminder_id))
+                    added += 1
+        return added
+
+    def _refill(self, now: float):
+        """
+        Extend the in-memory window and recover reminders nobody is handling
+        """
+        conn = self._connection()
+        # Reminders left in 'sending' by a worker that died mid-batch
+        conn.execute('''
+            UPDATE appointment_reminders SET status = 'pending'
+            WHERE status = 'sending' AND claimed_at < ?
+        ''', (now - self.claim_timeout,))
+
+        horizon = now + self.load_window_seconds
+        self._load(conn, 'send_at >= ? AND send_at < ?', (self._loaded_until, horizon))
+        # Overdue reminders queued by another process that is gone, or just recovered above
+        self._load(conn, 'send_at < ?', (min(self._loaded_until, now),))
+        self._loaded_until = horizon
+
+    def run_due(self, now: float = None) -> float:
+        """
+        Sync if it's time, then send one batch of due reminders
+
+        :param now: Current epoch time
+        :return: Epoch time at which this should be called again
+        """
+        now = self.clock() if now is None else now
+
+        if now >= self._next_sync:
+            # Set before syncing so a wake() that arrives meanwhile is not lost
+            self._next_sync = now + self.sync_interval
+            full = now >= self._next_full_sync
+            if full:
+                self._next_full_sync = now + self.full_sync_interval
+            self.sync(now, full=full)
+            self._refill(now)
+
+        due = []
+        if now >= self._not_before:
+            with self._lock:
+                while self._heap and self._heap[0][0] <= now and len(due) < self.batch_size:
+                    _, reminder_id = heapq.heappop(self._heap)
+                    self._queued.discard(reminder_id)
+                    due.append(reminder_id)
+
+        if due:
+            self._dispatch(due, now)
+            # Rate limit: the next batch may start once this one's share of the send rate has elapsed
+            self._not_before = now + len(due) / self.send_rate
+
+        with self._lock:
+            next_due = self._heap[0][0] if self._heap else float('inf')
+        return min(max(next_due, self._not_before), self._next_sync)
+
+    def _claim(self, conn, reminder_ids: List[int], now: float) -> List[tuple]:
+        """
+        Move reminders from 'pending' to 'sending' and return the ones this process won
+
+        Reminders for appointments that were cancelled, moved or have
+        already started are closed instead of sent.
+        """
+        placeholders = ','.join('?' * len(reminder_ids))
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            rows = conn.execute(f'''
+                SELECT r.id, r.phone_number, r.message, r.appointment_at,
+                       a.status, a.date = r.appointment_date AND a.time = r.appointment_time
+                FROM appointment_reminders r LEFT JOIN appointments a ON a.id = r.appointment_id
+                WHERE r.id IN ({placeholders}) AND r.status = 'pending'
+            ''', reminder_ids).fetchall()
+
+            claimed, closed = [], []
+            for reminder_id, phone_number, message, appointment_at, status, unchanged in rows:
+                if status is None or status == 'Cancelled' or not unchanged:
+                    closed.append(('cancelled', reminder_id))
+                elif appointment_at <= now:
+                    closed.append(('skipped', reminder_id))
+                else:
+                    claimed.append((reminder_id, phone_number, message))
+
+            conn.executemany('UPDATE appointment_reminders SET status = ? WHERE id = ?', closed)
+            conn.executemany(
+                "UPDATE appointment_reminders SET status = 'sending', attempts = attempts + 1, claimed_at = ? WHERE id = ?",
+                [(now, reminder_id) for reminder_id, _, _ in claimed]
+            )
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+        for status, _ in closed:
+            reminders_total.inc(result=status)
+        return claimed
+
+    def _dispatch(self, reminder_ids: List[int], now: float) -> Dict[str, int]:
+        conn = self._connection()
+        claimed = self._claim(conn, reminder_ids, now)
+        sender = self._get_sender()
+
+        sent, retries = 0, []
+        for reminder_id, phone_number, message in claimed:
+            try:
+                message_sid = sender(phone_number, message)
+            except Exception as e:
+                print(f"Reminder Send Error: {e}")
+                message_sid = None
+            if message_sid:
+                # Recorded right away (autocommit): if the process dies later in the batch,
+                # the claim-timeout recovery must not put a delivered reminder back to 'pending'
+                conn.execute('''
+                    UPDATE appointment_reminders SET status = 'sent', sent_at = ?, message_sid = ?
+                    WHERE id = ? AND status = 'sending'
+                ''', (now, message_sid, reminder_id))
+                reminders_total.inc(result='sent')
+                sent += 1
+            else:
+                retries.append(reminder_id)
+
+        if not retries:
+            return {'sent': sent, 'retry': 0}
+
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.executemany('''
+                UPDATE appointment_reminders
+                SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END,
+                    send_at = ? + ? * attempts
+                WHERE id = ? AND status = 'sending'
+            ''', [(self.max_attempts, now, self.retry_delay, reminder_id) for reminder_id in retries])
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+        reminders_total.inc(len(retries), result='send_error')
+        self._load(conn, 'id IN ({})'.format(','.join('?' * len(retries))), tuple(retries))
+        return {'sent': sent, 'retry': len(retries)}
+
+    def _get_sender(self):
+        if self.sender is None:
+            from whatsapp_handler import WhatsAppHandler
+            self.sender = WhatsAppHandler().send_whatsapp_message
+        return self.sender
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Reminder counts by status
+
+        :return: Dict of status -> count, plus the number queued in memory
+        """
+        rows = self._connection().execute(
+            'SELECT status, COUNT(*) FROM appointment_reminders GROUP BY status'
+        ).fetchall()
+        counts = dict(rows)
+        with self._lock:
+            counts['queued_in_memory'] = len(self._heap)
+        return counts
+
+    def start(self) -> bool:
+        """
+        Start the scheduler thread
+
+        :return: True if the scheduler is running
+        """
+        if self._thread is not None:
+            return True
+        try:
+            self._get_sender()
+        except Exception as e:
+            print(f"Reminder scheduler not started: {e}")
+            return False
+
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='reminder-scheduler', daemon=True)
+        self._thread.start()
+        return True
+
+    def stop(self):
+        """
+        Stop the scheduler thread (pending reminders stay in the database)
+        """
+        self._stop.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def wake(self):
+        """
+        Sync new appointments now instead of at the next sync interval
+        """
+        self._next_sync = 0.0
+        self._wakeup.set()
+
+    def on_appointments_changed(self, table: str, changes: List[Dict]):
+        """
+        Database change listener: close the pending reminders of cancelled
+        appointments right away, and reopen them if an appointment is
+        reinstated before they are due
+
+        :param table: Changed table
+        :param changes: Dicts with 'id', 'old_status' and 'status'
+        """
+        if table != 'appointments':
+            return
+        cancelled = [change['id'] for change in changes if change['status'] == 'Cancelled']
+        reinstated = [change['id'] for change in changes if change['old_status'] == 'Cancelled'
+                      and change['status'] != 'Cancelled']
+        conn = self._connection()
+
+        for start in range(0, len(cancelled), 500):
+            chunk = cancelled[start:start + 500]
+            closed = conn.execute(f'''
+                UPDATE appointment_reminders SET status = 'cancelled'
+                WHERE status = 'pending' AND appointment_id IN ({','.join('?' * len(chunk))})
+            ''', chunk).rowcount
+            reminders_total.inc(closed, result='cancelled')
+
+        for start in range(0, len(reinstated), 500):
+            chunk = reinstated[start:start + 500]
+            placeholders = ','.join('?' * len(chunk))
+            conn.execute(f'''
+                UPDATE appointment_reminders SET status = 'pending'
+                WHERE status = 'cancelled' AND send_at > ? AND appointment_id IN ({placeholders})
+            ''', (self.clock(), *chunk))
+            self._load(conn, f'send_at < ? AND appointment_id IN ({placeholders})', (self._loaded_until, *chunk))
+        if reinstated:
+            self._wakeup.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wakeup.clear()
+            try:
+                wake_at = self.run_due()
+            except Exception as e:
+                print(f"Reminder Scheduler Error: {e}")
+                wake_at = self.clock() + self.sync_interval
+            self._wakeup.wait(max(0.0, wake_at - self.clock()))
+
+def _on_appointments_changed(table: str, changes: List[Dict]):
+    # Looked up per call, so registering the listener doesn't build the scheduler
+    reminder_scheduler.on_appointments_changed(table, changes)
+
+# Create a global reminder scheduler instance (tables are created on first use)
+reminder_scheduler = LazySingleton(ReminderScheduler)
+db.add_change_listener(_on_appointments_changed)
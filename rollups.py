@@ -0,0 +1,118 @@
+import argparse
+import os
+import sqlite3
+import sys
+from typing import Dict, List
+
+# Daily KPI rollups kept current by the triggers from migration 5
+# (migrations.py). Each entry recomputes a rollup from its source table;
+# the checker compares that with the stored rows.
+ROLLUPS = {
+    'appointment_daily_rollup': {
+        'columns': ('day', 'service', 'status', 'appointments'),
+        'measures': 1,
+        'source': '''
+            SELECT COALESCE(date(created_at), ''), COALESCE(service, ''), COALESCE(status, ''), COUNT(*)
+            FROM appointments GROUP BY 1, 2, 3
+        ''',
+    },
+    'payment_daily_rollup': {
+        'columns': ('day', 'service', 'status', 'payments', 'amount'),
+        'measures': 2,
+        'source': '''
+            SELECT COALESCE(date(created_at), ''), COALESCE(service, ''), COALESCE(status, ''),
+                   COUNT(*), COALESCE(SUM(amount), 0)
+            FROM payments GROUP BY 1, 2, 3
+        ''',
+    },
+}
+
+# Amounts are summed incrementally in floating point
+AMOUNT_TOLERANCE = 0.005
+
+def _default_path():
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), os.getenv('HEALTHCARE_DB_PATH', 'healthcare.db'))
+
+def _by_key(rows, measures: int) -> Dict[tuple, tuple]:
+    values = {}
+    for row in rows:
+        # Groups whose rows were all updated or deleted away stay behind with a zero count
+        if row[-measures]:
+            values[tuple(row[:-measures])] = tuple(row[-measures:])
+    return values
+
+def verify_rollups(db_path: str = None, repair: bool = False) -> Dict[str, List[Dict]]:
+    """
+    Recompute every rollup from its source table and compare with the stored rows
+
+    Both sides are read in one transaction, so writes from the app while
+    the check runs cannot show up as differences.
+
+    :param db_path: SQLite database file (defaults to healthcare.db)
+    :param repair: Rebuild rollups that differ
+    :return: Rollup table -> list of differences ({'key', 'expected', 'actual'})
+    """
+    conn = sqlite3.connect(db_path or _default_path(), timeout=30, isolation_level=None)
+    differences = {}
+
+    try:
+        conn.execute('BEGIN')
+        for table, rollup in ROLLUPS.items():
+            measures = rollup['measures']
+            expected = _by_key(conn.execute(rollup['source']), measures)
+            actual = _by_key(conn.execute(f"SELECT {', '.join(rollup['columns'])} FROM {table}"), measures)
+
+            differences[table] = [
+                {'key': key, 'expected': expected.get(key), 'actual': actual.get(key)}
+                for key in sorted(set(expected) | set(actual))
+                if not _same(expected.get(key), actual.get(key))
+            ]
+        conn.execute('COMMIT')
+
+        if repair:
+            for table, table_differences in differences.items():
+                if table_differences:
+                    rebuild_rollup(conn, table)
+
+        return differences
+
+    finally:
+        conn.close()
+
+def _same(expected, actual) -> bool:
+    if expected is None or actual is None:
+        return expected == actual
+    return all(abs(a - b) <= AMOUNT_TOLERANCE for a, b in zip(expected, actual))
+
+def rebuild_rollup(conn, table: str):
+    """
+    Replace a rollup with a fresh recomputation in one write transaction
+
+    :param conn: Autocommit connection
+    :param table: Rollup table name
+    """
+    rollup = ROLLUPS[table]
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        conn.execute(f'DELETE FROM {table}')
+        conn.execute(f"INSERT INTO {table} ({', '.join(rollup['columns'])}) {rollup['source']}")
+        conn.execute('COMMIT')
+    except sqlite3.Error:
+        conn.execute('ROLLBACK')
+        raise
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check the daily KPI rollups against the source tables")
+    parser.add_argument('db_path', nargs='?', default=_default_path())
+    parser.add_argument('--repair', action='store_true', help="rebuild rollups that differ")
+    args = parser.parse_args()
+
+    results = verify_rollups(args.db_path, repair=args.repair)
+    for table, table_differences in results.items():
+        print(f"{table}: {'OK' if not table_differences else f'{len(table_differences)} groups differ'}")
+        for difference in table_differences[:20]:
+            print(f"  {difference['key']}: expected {difference['expected']}, stored {difference['actual']}")
+        if table_differences and args.repair:
+            print("  rebuilt")
+
+    sys.exit(1 if any(results.values()) and not args.repair else 0)
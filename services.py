@@ -30,6 +30,30 @@ class ServiceManager:
                 "individual_tests": [],
                 "iv_therapies": []
             }
+        
+        self._build_index()
+
+    def _build_index(self):
+        """
+        Build id and lowercase-name lookup tables over all service types
+        
+        The first service wins on duplicate keys, matching the search order
+        wellness packages, individual tests, IV therapies.
+        """
+        self._by_id = {}
+        self._by_name = {}
+        for service in self.get_all_services():
+            if service.get('id'):
+                self._by_id.setdefault(service['id'], service)
+            self._by_name.setdefault(service['name'].lower(), service)
+
+    def get_all_services(self) -> List[Dict]:
+        """
+        Retrieve every service across all service types
+        
+        :return: List of services
+        """
+        return [*self.get_wellness_packages(), *self.get_individual_tests(), *self.get_iv_therapies()]
 
     def get_categories(self) -> List[str]:
         """
@@ -70,22 +94,7 @@ class ServiceManager:
         :param service_id: Unique service identifier
         :return: Service details or None
         """
-        # Search wellness packages
-        for package in self.get_wellness_packages():
-            if package.get('id') == service_id:
-                return package
-        
-        # Search individual tests
-        for test in self.get_individual_tests():
-            if test.get('id') == service_id:
-                return test
-        
-        # Search IV therapies
-        for therapy in self.get_iv_therapies():
-            if therapy.get('id') == service_id:
-                return therapy
-        
-        return None
+        return self._by_id.get(service_id)
 
     def find_service_by_name(self, name: str) -> Optional[Dict]:
         """
@@ -94,22 +103,7 @@ class ServiceManager:
         :param name: Name of the service
         :return: Service details or None
         """
-        # Search wellness packages
-        for package in self.get_wellness_packages():
-            if package['name'].lower() == name.lower():
-                return package
-        
-        # Search individual tests
-        for test in self.get_individual_tests():
-            if test['name'].lower() == name.lower():
-                return test
-        
-        # Search IV therapies
-        for therapy in self.get_iv_therapies():
-            if therapy['name'].lower() == name.lower():
-                return therapy
-        
-        return None
+        return self._by_name.get(name.lower())
 
     def search_services(self, query: str, category: str = None) -> List[Dict]:
         """
@@ -0,0 +1,464 @@
+import heapq
+import os
+import sqlite3
+import threading
+import time
+from datetime import date as date_cls, datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+from dotenv import load_dotenv
+from database import db
+from lazy import LazySingleton
+
+# Load environment variables
+load_dotenv()
+
+DEFAULT_SLOT_TIMES = ('09:00', '11:00', '14:00', '16:00')
+
+# Appointment statuses that hold a booked place in their slot
+BOOKED_STATUSES = ('Pending', 'Confirmed')
+
+class SlotInventory:
+    """
+    Per-day, per-slot appointment capacity stored in SQLite.
+
+    Every (date, slot_time) row carries its capacity, the number of booked
+    and temporarily held places and a version number. Reservations are
+    compare-and-swap updates on the version, so concurrent workers can never
+    overbook a slot. Free slots are served from a partial index that only
+    contains rows with spare capacity, so "next N available" never scans
+    full slots or the appointments table.
+
+    Slots offered during a booking conversation are held for the sender
+    until they confirm one or the hold expires. Expiry times are kept in a
+    heap so expired holds are released in bulk only when one is due.
+    """
+
+    def __init__(self, db_path: str = None, capacity: int = None, slot_times=None, horizon_days: int = None,
+                 hold_seconds: float = None):
+        """
+        Initialize the slot inventory
+
+        :param db_path: SQLite database file (defaults to the healthcare database)
+        :param capacity: Patients per slot (env SLOT_CAPACITY, default 3)
+        :param slot_times: Daily slot start times as HH:MM
+        :param horizon_days: How many days ahead slots are materialised (env SLOT_HORIZON_DAYS, default 14)
+        :param hold_seconds: How long offered slots stay held (env SLOT_HOLD_SECONDS, default 600)
+        """
+        self.db_path = db_path or db.db_path
+        self.capacity = capacity or int(os.getenv('SLOT_CAPACITY', '3'))
+        self.slot_times = tuple(slot_times or DEFAULT_SLOT_TIMES)
+        self.horizon_days = horizon_days or int(os.getenv('SLOT_HORIZON_DAYS', '14'))
+        self.hold_seconds = hold_seconds or float(os.getenv('SLOT_HOLD_SECONDS', '600'))
+        self.cas_retries = 0
+        self._local = threading.local()
+        self._ensured_through = None
+        self._expiry_heap = []
+        self._heap_lock = threading.Lock()
+        self._create_tables()
+        self._load_active_holds()
+
+    def _connection(self):
+        """
+        Autocommit connection for the current thread
+        """
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            self._local.conn = conn
+        return conn
+
+    def _create_tables(self):
+        conn = self._connection()
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS slot_inventory (
+                date TEXT NOT NULL,
+                slot_time TEXT NOT NULL,
+                capacity INTEGER NOT NULL,
+                booked INTEGER NOT NULL DEFAULT 0,
+                held INTEGER NOT NULL DEFAULT 0,
+                version INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (date, slot_time)
+            )
+        ''')
+        columns = [row[1] for row in conn.execute('PRAGMA table_info(slot_inventory)')]
+        if 'held' not in columns:
+            conn.execute('ALTER TABLE slot_inventory ADD COLUMN held INTEGER NOT NULL DEFAULT 0')
+            conn.execute('DROP INDEX IF EXISTS idx_slot_inventory_available')
+        
+        # Availability index: only slots with spare (unbooked, unheld) capacity are in it
+        conn.execute('''
+            CREATE INDEX IF NOT EXISTS idx_slot_inventory_free
+            ON slot_inventory(date, slot_time) WHERE booked < capacity - held
+        ''')
+        
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS slot_holds (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                phone_number TEXT NOT NULL,
+                date TEXT NOT NULL,
+                slot_time TEXT NOT NULL,
+                package_name TEXT,
+                position INTEGER NOT NULL,
+                expires_at REAL NOT NULL,
+                status TEXT NOT NULL DEFAULT 'active'
+            )
+        ''')
+        conn.execute('''
+            CREATE INDEX IF NOT EXISTS idx_slot_holds_phone
+            ON slot_holds(phone_number, position) WHERE status = 'active'
+        ''')
+        conn.execute('''
+            CREATE INDEX IF NOT EXISTS idx_slot_holds_expiry
+            ON slot_holds(expires_at) WHERE status = 'active'
+        ''')
+
+    def _load_active_holds(self):
+        """
+        Rebuild the expiry heap from holds that survived a restart
+        """
+        rows = self._connection().execute(
+            "SELECT expires_at, id FROM slot_holds WHERE status = 'active'"
+        ).fetchall()
+        with self._heap_lock:
+            self._expiry_heap = [tuple(row) for row in rows]
+            heapq.heapify(self._expiry_heap)
+
+    def ensure_days(self, start: date_cls, days: int):
+        """
+        Materialise inventory rows for a range of days (existing rows are kept)
+
+        :param start: First day
+        :param days: Number of days
+        """
+        rows = [
+            ((start + timedelta(days=offset)).isoformat(), slot_time, self.capacity)
+            for offset in range(days)
+            for slot_time in self.slot_times
+        ]
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.executemany(
+                'INSERT OR IGNORE INTO slot_inventory (date, slot_time, capacity) VALUES (?, ?, ?)', rows
+            )
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+    def _ensure_horizon(self, start: date_cls):
+        last_day = start + timedelta(days=self.horizon_days - 1)
+        if self._ensured_through is None or self._ensured_through < last_day:
+            self.ensure_days(start, self.horizon_days)
+            self._ensured_through = last_day
+
+    def next_available(self, count: int = 4, start: date_cls = None) -> List[Tuple[str, str, int]]:
+        """
+        Next slots with spare capacity, in chronological order
+
+        :param count: Number of slots to return
+        :param start: First eligible day (defaults to tomorrow)
+        :return: List of (date, slot_time, remaining places)
+        """
+        start = start or (datetime.now().date() + timedelta(days=1))
+        self._ensure_horizon(start)
+        self.expire_due()
+        cursor = self._connection().execute('''
+            SELECT date, slot_time, capacity - booked - held
+            FROM slot_inventory INDEXED BY idx_slot_inventory_free
+            WHERE booked < capacity - held AND date >= ?
+            ORDER BY date, slot_time
+            LIMIT ?
+        ''', (start.isoformat(), count))
+        return cursor.fetchall()
+
+    def remaining(self, date: str, slot_time: str) -> Optional[int]:
+        """
+        Places left in a slot
+
+        :return: Remaining places or None if the slot does not exist
+        """
+        row = self._connection().execute(
+            'SELECT capacity - booked - held FROM slot_inventory WHERE date = ? AND slot_time = ?',
+            (date, slot_time)
+        ).fetchone()
+        return row[0] if row else None
+
+    def reserve(self, date: str, slot_time: str) -> bool:
+        """
+        Atomically take one place in a slot
+
+        Reads the slot's version and only increments ``booked`` if the
+        version is unchanged; a concurrent writer makes the update miss and
+        the read is retried.
+
+        :param date: Slot date (YYYY-MM-DD)
+        :param slot_time: Slot time (HH:MM)
+        :return: True if a place was reserved, False if the slot is full or unknown
+        """
+        return self._take(date, slot_time, 'booked')
+
+    def _take(self, date: str, slot_time: str, column: str) -> bool:
+        """
+        Compare-and-swap increment of ``booked`` or ``held`` while capacity remains
+        """
+        conn = self._connection()
+        while True:
+            row = conn.execute(
+                'SELECT capacity, booked + held, version FROM slot_inventory WHERE date = ? AND slot_time = ?',
+                (date, slot_time)
+            ).fetchone()
+            if row is None or row[1] >= row[0]:
+                return False
+
+            cursor = conn.execute(f'''
+                UPDATE slot_inventory SET {column} = {column} + 1, version = version + 1
+                WHERE date = ? AND slot_time = ? AND version = ?
+            ''', (date, slot_time, row[2]))
+            if cursor.rowcount == 1:
+                return True
+            self.cas_retries += 1
+
+    def release(self, date: str, slot_time: str) -> bool:
+        """
+        Give back a booked place (e.g. when saving the appointment fails)
+
+        :return: True if a booked place was released
+        """
+        cursor = self._connection().execute('''
+            UPDATE slot_inventory SET booked = booked - 1, version = version + 1
+            WHERE date = ? AND slot_time = ? AND booked > 0
+        ''', (date, slot_time))
+        return cursor.rowcount == 1
+
+    def on_appointments_changed(self, table: str, changes: List[Dict]):
+        """
+        Database change listener: give back the places of cancelled
+        appointments, and take them again if an appointment is reinstated
+
+        :param table: Changed table
+        :param changes: Dicts with 'id', 'old_status' and 'status'
+        """
+        if table != 'appointments':
+            return
+        cancelled = [change['id'] for change in changes
+                     if change['old_status'] in BOOKED_STATUSES and change['status'] == 'Cancelled']
+        reinstated = [change['id'] for change in changes
+                      if change['old_status'] == 'Cancelled' and change['status'] in BOOKED_STATUSES]
+        if not cancelled and not reinstated:
+            return
+
+        conn = self._connection()
+        slots = {}
+        ids = cancelled + reinstated
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            rows = conn.execute(
+                f"SELECT id, date, time FROM appointments WHERE id IN ({','.join('?' * len(chunk))})", chunk
+            ).fetchall()
+            slots.update((appointment_id, (date, slot_time)) for appointment_id, date, slot_time in rows)
+
+        # One update per slot, however many of its appointments were cancelled
+        freed = {}
+        for appointment_id in cancelled:
+            if appointment_id in slots:
+                freed[slots[appointment_id]] = freed.get(slots[appointment_id], 0) + 1
+        if freed:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                conn.executemany('''
+                    UPDATE slot_inventory SET booked = MAX(booked - ?, 0), version = version + 1
+                    WHERE date = ? AND slot_time = ?
+                ''', [(count, date, slot_time) for (date, slot_time), count in freed.items()])
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+
+        for appointment_id in reinstated:
+            if appointment_id in slots and not self.reserve(*slots[appointment_id]):
+                date, slot_time = slots[appointment_id]
+                print(f"Reinstated appointment {appointment_id} overbooks {date} {slot_time}: slot is full")
+
+    def offer_slots(self, phone_number: str, package_name: str = None, count: int = 4) -> List[Dict]:
+        """
+        Hold the next available slots for a sender while they choose one
+
+        Any holds the sender already had are released first.
+
+        :param phone_number: Sender the holds belong to
+        :param package_name: Package being booked
+        :param count: Number of slots to offer
+        :return: Holds in offer order (dicts with id, date, slot_time, label)
+        """
+        self.release_holds(phone_number)
+        candidates = self.next_available(count + 8)
+        expires_at = time.time() + self.hold_seconds
+        conn = self._connection()
+        holds = []
+
+        # Take the places and record the holds atomically
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            for date, slot_time, _ in candidates:
+                if len(holds) == count:
+                    break
+                if not self._take(date, slot_time, 'held'):
+                    continue
+                cursor = conn.execute('''
+                    INSERT INTO slot_holds (phone_number, date, slot_time, package_name, position, expires_at)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                ''', (phone_number, date, slot_time, package_name, len(holds) + 1, expires_at))
+                holds.append({
+                    'id': cursor.lastrowid,
+                    'date': date,
+                    'slot_time': slot_time,
+                    'package_name': package_name,
+                    'label': self.format_slot(date, slot_time)
+                })
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+        with self._heap_lock:
+            for hold in holds:
+                heapq.heappush(self._expiry_heap, (expires_at, hold['id']))
+        return holds
+
+    def get_holds(self, phone_number: str) -> List[Dict]:
+        """
+        Active holds for a sender in offer order
+
+        :param phone_number: Sender
+        :return: List of holds
+        """
+        self.expire_due()
+        rows = self._connection().execute('''
+            SELECT id, date, slot_time, package_name FROM slot_holds
+            WHERE phone_number = ? AND status = 'active'
+            ORDER BY position
+        ''', (phone_number,)).fetchall()
+        return [
+            {
+                'id': hold_id,
+                'date': date,
+                'slot_time': slot_time,
+                'package_name': package_name,
+                'label': self.format_slot(date, slot_time)
+            }
+            for hold_id, date, slot_time, package_name in rows
+        ]
+
+    def confirm_hold(self, hold_id: int) -> bool:
+        """
+        Turn a hold into a booking and release the sender's other holds
+
+        The place was already counted when the hold was taken, so this
+        only moves it from ``held`` to ``booked``; no capacity check needed.
+
+        :param hold_id: Hold to confirm
+        :return: False if the hold expired or was already used
+        """
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute('''
+                SELECT phone_number, date, slot_time FROM slot_holds
+                WHERE id = ? AND status = 'active' AND expires_at > ?
+            ''', (hold_id, time.time())).fetchone()
+            if row is None:
+                conn.execute('ROLLBACK')
+                return False
+
+            phone_number, date, slot_time = row
+            conn.execute("UPDATE slot_holds SET status = 'confirmed' WHERE id = ?", (hold_id,))
+            conn.execute('''
+                UPDATE slot_inventory SET held = held - 1, booked = booked + 1, version = version + 1
+                WHERE date = ? AND slot_time = ?
+            ''', (date, slot_time))
+            self._release_where(conn, 'phone_number = ?', (phone_number,), 'released')
+            conn.execute('COMMIT')
+            return True
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+    def release_holds(self, phone_number: str) -> int:
+        """
+        Release every active hold of a sender
+
+        :return: Number of released holds
+        """
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            released = self._release_where(conn, 'phone_number = ?', (phone_number,), 'released')
+            conn.execute('COMMIT')
+            return released
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+    def expire_due(self, now: float = None) -> int:
+        """
+        Release holds whose expiry has passed, in one bulk update
+
+        Only touches the database when the earliest known expiry is due. The
+        update itself is driven by the expiry index, so holds created by
+        other worker processes are expired as well.
+
+        :param now: Current epoch time (defaults to time.time())
+        :return: Number of expired holds
+        """
+        now = time.time() if now is None else now
+        with self._heap_lock:
+            if not self._expiry_heap or self._expiry_heap[0][0] > now:
+                return 0
+            while self._expiry_heap and self._expiry_heap[0][0] <= now:
+                heapq.heappop(self._expiry_heap)
+
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            expired = self._release_where(conn, 'expires_at <= ?', (now,), 'expired')
+            conn.execute('COMMIT')
+            return expired
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+    @staticmethod
+    def _release_where(conn, condition: str, params: tuple, status: str) -> int:
+        """
+        Mark matching active holds and give their places back, grouped per slot
+        """
+        rows = conn.execute(f'''
+            SELECT date, slot_time, COUNT(*) FROM slot_holds
+            WHERE status = 'active' AND {condition}
+            GROUP BY date, slot_time
+        ''', params).fetchall()
+        if not rows:
+            return 0
+        conn.execute(f"UPDATE slot_holds SET status = ? WHERE status = 'active' AND {condition}", (status, *params))
+        conn.executemany('''
+            UPDATE slot_inventory SET held = MAX(held - ?, 0), version = version + 1
+            WHERE date = ? AND slot_time = ?
+        ''', [(count, date, slot_time) for date, slot_time, count in rows])
+        return sum(count for _, _, count in rows)
+
+    @staticmethod
+    def format_slot(date: str, slot_time: str) -> str:
+        """
+        Human-readable slot label, e.g. "Thursday (2025-10-16) - 9:00 AM"
+        """
+        moment = datetime.strptime(f"{date} {slot_time}", "%Y-%m-%d %H:%M")
+        return f"{moment.strftime('%A')} ({date}) - {moment.strftime('%I:%M %p').lstrip('0')}"
+
+def _on_appointments_changed(table: str, changes: List[Dict]):
+    # Looked up per call, so registering the listener doesn't build the inventory
+    slot_inventory.on_appointments_changed(table, changes)
+
+# Create a global slot inventory instance (tables are created on first use)
+slot_inventory = LazySingleton(SlotInventory)
+db.add_change_listener(_on_appointments_changed)
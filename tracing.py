@@ -0,0 +1,217 @@
+import contextvars
+import os
+import time
+from functools import wraps
+from typing import Optional
+from dotenv import load_dotenv
+from metrics import registry
+
+# Load environment variables
+load_dotenv()
+
+message_duration_seconds = registry.histogram(
+    'message_duration_seconds', 'Time to handle one message, by channel, route and outcome',
+    ('channel', 'route', 'outcome')
+)
+message_stage_duration_seconds = registry.histogram(
+    'message_stage_duration_seconds', 'Time spent in each stage of the message pipeline',
+    ('channel', 'route', 'stage')
+)
+message_stage_errors_total = registry.counter(
+    'message_stage_errors_total', 'Exceptions raised or recorded in a message pipeline stage',
+    ('channel', 'route', 'stage', 'error')
+)
+
+# Innermost open span of the current task or thread
+_current_span = contextvars.ContextVar('current_span', default=None)
+
+class Span:
+    """
+    Timing of one message (``stage`` is None) or one stage within it.
+
+    Used as a context manager. Stages take the channel and route of the
+    message they run in. An exception leaving the block, or one passed to
+    ``error()``, is counted under the stage; a message's outcome is
+    'error' when that happens to the message span itself.
+    """
+
+    __slots__ = ('tracer', 'channel', 'route', 'stage', 'parent', 'started', 'failed', '_token', '_otel')
+
+    def __init__(self, tracer: 'Tracer', channel: str, route: str, stage: Optional[str], parent: 'Span' = None):
+        self.tracer = tracer
+        self.channel = channel
+        self.route = route
+        self.stage = stage
+        self.parent = parent
+        self.failed = False
+        self._otel = None
+
+    def __enter__(self):
+        if self.tracer.otel_tracer is not None:
+            self._otel = self.tracer.start_otel_span(self)
+        self._token = _current_span.set(self)
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        elapsed = time.perf_counter() - self.started
+        _current_span.reset(self._token)
+        if exc is not None:
+            self.error(exc)
+
+        if self.stage is None:
+            message_duration_seconds.observe_key(
+                elapsed, (self.channel, self.route, 'error' if self.failed else 'ok')
+            )
+        else:
+            message_stage_duration_seconds.observe_key(elapsed, (self.channel, self.route, self.stage))
+
+        if self._otel is not None:
+            self._otel.end()
+        return False
+
+    def error(self, exc: BaseException):
+        """
+        Record an exception handled inside the span
+
+        :param exc: The exception
+        """
+        if not self.failed:
+            message_stage_errors_total.inc(
+                channel=self.channel, route=self.route, stage=self.stage or 'message', error=type(exc).__name__
+            )
+        self.failed = True
+        if self._otel is not None:
+            self.tracer.record_otel_error(self._otel, exc)
+
+class _NoopSpan:
+    """
+    Stand-in returned when tracing is disabled or no message is being traced
+    """
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        return False
+
+    def error(self, exc: BaseException):
+        pass
+
+_NOOP_SPAN = _NoopSpan()
+
+class Tracer:
+    """
+    Low-overhead per-stage timing for the message pipeline.
+
+    ``trace(channel, route)`` wraps the handling of one message and
+    ``span(stage)`` the stages inside it (``process_message``,
+    ``generate_gpt4_response``, ``detect_language``, ``db.log_chat`` ...).
+    Timings go to the ``message_duration_seconds`` and
+    ``message_stage_duration_seconds`` histograms on ``/metrics``, and
+    errors to ``message_stage_errors_total``. The current span is held in
+    a context variable, so stages can be timed deep inside helpers (and in
+    the worker pools, which copy the context) without passing it around;
+    outside a traced message ``span()`` does nothing.
+
+    With OpenTelemetry installed and ``TRACING_OTEL_ENABLED=true`` every
+    span is also started as an OpenTelemetry span on the globally
+    configured tracer provider (set up the SDK and exporter as usual, e.g.
+    with ``opentelemetry-instrument``).
+    """
+
+    def __init__(self, enabled: bool = None, otel_enabled: bool = None):
+        """
+        Initialize the tracer
+
+        :param enabled: Record timings (env TRACING_ENABLED, default true)
+        :param otel_enabled: Also emit OpenTelemetry spans (env TRACING_OTEL_ENABLED, default false)
+        """
+        self.enabled = os.getenv('TRACING_ENABLED', 'true').lower() == 'true' if enabled is None else enabled
+        if otel_enabled is None:
+            otel_enabled = os.getenv('TRACING_OTEL_ENABLED', 'false').lower() == 'true'
+        self.otel_tracer = None
+        self._otel_status = None
+        self._otel_context = None
+        if self.enabled and otel_enabled:
+            self._load_otel()
+
+    def _load_otel(self):
+        try:
+            from opentelemetry import trace as otel_trace
+            from opentelemetry.trace import Status, StatusCode
+        except ImportError:
+            print("Tracing Error: TRACING_OTEL_ENABLED is set but opentelemetry-api is not installed")
+            return
+        self.otel_tracer = otel_trace.get_tracer('healthcare-assistant')
+        self._otel_status = Status(StatusCode.ERROR)
+        self._otel_context = otel_trace.set_span_in_context
+
+    def start_otel_span(self, span: Span):
+        # Parent explicitly: spans are not made current in the OpenTelemetry context
+        parent = span.parent._otel if span.parent is not None else None
+        return self.otel_tracer.start_span(
+            span.stage or f"{span.channel} {span.route}",
+            context=self._otel_context(parent) if parent is not None else None,
+            attributes={'channel': span.channel, 'route': span.route}
+        )
+
+    def record_otel_error(self, otel_span, exc: BaseException):
+        otel_span.record_exception(exc)
+        otel_span.set_status(self._otel_status)
+
+    def trace(self, channel: str, route: str):
+        """
+        Time the handling of one message
+
+        :param channel: Channel name ('whatsapp', 'instagram', 'website')
+        :param route: Endpoint that received the message
+        :return: Span context manager
+        """
+        if not self.enabled:
+            return _NOOP_SPAN
+        return Span(self, channel, route, None)
+
+    def span(self, stage: str):
+        """
+        Time one stage of the message being traced
+
+        :param stage: Stage name
+        :return: Span context manager (a no-op outside a traced message)
+        """
+        parent = _current_span.get()
+        if parent is None:
+            return _NOOP_SPAN
+        return Span(self, parent.channel, parent.route, stage, parent)
+
+    def record_error(self, exc: BaseException):
+        """
+        Record an exception that was handled (not raised) in the current span
+
+        :param exc: The exception
+        """
+        current = _current_span.get()
+        if current is not None:
+            current.error(exc)
+
+    def traced(self, stage: str):
+        """
+        Decorator timing every call of a function as a stage
+
+        :param stage: Stage name
+        :return: Decorator
+        """
+        def decorator(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                if _current_span.get() is None:
+                    return func(*args, **kwargs)
+                with self.span(stage):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+# Create a global tracer
+tracer = Tracer()
@@ -1,7 +1,9 @@
 import os
 import re
+from functools import lru_cache
 from twilio.request_validator import RequestValidator
 from dotenv import load_dotenv
+from interaction_log import interaction_log
 
 # Load environment variables
 load_dotenv()
@@ -26,23 +28,38 @@ def validate_phone_number(phone_number):
     
     return None
 
+@lru_cache(maxsize=1)
+def get_twilio_validator():
+    """
+    Return a shared Twilio request validator
+
+    The auth token is read once; call ``get_twilio_validator.cache_clear()``
+    after rotating ``TWILIO_AUTH_TOKEN``.
+
+    :return: RequestValidator instance or None if no auth token is configured
+    """
+    auth_token = os.getenv('TWILIO_AUTH_TOKEN')
+    if not auth_token:
+        return None
+    return RequestValidator(auth_token)
+
 def validate_twilio_request(request, form_data):
     """
     Validate incoming Twilio webhook request
     
     :param request: FastAPI request object
+    :param form_data: Parsed form parameters of the request
     :return: Boolean indicating request validity
     """
     try:
         # Get Twilio signature and URL
         signature = request.headers.get('X-Twilio-Signature', '')
-        url = request.url._url
-        
-        # Get form data
-        # form_data = request.form()
+        url = str(request.url)
         
-        # Initialize Twilio validator
-        validator = RequestValidator(os.getenv('TWILIO_AUTH_TOKEN'))
+        validator = get_twilio_validator()
+        if validator is None:
+            print("Twilio Request Validation Error: TWILIO_AUTH_TOKEN is not set")
+            return False
         
         # Validate request
         return validator.validate(url, dict(form_data), signature)
@@ -79,32 +96,30 @@ def generate_unique_id(prefix=''):
     unique_id = str(uuid.uuid4()).replace('-', '')[:12]
     return f"{prefix}{unique_id}" if prefix else unique_id
 
-def log_interaction(phone_number, message_type, content):
+def generate_unique_conversation_id(phone_number):
+    """
+    Generate a conversation identifier for a phone number
+    
+    :param phone_number: User's phone number
+    :return: Unique conversation ID
+    """
+    digits = re.sub(r'\D', '', phone_number or '')
+    return generate_unique_id(prefix=f"conv_{digits}_")
+
+def log_interaction(phone_number, message_type, content, **fields):
     """
     Log user interactions
     
+    Queued to the buffered, rotating JSONL log in ``interaction_log.py``;
+    the caller never waits for disk.
+    
     :param phone_number: User's phone number
     :param message_type: Type of interaction (e.g., 'incoming', 'outgoing')
     :param content: Message content
+    :param fields: Extra fields stored with the record (e.g. channel)
     """
     try:
-        import json
-        from datetime import datetime
-        
-        log_entry = {
-            'timestamp': datetime.now().isoformat(),
-            'phone_number': phone_number,
-            'type': message_type,
-            'content': content
-        }
-        
-        # Ensure logs directory exists
-        os.makedirs('logs', exist_ok=True)
-        
-        # Append to log file
-        with open('logs/whatsapp_log.json', 'a') as log_file:
-            json.dump(log_entry, log_file)
-            log_file.write('\n')
+        interaction_log.log(phone_number, message_type, content, **fields)
     
     except Exception as e:
-        print(f"Interaction Logging Error: {e}") 
\ No newline at end of file
+        print(f"Interaction Logging Error: {e}")
@@ -1,14 +1,59 @@
 import asyncio
 import json
+import os
 import uuid
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from gpt4_response import generate_gpt4_response
+from gpt4_response import generate_gpt4_response, detect_language, get_openai
 from database import db
+from health_package_chatbot import health_chatbot, process_message
+from rate_limit import sender_limiter, llm_limiter, RATE_LIMITED_MESSAGE
+from executor import executor, run_io, run_cpu
+from tracing import tracer
+from profiling import ProfilingMiddleware, sampling_profiler
+from lazy import resolve
+
+class ClientConnection:
+    """
+    A registered websocket with its own bounded outbound queue.
+
+    A single sender task drains the queue, so a slow client only ever
+    delays its own messages.
+    """
+
+    def __init__(self, client_id: str, websocket: WebSocket, queue_size: int):
+        self.client_id = client_id
+        self.websocket = websocket
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.sender_task = None
+
+# Protocol-level keepalive, answered by every websocket client without any
+# application code; passed to uvicorn (dead transports are closed by it)
+WS_PING_INTERVAL = float(os.getenv('WS_PING_INTERVAL', '20'))
+WS_PING_TIMEOUT = float(os.getenv('WS_PING_TIMEOUT', '20'))
 
 class WebsiteChatManager:
-    def __init__(self):
+    def __init__(self, queue_size: int = None, send_timeout: float = None,
+                 heartbeat_interval: float = None, app_heartbeat: bool = None):
+        """
+        Initialize the connection registry
+
+        :param queue_size: Maximum queued outbound messages per client before it is evicted as slow
+        :param send_timeout: Seconds a single send may take before the client is evicted
+        :param heartbeat_interval: Seconds between application-level pings
+        :param app_heartbeat: Send {"type": "ping"} chat frames (env WS_APP_HEARTBEAT, default false);
+                              only for clients that understand them
+        """
+        self.queue_size = queue_size or int(os.getenv('WS_SEND_QUEUE_SIZE', '32'))
+        self.send_timeout = send_timeout or float(os.getenv('WS_SEND_TIMEOUT', '5'))
+        self.heartbeat_interval = heartbeat_interval or float(os.getenv('WS_HEARTBEAT_INTERVAL', '25'))
+        self.app_heartbeat = (os.getenv('WS_APP_HEARTBEAT', 'false').lower() == 'true'
+                              if app_heartbeat is None else app_heartbeat)
         self.active_connections = {}
+        self._by_socket = {}
+        self._heartbeat_task = None
+        self.evicted_count = 0
 
     async def connect(self, websocket: WebSocket, client_id: str = None):
         """
@@ -20,35 +65,151 @@ class WebsiteChatManager:
         if not client_id:
             client_id = str(uuid.uuid4())
         
-        # Store the connection
-        self.active_connections[client_id] = websocket
+        # A reconnect with the same client ID replaces the old socket
+        if client_id in self.active_connections:
+            await self.disconnect(client_id)
+        
+        # Store the connection and start its sender
+        connection = ClientConnection(client_id, websocket, self.queue_size)
+        connection.sender_task = asyncio.create_task(self._sender(connection))
+        self.active_connections[client_id] = connection
+        self._by_socket[id(websocket)] = connection
         return client_id
 
-    async def disconnect(self, client_id: str):
+    async def disconnect(self, client_id: str, websocket: WebSocket = None):
         """
         Remove a WebSocket connection
+
+        :param client_id: Client to remove
+        :param websocket: Only remove the client if it is still bound to this socket
         """
-        if client_id in self.active_connections:
-            del self.active_connections[client_id]
+        connection = self.active_connections.get(client_id)
+        if connection is None or (websocket is not None and connection.websocket is not websocket):
+            return
+        del self.active_connections[client_id]
+        self._by_socket.pop(id(connection.websocket), None)
+        if connection.sender_task and connection.sender_task is not asyncio.current_task():
+            connection.sender_task.cancel()
 
     async def send_personal_message(self, message: str, websocket: WebSocket):
         """
         Send a message to a specific WebSocket
         """
-        await websocket.send_text(message)
+        connection = self._by_socket.get(id(websocket))
+        if connection is None:
+            await websocket.send_text(message)
+            return
+        self._enqueue(connection, message)
 
     async def broadcast(self, message: str):
         """
         Send a message to all connected clients
+
+        Messages are queued per client and delivered concurrently by each
+        client's sender task; clients whose queue is full are evicted.
+
+        :return: Number of clients the message was queued for
+        """
+        delivered = 0
+        for connection in list(self.active_connections.values()):
+            if self._enqueue(connection, message):
+                delivered += 1
+        return delivered
+
+    def _enqueue(self, connection: ClientConnection, message: str) -> bool:
+        try:
+            connection.queue.put_nowait(message)
+            return True
+        except asyncio.QueueFull:
+            self._evict(connection, 'send queue full')
+            return False
+
+    async def _sender(self, connection: ClientConnection):
         """
-        for connection in self.active_connections.values():
-            await connection.send_text(message)
+        Drain one client's queue, evicting it on timeout or send failure
+        """
+        try:
+            while True:
+                message = await connection.queue.get()
+                await asyncio.wait_for(connection.websocket.send_text(message), self.send_timeout)
+        except asyncio.CancelledError:
+            raise
+        except asyncio.TimeoutError:
+            self._evict(connection, 'send timeout')
+        except Exception as e:
+            self._evict(connection, f'send failed: {e}')
+
+    def _evict(self, connection: ClientConnection, reason: str):
+        """
+        Drop a slow or dead client and close its socket in the background
+        """
+        if self.active_connections.get(connection.client_id) is not connection:
+            return
+        self.evicted_count += 1
+        print(f"Evicting websocket client {connection.client_id}: {reason}")
+        self.active_connections.pop(connection.client_id, None)
+        self._by_socket.pop(id(connection.websocket), None)
+        if connection.sender_task and connection.sender_task is not asyncio.current_task():
+            connection.sender_task.cancel()
+        asyncio.create_task(self._close(connection.websocket))
+
+    async def _close(self, websocket: WebSocket):
+        try:
+            await asyncio.wait_for(websocket.close(code=1011), self.send_timeout)
+        except Exception:
+            pass
+
+    async def heartbeat(self):
+        """
+        Periodically send every client an application-level ping
+
+        Clients are not required to answer, and idle ones are never evicted:
+        a client is only dropped when its socket stops accepting the ping
+        (send failure or send timeout in its sender task).
+        """
+        ping = json.dumps({'type': 'ping'})
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            for connection in list(self.active_connections.values()):
+                self._enqueue(connection, ping)
+
+    def start_heartbeat(self):
+        if self.app_heartbeat and self._heartbeat_task is None:
+            self._heartbeat_task = asyncio.create_task(self.heartbeat())
+
+    def stop_heartbeat(self):
+        if self._heartbeat_task is not None:
+            self._heartbeat_task.cancel()
+            self._heartbeat_task = None
 
 # Initialize chat manager
 chat_manager = WebsiteChatManager()
 
+def warm_up():
+    """
+    Set up the database, read the catalog, import openai and load the
+    language profiles before the first message (STARTUP_WARM_UP, default true)
+    """
+    db.initialize()
+    resolve(health_chatbot)
+    get_openai()
+    detect_language('warm up')
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if os.getenv('STARTUP_WARM_UP', 'true').lower() == 'true':
+        await run_io(warm_up)
+    chat_manager.start_heartbeat()
+    # Profile a sample of connections (PROFILING_ENABLED, or toggle with PROFILING_SIGNAL)
+    sampling_profiler.install_signal_handler()
+    
+    yield
+    
+    chat_manager.stop_heartbeat()
+    executor.shutdown(wait=False)
+
 # Create FastAPI app for WebSocket chat
-app = FastAPI(title="Website Chat WebSocket")
+app = FastAPI(title="Website Chat WebSocket", lifespan=lifespan)
 
 # CORS middleware to allow all origins (adjust in production)
 app.add_middleware(
@@ -59,11 +220,16 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Profile a sample of connections
+app.add_middleware(ProfilingMiddleware)
+
 @app.websocket("/ws/chat")
 async def websocket_chat_endpoint(websocket: WebSocket, client_id: str = None):
     """
     WebSocket endpoint for real-time chat
     """
+    current_client_id = None
+    
     # Connect the client
     try:
         # Establish connection and get/generate client ID
@@ -76,30 +242,57 @@ async def websocket_chat_endpoint(websocket: WebSocket, client_id: str = None):
             try:
                 # Parse message (assuming JSON format)
                 message_data = json.loads(data)
-                message_text = message_data.get('message', '')
                 
-                # Generate AI response
-                response_text = generate_gpt4_response(message_text)
+                # Application-level heartbeat frames (WS_APP_HEARTBEAT clients)
+                if message_data.get('type') == 'pong':
+                    continue
+                if message_data.get('type') == 'ping':
+                    await chat_manager.send_personal_message(json.dumps({'type': 'pong'}), websocket)
+                    continue
                 
-                # Prepare response payload
-                response_payload = {
-                    'sender': 'ai',
-                    'message': response_text
-                }
+                with tracer.trace('website', '/ws/chat'):
+                    message_text = message_data.get('message', '')
                 
-                # Send AI response back to client
-                await chat_manager.send_personal_message(
-                    json.dumps(response_payload), 
-                    websocket
-                )
+                    # Per-client rate limit
+                    if not sender_limiter.allow(current_client_id, channel='website'):
+                        await chat_manager.send_personal_message(
+                            json.dumps({'sender': 'system', 'message': RATE_LIMITED_MESSAGE}),
+                            websocket
+                        )
+                        continue
                 
-                # Log chat interaction
-                db.log_chat(
-                    phone_number=current_client_id, 
-                    message=message_text, 
-                    response=response_text, 
-                    direction='website_chat'
-                )
+                    # Generate AI response, or the structured answer when GPT-4 capacity is saturated.
+                    # Blocking and CPU-bound work runs in the worker pools so other clients keep flowing.
+                    with llm_limiter.slot('website') as llm_available:
+                        if llm_available:
+                            language = await run_cpu(detect_language, message_text)
+                            response_text = await run_io(generate_gpt4_response, message_text, language=language)
+                        else:
+                            chatbot_response = await run_cpu(
+                                process_message, message_text, current_client_id
+                            )
+                            response_text = chatbot_response['response']
+                
+                    # Prepare response payload
+                    response_payload = {
+                        'sender': 'ai',
+                        'message': response_text
+                    }
+                
+                    # Send AI response back to client
+                    await chat_manager.send_personal_message(
+                        json.dumps(response_payload), 
+                        websocket
+                    )
+                
+                    # Log chat interaction
+                    await run_io(
+                        db.log_chat,
+                        phone_number=current_client_id, 
+                        message=message_text, 
+                        response=response_text, 
+                        direction='website_chat'
+                    )
             
             except Exception as e:
                 # Handle any processing errors
@@ -113,10 +306,15 @@ async def websocket_chat_endpoint(websocket: WebSocket, client_id: str = None):
                 )
     
     except WebSocketDisconnect:
-        # Remove the connection when client disconnects
-        await chat_manager.disconnect(current_client_id)
+        pass
+    
+    finally:
+        # Remove the connection when client disconnects or the socket fails
+        if current_client_id:
+            await chat_manager.disconnect(current_client_id, websocket)
 
 # Standalone run configuration
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8001) 
\ No newline at end of file
+    uvicorn.run(app, host="0.0.0.0", port=8001,
+                ws_ping_interval=WS_PING_INTERVAL, ws_ping_timeout=WS_PING_TIMEOUT) 
\ No newline at end of file
@@ -25,6 +25,9 @@ class WhatsAppHandler:
         
         # Initialize Twilio client
         self.client = Client(account_sid, auth_token)
+        if os.getenv('TWILIO_API_BASE'):
+            # Point at a local Twilio stub for testing
+            self.client.api.base_url = os.getenv('TWILIO_API_BASE')
         self.whatsapp_number = os.getenv('TWILIO_WHATSAPP_NUMBER', 'whatsapp:+14155238886')
 
     def send_whatsapp_message(self, to_number, message):